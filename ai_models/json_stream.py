@@ -0,0 +1,87 @@
+import json
+
+
+class JsonArrayStreamParser:
+    # incremental parser for a json array of objects arriving in pieces,
+    # e.g. streamed llm tokens. anything before the first "[" (chatter, code
+    # fences) is skipped. feed returns every element that closed in that
+    # piece, and done is set once the top level array closes
+    def __init__(self):
+        self.started = False
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element = []
+
+    def feed(self, text: str) -> list:
+        items = []
+        for char in text:
+            if self.done:
+                break
+            if not self.started:
+                if char == "[":
+                    self.started = True
+                    self._depth = 1
+                continue
+
+            # scalar elements at the top level are skipped, but their
+            # strings still have to be tracked so brackets in them are ignored
+            keep = self._depth >= 2
+            if self._in_string:
+                if keep:
+                    self._element.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+
+            if self._depth == 0:
+                # closing bracket of the top level array
+                self.done = True
+            elif keep or self._depth >= 2:
+                self._element.append(char)
+                if self._depth == 1:
+                    items.append(self._finish_element())
+        return items
+
+    def _finish_element(self):
+        text = "".join(self._element)
+        self._element = []
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON element in stream: {e}")
+
+
+def iter_content_deltas(lines):
+    # text deltas from an openai style server sent event stream of chat
+    # completion chunks
+    for line in lines:
+        delta = parse_stream_line(line)
+        if delta is None:
+            return
+        if delta:
+            yield delta
+
+
+def parse_stream_line(line: str) -> str | None:
+    # "" for lines with no text, None at the end of the stream
+    if not line.startswith("data:"):
+        return ""
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return None
+    chunk = json.loads(data)
+    choices = chunk.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
@@ -0,0 +1,76 @@
+# long lived http client for openai compatible chat completion apis
+# (together, or a local stand-in for tests and load runs). one pooled
+# connection set per process instead of a new sdk client per call
+import threading
+import httpx
+
+
+class LLMClient:
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str = None,
+        connect_timeout: float = 5,
+        read_timeout: float = 60,
+        max_connections: int = 20,
+        keepalive_expiry: float = 60,
+        transport: httpx.BaseTransport = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._transport = transport
+        self._lock = threading.Lock()
+        self._client: httpx.Client | None = None
+
+    def _client_options(self) -> dict:
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        return {
+            "base_url": self.base_url,
+            "headers": headers,
+            "timeout": self.get_timeout(),
+            "limits": self.limits,
+        }
+
+    def get_timeout(self, timeout: float = None) -> httpx.Timeout:
+        # timeout is the budget for this call, never wait longer than that
+        # just to connect
+        read = timeout if timeout is not None else self.read_timeout
+        return httpx.Timeout(read, connect=min(self.connect_timeout, read))
+
+    def get_client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(transport=self._transport, **self._client_options())
+            return self._client
+
+    def stream_chat(self, model: str, messages: list, timeout: float = None, **params) -> httpx.Response:
+        # opens a streamed completion and returns once the status is known.
+        # the caller reads response.iter_lines() and must close the response,
+        # closing early stops generation
+        client = self.get_client()
+        request = client.build_request(
+            "POST",
+            "/chat/completions",
+            json={"model": model, "messages": messages, "stream": True, **params},
+            timeout=self.get_timeout(timeout),
+        )
+        response = client.send(request, stream=True)
+        if response.is_error:
+            response.read()
+            response.close()
+            response.raise_for_status()
+        return response
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
@@ -0,0 +1,137 @@
+# which whisper model and decode options a recording gets. a few seconds of
+# speech fit in one 30s window, so there is no previous text to condition on
+# and little to gain from a wide beam, while long monologues need the
+# temperature fallback and must not let one bad window derail the next
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from paths import MODEL_SIZE
+
+# the same fallback as whisper's default
+TEMPERATURE_FALLBACK = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+# decode option names are the same in openai-whisper and faster-whisper.
+# modelSizes is per target language, "default" for the rest. base is only
+# used for english, its spanish and french error rates are about twice small's
+MODEL_TIERS = {
+    "fast": {
+        "modelSizes": {"en": "base", "default": MODEL_SIZE},
+        "decodeOptions": {"beam_size": 1, "temperature": (0.0, 0.4, 0.8), "condition_on_previous_text": False},
+    },
+    "standard": {
+        "modelSizes": {"default": MODEL_SIZE},
+        "decodeOptions": {"beam_size": 5, "temperature": TEMPERATURE_FALLBACK, "condition_on_previous_text": True},
+    },
+    "long": {
+        "modelSizes": {"default": MODEL_SIZE},
+        "decodeOptions": {"beam_size": 5, "temperature": TEMPERATURE_FALLBACK, "condition_on_previous_text": False},
+    },
+}
+
+# english only checkpoints are more accurate at the same size, there is no
+# large one
+ENGLISH_MODEL_SIZES = {"tiny", "base", "small", "medium"}
+
+# rough resident memory of an fp32 model on cpu, int8 needs about a quarter
+MODEL_MEMORY_MB = {"tiny": 150, "base": 300, "small": 1000, "medium": 3000, "large": 6000}
+
+
+def select_model_tier(speech_seconds: float, pressure: int, short_seconds: float, long_seconds: float, busy_jobs: int) -> str:
+    # pressure is how many other recordings are waiting or being transcribed.
+    # when busy every recording gets the fast tier so the queue drains
+    if busy_jobs > 0 and pressure >= busy_jobs:
+        return "fast"
+    if speech_seconds <= short_seconds:
+        return "fast"
+    if speech_seconds > long_seconds:
+        return "long"
+    return "standard"
+
+
+def get_tier_model_size(tier: dict, language: str, english_only: bool = True) -> str:
+    model_size = tier["modelSizes"].get(language, tier["modelSizes"]["default"])
+    if english_only and language == "en" and model_size in ENGLISH_MODEL_SIZES:
+        return f"{model_size}.en"
+    return model_size
+
+
+def estimate_model_memory_mb(model_size: str, compute_type: str = None) -> int:
+    # "small.en" and "large-v3" cost the same as "small" and "large"
+    family = model_size.split(".")[0].split("-")[0]
+    memory = MODEL_MEMORY_MB.get(family, MODEL_MEMORY_MB["large"])
+    if compute_type and compute_type.startswith("int8"):
+        return memory // 4
+    return memory
+
+
+class ModelRegistry:
+    # loaded asr backends by model size, least recently used first. models
+    # are loaded on first use, and the oldest ones are unloaded first when
+    # loading another would go over memory_limit_mb. the model asked for is
+    # always loaded, even if it alone is over the limit
+    def __init__(self, load_backend, memory_limit_mb: int, estimate_memory_mb=estimate_model_memory_mb):
+        self.load_backend = load_backend
+        self.memory_limit_mb = memory_limit_mb
+        self.estimate_memory_mb = estimate_memory_mb
+        self._lock = threading.Lock()
+        self._backends = OrderedDict()
+        # model size -> Future of a load in progress
+        self._loading = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, model_size: str):
+        # loads run outside the lock, so requests for models already in
+        # memory never wait on another size's load. a second request for a
+        # model that is still loading waits for that load
+        with self._lock:
+            backend = self._backends.get(model_size)
+            if backend is not None:
+                self._backends.move_to_end(model_size)
+                return backend
+            loading = self._loading.get(model_size)
+            if loading is None:
+                loading = self._loading[model_size] = Future()
+                self._make_room()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return loading.result()
+
+        try:
+            backend = self.load_backend(model_size)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[model_size]
+            loading.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[model_size]
+            self._backends[model_size] = backend
+            self.loads += 1
+        loading.set_result(backend)
+        return backend
+
+    def _make_room(self):
+        # called with the lock held. models still loading count too
+        needed = sum(self.estimate_memory_mb(size) for size in self._loading)
+        while self._backends and self._memory_mb() + needed > self.memory_limit_mb:
+            # a request still using it keeps it alive until it's done
+            evicted, _ = self._backends.popitem(last=False)
+            self.evictions += 1
+            print(f"Unloaded ASR model ({evicted})")
+
+    def _memory_mb(self) -> int:
+        return sum(self.estimate_memory_mb(model_size) for model_size in self._backends)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": list(self._backends),
+                "memoryMB": self._memory_mb(),
+                "memoryLimitMB": self.memory_limit_mb,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -1,56 +1,118 @@
-import json
-from together import Together
+import httpx
+from ai_models.json_stream import JsonArrayStreamParser, iter_content_deltas
+from ai_models.llm_client import LLMClient
+from ai_models.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceededError, ResilientCaller, RetryPolicy, StreamInterruptedError, remaining_time
 from app.config import Config
+from app.utils.concurrency_utils import ProviderLimits
 
+DEFAULT_LLM_BASE_URL = "https://api.together.xyz/v1"
 
-def chat_with_ollama(model: str, prompt: str, max_tokens: int = 256):
-    try:
+# shared by every call in this process so connections are kept alive
+llm_client = LLMClient(
+    base_url=Config.LLM_BASE_URL,
+    api_key=Config.LLM_API_KEY or Config.TOGETHER_API_KEY,
+    connect_timeout=Config.LLM_CONNECT_TIMEOUT_SECONDS,
+    read_timeout=Config.LLM_CALL_TIMEOUT_SECONDS,
+    max_connections=Config.LLM_MAX_CONNECTIONS,
+)
 
-        api_key = Config.TOGETHER_API_KEY
-        if not api_key:
-            raise RuntimeError(
-                "TOGETHER_API_KEY is not set in the environment.")
+# max requests in flight to each provider from this process, to stay under
+# its rate limits however many chunks and requests are running
+provider_limits = ProviderLimits(
+    {"together": Config.TOGETHER_MAX_CONCURRENCY}, default_limit=4)
 
-        client = Together(api_key=api_key)
+# retries with backoff, Retry-After and a breaker shared by every call to
+# together from this process
+together_caller = ResilientCaller(
+    "together",
+    RetryPolicy(
+        max_attempts=Config.LLM_RETRY_ATTEMPTS,
+        base_delay=Config.LLM_RETRY_BASE_DELAY_SECONDS,
+        max_delay=Config.LLM_RETRY_MAX_DELAY_SECONDS,
+    ),
+    CircuitBreaker(
+        failure_rate=Config.LLM_BREAKER_FAILURE_RATE,
+        min_calls=Config.LLM_BREAKER_MIN_CALLS,
+        window_seconds=Config.LLM_BREAKER_WINDOW_SECONDS,
+        open_seconds=Config.LLM_BREAKER_OPEN_SECONDS,
+    ),
+    call_timeout=Config.LLM_CALL_TIMEOUT_SECONDS,
+)
 
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,  # more deterministic, less creative
-            # max_tokens=max_tokens,
-        )
- 
-        content = response.choices[0].message.content
 
-        # print(f"Response from model: {content}")
+def stream_chat_with_ollama(model: str, messages: list, max_tokens: int = 256):
+    # yields each sentence feedback object, already filtered, as soon as the
+    # model closes it. stops reading once the top level array closes so we
+    # don't wait for trailing chatter
+    try:
+        check_api_key()
+        slot = provider_limits.slot("together")
 
-        # strip extra whitespace or wrapping characters
-        content = content.strip()
-        if content.startswith("```") and content.endswith("```"):
-            content = content[3:-3].strip()
-        if content.startswith("json"):
-            content = content[4:].strip()
+        def open_stream(timeout: float):
+            # the provider slot is held until the stream is closed below, but
+            # not while backing off between attempts. waiting for it counts
+            # against the request deadline
+            remaining = remaining_time()
+            if not slot.acquire(timeout=None if remaining is None else max(0.0, remaining)):
+                raise DeadlineExceededError(
+                    "Request deadline exceeded waiting for a provider slot")
+            try:
+                return llm_client.stream_chat(
+                    model,
+                    messages,
+                    timeout=timeout,
+                    temperature=0,  # more deterministic, less creative
+                    # max_tokens=max_tokens,
+                )
+            except Exception:
+                slot.release()
+                raise
 
+        response = together_caller.call(open_stream)
+        parser = JsonArrayStreamParser()
         try:
-            start_index = content.find("[")
-            end_index = content.rfind("]") + 1
-            if start_index == -1 or end_index == -1:
-                raise ValueError("No valid JSON array found in the response.")
-
-            json_content = content[start_index:end_index]
-
-            parsed_content = json.loads(json_content)
-            
-            filtered_content = filter_superfluous_errors(parsed_content)
-
-            return filtered_content
-        
-        except json.JSONDecodeError as e:
-            print(f"JSONDecodeError: {str(e)}")
-            raise ValueError("The response from the model is not valid JSON.")
+            for delta in iter_content_deltas(response.iter_lines()):
+                for sentence in parser.feed(delta):
+                    yield from filter_superfluous_errors([sentence])
+                if parser.done:
+                    break
+                check_deadline()
+        except httpx.HTTPError as e:
+            raise StreamInterruptedError(
+                f"The model stream was interrupted: {str(e)}") from e
+        finally:
+            response.close()
+            slot.release()
+
+        check_stream_finished(parser)
+
+    # bad model output, an open circuit and a spent deadline are handled
+    # differently by callers, keep their types
+    except (ValueError, CircuitOpenError, DeadlineExceededError, StreamInterruptedError):
+        raise
     except Exception as e:
         raise RuntimeError(
-            f"An error occurred while communicating with the model: {str(e)}")
+            f"An error occurred while communicating with the model: {str(e)}") from e
+
+
+def check_api_key():
+    # a local stand-in (LLM_BASE_URL) may not need a key
+    if not llm_client.api_key and Config.LLM_BASE_URL == DEFAULT_LLM_BASE_URL:
+        raise RuntimeError(
+            "TOGETHER_API_KEY is not set in the environment.")
+
+
+def check_deadline():
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceededError("Request deadline exceeded while streaming")
+
+
+def check_stream_finished(parser: JsonArrayStreamParser):
+    if not parser.started:
+        raise ValueError("No valid JSON array found in the response.")
+    if not parser.done:
+        raise ValueError("The response from the model is not valid JSON.")
 
 
 def filter_superfluous_errors(parsed_content):
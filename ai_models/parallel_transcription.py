@@ -0,0 +1,109 @@
+# long recordings are cut at pauses into overlapping pieces that are
+# transcribed at the same time by a pool of processes, each with its own
+# asr backend, then stitched back together. the engine is only imported in
+# the pool processes
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+from ai_models.asr_backends import AsrBackend, create_asr_backend
+from app.utils.audio_utils import plan_chunks
+
+_process_backend: AsrBackend | None = None
+
+
+def _init_process(backend_name: str, model_size: str, threads: int, backend_options: dict):
+    global _process_backend
+    # share the cores between the processes instead of each one using all
+    _process_backend = create_asr_backend(
+        backend_name, model_size, threads=threads, **backend_options).load()
+
+
+def _transcribe_chunk(audio: np.ndarray, language: str, decode_options: dict) -> str:
+    return _process_backend.transcribe(audio, language, decode_options)
+
+
+def _warmup_process(_):
+    _process_backend.warmup()
+
+
+class ParallelTranscriber:
+    def __init__(self, backend_name: str, model_size: str, processes: int, threads_per_process: int = 1, chunk_seconds: float = 60, overlap_seconds: float = 1.0, backend_options: dict = None):
+        self.backend_name = backend_name
+        self.model_size = model_size
+        self.backend_options = backend_options or {}
+        self.processes = processes
+        self.threads_per_process = threads_per_process
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self._lock = threading.Lock()
+        self._pool: ProcessPoolExecutor | None = None
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        # started on first use, loading the models takes a while. spawn
+        # rather than fork, torch doesn't survive forking a threaded process
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_process,
+                    initargs=(self.backend_name, self.model_size,
+                              self.threads_per_process, self.backend_options),
+                )
+            return self._pool
+
+    def transcribe(self, audio: np.ndarray, language: str, sample_rate: int = 16000, decode_options: dict = None) -> str:
+        chunks = plan_chunks(audio, sample_rate, self.chunk_seconds, self.overlap_seconds)
+        texts = self.get_pool().map(
+            _transcribe_chunk, [audio[start:end] for start, end in chunks],
+            repeat(language), repeat(decode_options))
+        return stitch_transcripts(list(texts))
+
+    def warmup(self):
+        # submitting one task per process at once starts every process and
+        # loads every model
+        list(self.get_pool().map(_warmup_process, range(self.processes)))
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def normalize_word(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+# a single repeated word is often really said twice ("...that. That is"),
+# so it only counts as overlap when it is long enough to be unlikely
+MIN_OVERLAP_WORDS = 2
+MIN_SINGLE_OVERLAP_LENGTH = 7
+
+
+def find_overlap(previous: list, following: list, max_words: int) -> int:
+    # the most words at the end of previous that repeat at the start of
+    # following, ignoring case and punctuation
+    previous_words = [normalize_word(word) for word in previous[-max_words:]]
+    following_words = [normalize_word(word) for word in following[:max_words]]
+    for size in range(min(len(previous_words), len(following_words)), 0, -1):
+        if previous_words[-size:] != following_words[:size]:
+            continue
+        if size >= MIN_OVERLAP_WORDS or len(following_words[0]) >= MIN_SINGLE_OVERLAP_LENGTH:
+            return size
+    return 0
+
+
+def stitch_transcripts(texts: list, max_overlap_words: int = 15) -> str:
+    # pieces overlap by a second or so. words both pieces heard are taken
+    # from the later one, which also heard what came next and punctuates
+    # them better
+    words = []
+    for text in texts:
+        following = text.split()
+        overlap = find_overlap(words, following, max_overlap_words)
+        words = words[:len(words) - overlap] + following
+    return " ".join(words)
@@ -0,0 +1,91 @@
+# builds the grammar analysis prompt. everything that doesn't change between
+# calls lives in the system message so providers can cache it as a prefix;
+# only the languages and sentences go in the user message
+import json
+import math
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# bump whenever the prompt or schema changes, cached feedback is keyed on it
+PROMPT_VERSION = "2"
+
+LANGUAGE_NAMES = {
+    "en": "English",
+    "es": "Spanish",
+    "fr": "French",
+}
+
+# one object per input sentence. written once, not once per sentence
+RESPONSE_SCHEMA = '[{"original":str,"corrected":str,"errors":[{"error":str,"reason":str,"suggestion":str,"improvedClause":str,"type":str}]}]'
+
+SYSTEM_PROMPT = f"""You correct transcriptions of spoken language for language learners.
+Focus only on grammar, word choice and clarity. Ignore punctuation, capitalization and other written formatting, even if they look wrong, and never report them as errors.
+A sentence may have no errors; then return an empty "errors" array for it.
+For each error give:
+- "error": a description of the error
+- "reason": the grammatical reason for the error
+- "suggestion": how to fix it
+- "improvedClause": the corrected clause
+- "type": one of "grammar", "word choice", "pronunciation", "spelling", "punctuation", "capitalization"
+"corrected" is the whole sentence with every error fixed. Copy "original" exactly from the input.
+Reply with only a JSON array matching this schema, one object per input sentence, in input order:
+{RESPONSE_SCHEMA}"""
+
+# rough tokens of output per token of input sentence: the corrected sentence
+# plus error explanations
+OUTPUT_TOKENS_PER_INPUT_TOKEN = 4
+
+_encoding = None
+
+
+def get_language_name(language: str) -> str:
+    return LANGUAGE_NAMES.get(language, language)
+
+
+def build_grammar_messages(sentences: list, target_language: str, app_language: str) -> list:
+    user_prompt = (
+        f"Transcription language: {get_language_name(target_language)}\n"
+        f"Write explanations in: {get_language_name(app_language)}\n"
+        f"Sentences: {json.dumps([sentence.strip() for sentence in sentences], ensure_ascii=False)}"
+    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def count_tokens(text: str) -> int:
+    # exact with tiktoken installed, otherwise about four characters a token
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def count_message_tokens(messages: list) -> int:
+    # a few tokens of framing per message
+    return sum(count_tokens(message["content"]) + 4 for message in messages)
+
+
+def chunk_by_token_budget(sentences: list, max_tokens: int, max_sentences: int) -> list:
+    # groups consecutive sentences so each chunk's input plus expected output
+    # stays under max_tokens. a sentence that is over budget on its own still
+    # gets a chunk of its own
+    chunks = []
+    current = []
+    current_tokens = 0
+    for sentence in sentences:
+        tokens = count_tokens(sentence) * (1 + OUTPUT_TOKENS_PER_INPUT_TOKEN)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_sentences):
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
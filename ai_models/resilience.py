@@ -0,0 +1,266 @@
+# retries, deadlines and a circuit breaker for calls to llm providers.
+# kept free of app config so it can be reused for any provider and tested
+# on its own
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import httpx
+
+# http statuses worth retrying, everything else 4xx is our fault
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+_deadline: ContextVar[float | None] = ContextVar("llm_deadline", default=None)
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class DeadlineExceededError(TimeoutError):
+    pass
+
+
+class StreamInterruptedError(RuntimeError):
+    # the completion stream broke after it had started, worth asking again
+    pass
+
+
+@contextmanager
+def deadline(at: float | None):
+    # at is a time.monotonic() value. nested deadlines keep the earliest
+    current = _deadline.get()
+    if current is not None and (at is None or current < at):
+        at = current
+    token = _deadline.set(at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def deadline_after(seconds: float) -> float:
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    return min(at, current) if current is not None else at
+
+
+def remaining_time() -> float | None:
+    at = _deadline.get()
+    if at is None:
+        return None
+    return at - time.monotonic()
+
+
+def get_status_code(exc: Exception) -> int | None:
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def get_retry_after(exc: Exception) -> float | None:
+    # seconds from a Retry-After header, either a number or an http date
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_retryable(exc: Exception) -> bool:
+    status_code = get_status_code(exc)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    # a malformed url or a request we built wrong won't get better
+    if isinstance(exc, (httpx.UnsupportedProtocol, httpx.LocalProtocolError)):
+        return False
+    return isinstance(exc, (
+        TimeoutError, ConnectionError, httpx.TimeoutException, httpx.TransportError, StreamInterruptedError))
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0, rng: random.Random = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def compute_delay(self, attempt: int, retry_after: float = None) -> float:
+        # full jitter: anywhere between 0 and the exponential cap, so clients
+        # that failed together don't all come back together
+        cap = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = self._rng.uniform(0, cap)
+        if retry_after is not None:
+            # the provider told us when to come back, never earlier
+            delay = max(delay, retry_after)
+        return delay
+
+
+class CircuitBreaker:
+    # opens when the failure rate over the last window_seconds is above
+    # failure_rate (once there are at least min_calls), rejects calls for
+    # open_seconds, then lets one trial call through. success closes it
+    def __init__(self, failure_rate: float = 0.5, min_calls: int = 10, window_seconds: float = 60, open_seconds: float = 30, clock=time.monotonic):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = deque()
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.times_opened = 0
+
+    def _trim(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at < self.open_seconds:
+            return "open"
+        return "half_open"
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(self._clock())
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state(self._clock())
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            now = self._clock()
+            if self._opened_at is not None:
+                # trial call worked, start counting again from scratch
+                self._opened_at = None
+                self._trial_in_flight = False
+                self._outcomes.clear()
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+    def record_failure(self):
+        with self._lock:
+            now = self._clock()
+            if self._opened_at is not None:
+                # trial call failed, stay open for another period
+                self._opened_at = now
+                self._trial_in_flight = False
+                return
+            self._outcomes.append((now, False))
+            self._trim(now)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._opened_at = now
+                self.times_opened += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = self._clock()
+            self._trim(now)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                "state": self._state(now),
+                "recentCalls": len(self._outcomes),
+                "recentFailures": failures,
+                "timesOpened": self.times_opened,
+            }
+
+
+class ResilientCaller:
+    # wraps calls to one provider. fn receives the timeout for that attempt,
+    # already cut down to whatever is left of the current deadline
+    def __init__(self, name: str, policy: RetryPolicy, breaker: CircuitBreaker, call_timeout: float = 60, sleep=time.sleep):
+        self.name = name
+        self.policy = policy
+        self.breaker = breaker
+        self.call_timeout = call_timeout
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ["calls", "successes", "failures", "retries", "rejected", "deadlineExceeded"], 0)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _before_attempt(self) -> float:
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            self._count("deadlineExceeded")
+            raise DeadlineExceededError(f"{self.name}: request deadline exceeded")
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError(f"{self.name}: circuit open, failing fast")
+        self._count("calls")
+        return self.call_timeout if remaining is None else min(self.call_timeout, remaining)
+
+    def _after_failure(self, exc: Exception, attempt: int) -> float:
+        # returns how long to wait before the next attempt, or re-raises
+        if not is_retryable(exc):
+            # the provider answered, it just didn't like the request
+            self.breaker.record_success()
+            raise exc
+        self.breaker.record_failure()
+        self._count("failures")
+        if attempt >= self.policy.max_attempts:
+            raise exc
+
+        delay = self.policy.compute_delay(attempt, get_retry_after(exc))
+        remaining = remaining_time()
+        if remaining is not None and delay >= remaining:
+            # no point waiting past the deadline, give up now
+            self._count("deadlineExceeded")
+            raise exc
+        self._count("retries")
+        return delay
+
+    def call(self, fn):
+        # backs off with self._sleep on the calling thread, so keep it off
+        # the event loop
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = self._before_attempt()
+            try:
+                result = fn(timeout)
+            except DeadlineExceededError:
+                # our own budget ran out, not the provider's fault
+                self._count("deadlineExceeded")
+                raise
+            except Exception as e:
+                self._sleep(self._after_failure(e, attempt))
+                continue
+            self.breaker.record_success()
+            self._count("successes")
+            return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        return {**counters, "breaker": self.breaker.snapshot()}
@@ -1,13 +1,44 @@
-import whisper
+# the speech recognition models for this process, picked by ASR_BACKEND.
+# loaded on first use, see ai_models.asr_backends for the engines and
+# ai_models.model_tiers for which model size a recording gets
+import threading
+from ai_models.asr_backends import AsrBackend, FasterWhisperBackend, create_asr_backend
+from ai_models.model_tiers import ModelRegistry, estimate_model_memory_mb
+from app.config import Config
 from paths import MODEL_SIZE
 
-class WhisperModel:
-    def __init__(self):
-        print(f"Loading Whisper model ({MODEL_SIZE})...")
-        self.model = whisper.load_model(MODEL_SIZE)
+_model_registry: ModelRegistry | None = None
+_model_registry_lock = threading.Lock()
 
-    def transcribe(self, audio_path: str, target_language: str = "en"):
-        result = self.model.transcribe(audio_path, language=target_language)
-        return result["text"]
 
-whisper_model = WhisperModel()
+def get_asr_backend_options() -> dict:
+    # settings only some engines take
+    if Config.ASR_BACKEND == FasterWhisperBackend.name:
+        return {"compute_type": Config.ASR_COMPUTE_TYPE, "beam_size": Config.ASR_BEAM_SIZE}
+    return {}
+
+
+def load_asr_backend(model_size: str) -> AsrBackend:
+    backend = create_asr_backend(
+        Config.ASR_BACKEND, model_size, **get_asr_backend_options()).load()
+    if Config.ASR_WARMUP:
+        backend.warmup()
+    return backend
+
+
+def estimate_asr_memory_mb(model_size: str) -> int:
+    return estimate_model_memory_mb(
+        model_size, get_asr_backend_options().get("compute_type"))
+
+
+def get_model_registry() -> ModelRegistry:
+    global _model_registry
+    with _model_registry_lock:
+        if _model_registry is None:
+            _model_registry = ModelRegistry(
+                load_asr_backend, Config.ASR_MEMORY_LIMIT_MB, estimate_asr_memory_mb)
+        return _model_registry
+
+
+def get_asr_backend(model_size: str = MODEL_SIZE) -> AsrBackend:
+    return get_model_registry().get(model_size)
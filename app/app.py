@@ -1,12 +1,40 @@
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
+from ai_models.ollama_client import llm_client
 from app.config import Config
+from app.mongo.MongoClient import close_async_mongo_client, close_mongo_client, get_async_mongo_client
+from app.mongo.migrations import run_migrations, verify_hot_queries
 from app.routes.auth_route import router as auth_router
 from app.routes.user_route import router as user_router
 from app.routes.conversations_route import router as conversations_route
+from app.routes.metrics_route import router as metrics_router
+from app.services.async_database_service import user_cache
+from app.services.audio_processing_service import close_parallel_transcriber
+from app.services.conversation_job_service import start_embedded_workers, stop_embedded_workers
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # share one mongo connection pool across all requests in this process
+    get_async_mongo_client()
+    if Config.RUN_MIGRATIONS_ON_STARTUP:
+        # refuse to start if a hot query would fall back to a collection scan
+        await run_in_threadpool(run_migrations)
+        await run_in_threadpool(verify_hot_queries)
+    start_embedded_workers()
+    yield
+    stop_embedded_workers()
+    close_parallel_transcriber()
+    llm_client.close()
+    await close_async_mongo_client()
+    # the sync client only exists if something used the compatibility shim
+    close_mongo_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -25,6 +53,13 @@ app.add_middleware(
 ) 
 
 
+# memoize user lookups for the lifetime of each request
+@app.middleware("http")
+async def user_cache_scope(request: Request, call_next):
+    with user_cache.request_scope():
+        return await call_next(request)
+
+
 # @app.middleware("http")
 # async def log_cookies(request: Request, call_next):
 #     cookies = request.cookies
@@ -39,4 +74,5 @@ def home():
 
 app.include_router(auth_router)
 app.include_router(user_router)
-app.include_router(conversations_route)
\ No newline at end of file
+app.include_router(conversations_route)
+app.include_router(metrics_router)
\ No newline at end of file
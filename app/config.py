@@ -12,10 +12,111 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
     ALGORITHM = os.getenv("ALGORITHM", "HS256")
     MONGO_URI = os.getenv("MONGO_URI")
+    MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "conversant-ai")
+    # per client, a process opens up to three (see app.mongo.MongoClient)
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(
+        os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+    # /api/v1/metrics/* answer only requests with this value in the
+    # X-Metrics-Token header. unset, the endpoints are off
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+    USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+    # worker threads inside the api process, 0 when python -m app.worker
+    # runs separately
+    CONVERSATION_JOB_WORKERS = int(os.getenv("CONVERSATION_JOB_WORKERS", "2"))
+    WORK_QUEUE_LEASE_SECONDS = float(
+        os.getenv("WORK_QUEUE_LEASE_SECONDS", "120"))
+    WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+    WORK_QUEUE_RETRY_DELAY_SECONDS = float(
+        os.getenv("WORK_QUEUE_RETRY_DELAY_SECONDS", "10"))
+    WORK_QUEUE_POLL_INTERVAL_SECONDS = float(
+        os.getenv("WORK_QUEUE_POLL_INTERVAL_SECONDS", "1"))
+    RUN_MIGRATIONS_ON_STARTUP = os.getenv(
+        "RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
     ACCESS_TOKEN_EXPIRE_MINUTES = int(
         os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
     REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS"))
     TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
+    # any openai compatible chat completions api, e.g. a local stand-in
+    LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.together.xyz/v1")
+    LLM_API_KEY = os.getenv("LLM_API_KEY")
+    LLM_CONNECT_TIMEOUT_SECONDS = float(
+        os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    # chunk analyses in flight per process, and calls in flight to together
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    TOGETHER_MAX_CONCURRENCY = int(os.getenv("TOGETHER_MAX_CONCURRENCY", "4"))
+    LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "3"))
+    LLM_RETRY_BASE_DELAY_SECONDS = float(
+        os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+    LLM_RETRY_MAX_DELAY_SECONDS = float(
+        os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "8"))
+    LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "60"))
+    # total time all llm calls for one recording may take
+    LLM_REQUEST_BUDGET_SECONDS = float(
+        os.getenv("LLM_REQUEST_BUDGET_SECONDS", "90"))
+    LLM_BREAKER_FAILURE_RATE = float(
+        os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+    LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+    LLM_BREAKER_WINDOW_SECONDS = float(
+        os.getenv("LLM_BREAKER_WINDOW_SECONDS", "60"))
+    LLM_BREAKER_OPEN_SECONDS = float(
+        os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+    # sentences go to the model in chunks of about this many tokens, counting
+    # the expected reply
+    LLM_CHUNK_TOKEN_BUDGET = int(os.getenv("LLM_CHUNK_TOKEN_BUDGET", "1200"))
+    LLM_CHUNK_MAX_SENTENCES = int(os.getenv("LLM_CHUNK_MAX_SENTENCES", "12"))
+    # grammar feedback per sentence, in memory and in the feedbackCache
+    # collection
+    FEEDBACK_CACHE_SIZE = int(os.getenv("FEEDBACK_CACHE_SIZE", "4096"))
+    FEEDBACK_CACHE_TTL_SECONDS = float(
+        os.getenv("FEEDBACK_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    # longer recordings are rejected before they are decoded
+    MAX_AUDIO_SECONDS = float(os.getenv("MAX_AUDIO_SECONDS", "600"))
+    # cut silence before transcription. spectral flatness also rejects loud
+    # steady noise but costs an fft per frame
+    VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+    VAD_SPECTRAL_FLATNESS = os.getenv(
+        "VAD_SPECTRAL_FLATNESS", "false").lower() == "true"
+    # speech recognition engine: openai-whisper (fp32 pytorch) or
+    # faster-whisper (ctranslate2, int8 on cpu by default)
+    ASR_BACKEND = os.getenv("ASR_BACKEND", "openai-whisper")
+    ASR_COMPUTE_TYPE = os.getenv("ASR_COMPUTE_TYPE", "int8")
+    ASR_BEAM_SIZE = int(os.getenv("ASR_BEAM_SIZE", "5"))
+    ASR_WARMUP = os.getenv("ASR_WARMUP", "true").lower() == "true"
+    # recordings with more speech than LONG_AUDIO_SECONDS are cut at pauses
+    # and transcribed by TRANSCRIBE_PROCESSES processes at once, each with
+    # its own model (and memory). 1 keeps every recording on one model
+    TRANSCRIBE_PROCESSES = int(os.getenv("TRANSCRIBE_PROCESSES", "1"))
+    TRANSCRIBE_THREADS_PER_PROCESS = int(os.getenv(
+        "TRANSCRIBE_THREADS_PER_PROCESS",
+        str(max(1, (os.cpu_count() or 1) // max(1, TRANSCRIBE_PROCESSES)))))
+    LONG_AUDIO_SECONDS = float(os.getenv("LONG_AUDIO_SECONDS", "120"))
+    TRANSCRIBE_SEGMENT_SECONDS = float(
+        os.getenv("TRANSCRIBE_SEGMENT_SECONDS", "60"))
+    TRANSCRIBE_OVERLAP_SECONDS = float(
+        os.getenv("TRANSCRIBE_OVERLAP_SECONDS", "1"))
+    # pick the model size and decode options per recording from its length,
+    # language and how busy transcription is, see ai_models.model_tiers.
+    # off, every recording gets MODEL_SIZE with the engine's defaults
+    MODEL_TIERS_ENABLED = os.getenv(
+        "MODEL_TIERS_ENABLED", "false").lower() == "true"
+    SHORT_CLIP_SECONDS = float(os.getenv("SHORT_CLIP_SECONDS", "20"))
+    # queued audio jobs plus transcriptions running in this process at which
+    # every recording gets the fast tier, 0 never
+    MODEL_TIER_BUSY_JOBS = int(os.getenv("MODEL_TIER_BUSY_JOBS", "4"))
+    ENGLISH_ONLY_MODELS = os.getenv(
+        "ENGLISH_ONLY_MODELS", "true").lower() == "true"
+    # estimated memory the loaded models may use before the least recently
+    # used one is unloaded
+    ASR_MEMORY_LIMIT_MB = int(os.getenv("ASR_MEMORY_LIMIT_MB", "2048"))
+    # transcriptions of recent uploads by sha256, per process
+    TRANSCRIPTION_CACHE_SIZE = int(os.getenv("TRANSCRIPTION_CACHE_SIZE", "256"))
+    TRANSCRIPTION_CACHE_TTL_SECONDS = float(
+        os.getenv("TRANSCRIPTION_CACHE_TTL_SECONDS", str(24 * 3600)))
     EMAIL_USER = os.getenv("EMAIL_USER")
     EMAIL_PASS = os.getenv("EMAIL_PASS")
     AURELIA_REDIRECT_URI = os.getenv("AURELIA_REDIRECT_URI")
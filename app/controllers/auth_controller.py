@@ -1,21 +1,22 @@
 import secrets
-from app.services.database_service import create_user
+from app.services.async_database_service import create_user
 import logging
 from app.config import Config
 from app.services.email_service import send_email_verification, send_email_verified_notification, send_password_change_notification, send_password_reset_email
 from app.utils.auth_utils import create_and_return_auth_tokens, create_email_verification_code, create_password_reset_code, verify_email_verification_code, verify_password_reset_code, ALGORITHM, SECRET_KEY, verify_password, hash_password
-from app.services.database_service import delete_all_conversations_by_user_id, delete_user_by_id, update_user_details_in_db, get_user_by_email, create_user, get_user_by_id, get_user_by_refresh_token, update_user_password_in_db
+from app.services.async_database_service import delete_all_conversations_by_user_id, delete_user_by_id, update_user_details_in_db, get_user_by_email, create_user, get_user_by_id, get_user_by_refresh_token, update_user_password_in_db
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import RedirectResponse
 import jwt
 from jose import jwt
 from app.services.oauth_service import oauth
 
 
-def register_anonymous_user():
+async def register_anonymous_user():
     user_secret = secrets.token_urlsafe(32)
 
-    user_id = create_user(
+    user_id = await create_user(
         user_email=None,
         hashed_password=None,
         email_verified=True,
@@ -24,7 +25,7 @@ def register_anonymous_user():
         is_anonymous=True,
         anon_user_secret=user_secret
     )
-    response = create_and_return_auth_tokens(user_id)
+    response = await create_and_return_auth_tokens(user_id)
     response.update({
         "userId": user_id,
         "userSecret": user_secret
@@ -32,26 +33,26 @@ def register_anonymous_user():
     return response
 
 
-def restore_anonymous_user(user_id: str, user_secret: str):
-    user = get_user_by_id(user_id)
+async def restore_anonymous_user(user_id: str, user_secret: str):
+    user = await get_user_by_id(user_id, fresh=True)
     if not user or not user.get("isAnonymous"):
         raise HTTPException(status_code=404, detail="Anonymous user not found")
     if user.get("anonUserSecret") != user_secret:
         raise HTTPException(status_code=403, detail="Invalid user secret")
-    return create_and_return_auth_tokens(user_id)
+    return await create_and_return_auth_tokens(user_id)
 
 
-def upgrade_anonymous_user(user_id: str, user_secret: str, user_email: str, password: str):
-    user = get_user_by_id(user_id)
+async def upgrade_anonymous_user(user_id: str, user_secret: str, user_email: str, password: str):
+    user = await get_user_by_id(user_id, fresh=True)
     if not user or not user.get("isAnonymous"):
         raise HTTPException(status_code=404, detail="Anonymous user not found")
     if user.get("anonUserSecret") != user_secret:
         raise HTTPException(status_code=403, detail="Invalid user secret")
-    if get_user_by_email(user_email):
+    if await get_user_by_email(user_email, fresh=True):
         raise HTTPException(status_code=400, detail="Email already exists")
 
-    hashed_password = hash_password(password)
-    update_user_details_in_db(
+    hashed_password = await run_in_threadpool(hash_password, password)
+    await update_user_details_in_db(
         user_id,
         {
             "userEmail": user_email.strip().lower(),
@@ -61,85 +62,85 @@ def upgrade_anonymous_user(user_id: str, user_secret: str, user_email: str, pass
             "emailVerified": False,
         }
     )
-    response = create_and_return_auth_tokens(user_id)
+    response = await create_and_return_auth_tokens(user_id)
     response.update({
         "userId": user_id,
     })
     return response
 
 
-def login_user(user_email: str, password: str):
+async def login_user(user_email: str, password: str):
     if not user_email or not password:
         raise HTTPException(
             status_code=400, detail="Email and password are required"
         )
 
-    # get user from database
-    user = get_user_by_email(user_email)
+    # get user from database, not the cache, which may be stale on this worker
+    user = await get_user_by_email(user_email, fresh=True)
 
     if user and user.get("oauthProvider") == "google":
         raise HTTPException(
             status_code=405, detail="This account uses Google sign-in. Please use 'Sign in with Google' instead.")
 
-    if not user or not verify_password(password, user["password"]):
+    if not user or not await run_in_threadpool(verify_password, password, user["password"]):
         raise HTTPException(
             status_code=401, detail="Invalid email or password"
         )
 
     # return access and refresh tokens
-    return create_and_return_auth_tokens(user["userId"])
+    return await create_and_return_auth_tokens(user["userId"])
 
 
-def register_user(user_email: str, password: str):
-    user = get_user_by_email(user_email)
+async def register_user(user_email: str, password: str):
+    user = await get_user_by_email(user_email, fresh=True)
     if user:
         raise HTTPException(status_code=400, detail="email already exists")
 
     # hash token
-    hashed_password = hash_password(password)
-    create_user(user_email, hashed_password)
+    hashed_password = await run_in_threadpool(hash_password, password)
+    await create_user(user_email, hashed_password)
 
     return {"message": "User registered successfully"}
 
 
-def request_email_verification(user_id: str):
-    user = get_user_by_id(user_id)
+async def request_email_verification(user_id: str):
+    user = await get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if user and user.get("oauthProvider") == "google":
         raise HTTPException(
             status_code=400, detail="Google sign-in users cannot set or reset their email.")
 
-    code = create_email_verification_code(user_id)
+    code = await create_email_verification_code(user_id)
 
-    send_email_verification(user["userEmail"], code)
+    await run_in_threadpool(send_email_verification, user["userEmail"], code)
 
     return {"success": True, "message": "Verification email sent to your address."}
 
 
-def verify_email(user_id: str, code: str):
-    user = get_user_by_id(user_id)
+async def verify_email(user_id: str, code: str):
+    user = await get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not verify_email_verification_code(user_id, code):
+    if not await verify_email_verification_code(user_id, code):
         raise HTTPException(status_code=400, detail="Invalid or expired code")
 
-    update_user_details_in_db(user_id, {"emailVerified": True})
+    await update_user_details_in_db(user_id, {"emailVerified": True})
 
-    send_email_verified_notification(user_email=user["userEmail"])
+    await run_in_threadpool(send_email_verified_notification, user_email=user["userEmail"])
 
     return {"success": True, "message": "Email address verified!"}
 
 
-def delete_user(user_id: str):
-    user = get_user_by_id(user_id)
+async def delete_user(user_id: str):
+    user = await get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    delete_all_conversations_by_user_id(user_id)
+    await delete_all_conversations_by_user_id(user_id)
 
-    delete_result = delete_user_by_id(user_id)
+    delete_result = await delete_user_by_id(user_id)
     if not delete_result:
         raise HTTPException(
             status_code=500, detail="Failed to delete user account")
@@ -147,7 +148,7 @@ def delete_user(user_id: str):
     return {"success": True, "message": "User account deleted successfully"}
 
 
-def refresh_user_token(refresh_token: str):
+async def refresh_user_token(refresh_token: str):
     # validate refresh token
     try:
         payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -162,23 +163,23 @@ def refresh_user_token(refresh_token: str):
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
     # check if refresh token exists in database
-    user = get_user_by_refresh_token(refresh_token)
+    user = await get_user_by_refresh_token(refresh_token)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-    return create_and_return_auth_tokens(user["userId"])
+    return await create_and_return_auth_tokens(user["userId"])
 
 
-def update_user_password(user_id: str, current_password: str, new_password: str):
+async def update_user_password(user_id: str, current_password: str, new_password: str):
 
-    user = get_user_by_id(user_id)
+    user = await get_user_by_id(user_id, fresh=True)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if user.get("oauthProvider") == "google":
         raise HTTPException(
             status_code=403, detail="Google sign-in users cannot set or reset a password.")
 
-    if not verify_password(current_password, user["password"]):
+    if not await run_in_threadpool(verify_password, current_password, user["password"]):
         raise HTTPException(
             status_code=403, detail="Current password is incorrect")
 
@@ -186,13 +187,13 @@ def update_user_password(user_id: str, current_password: str, new_password: str)
         raise HTTPException(
             status_code=400, detail="Password must be at least 8 characters long")
 
-    if verify_password(new_password, user["password"]):
+    if await run_in_threadpool(verify_password, new_password, user["password"]):
         raise HTTPException(
             status_code=400, detail="New password cannot be the same as the current password")
 
-    hashed_password = hash_password(new_password)
+    hashed_password = await run_in_threadpool(hash_password, new_password)
 
-    update_result = update_user_password_in_db(user_id, hashed_password)
+    update_result = await update_user_password_in_db(user_id, hashed_password)
 
     # Check if the update was successful
     if update_result.modified_count == 0:
@@ -200,13 +201,13 @@ def update_user_password(user_id: str, current_password: str, new_password: str)
             status_code=500, detail="Failed to update the password. Please try again later."
         )
 
-    send_password_change_notification(user["userEmail"])
+    await run_in_threadpool(send_password_change_notification, user["userEmail"])
 
     return {"success": True, "message": "Password updated successfully"}
 
 
-def request_password_reset(user_email: str):
-    user = get_user_by_email(user_email)
+async def request_password_reset(user_email: str):
+    user = await get_user_by_email(user_email, fresh=True)
     if user and user.get("oauthProvider") == "google":
         raise HTTPException(
             status_code=403,
@@ -216,14 +217,14 @@ def request_password_reset(user_email: str):
     if not user:
         return {"success": True, "message": "If this email is registered, a reset link has been sent."}
 
-    reset_code = create_password_reset_code(user["userId"])
-    send_password_reset_email(user_email, reset_code)
+    reset_code = await create_password_reset_code(user["userId"])
+    await run_in_threadpool(send_password_reset_email, user_email, reset_code)
 
     return {"success": True, "message": "If this email is registered, a reset link has been sent."}
 
 
-def reset_password(email: str, code: str, new_password: str):
-    user = get_user_by_email(email)
+async def reset_password(email: str, code: str, new_password: str):
+    user = await get_user_by_email(email, fresh=True)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if user.get("oauthProvider") == "google":
@@ -233,17 +234,17 @@ def reset_password(email: str, code: str, new_password: str):
         raise HTTPException(
             status_code=400, detail="Password must be at least 8 characters long")
 
-    if not verify_password_reset_code(user["userId"], code):
+    if not await verify_password_reset_code(user["userId"], code):
         raise HTTPException(status_code=400, detail="Invalid or expired code")
 
-    hashed_password = hash_password(new_password)
-    update_result = update_user_password_in_db(user["userId"], hashed_password)
+    hashed_password = await run_in_threadpool(hash_password, new_password)
+    update_result = await update_user_password_in_db(user["userId"], hashed_password)
 
     if update_result.modified_count == 0:
         raise HTTPException(
             status_code=500, detail="Failed to reset the password. Please try again later.")
 
-    send_password_change_notification(user["userEmail"])
+    await run_in_threadpool(send_password_change_notification, user["userEmail"])
 
     return {"success": True, "message": "Password has been reset successfully"}
 
@@ -279,7 +280,7 @@ async def google_callback(request):
             raise HTTPException(
                 status_code=400, detail="Failed to retrieve user info")
 
-        tokens = process_google_user(user_info)
+        tokens = await process_google_user(user_info)
         access_token = tokens["accessToken"]
         refresh_token = tokens["refreshToken"]
 
@@ -296,7 +297,7 @@ async def google_callback(request):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-def process_google_user(user_info: dict):
+async def process_google_user(user_info: dict):
     logger.info("Processing Google user")
     user_email = user_info.get("email")
     oauth_user_id = user_info.get("sub")
@@ -307,7 +308,7 @@ def process_google_user(user_info: dict):
             status_code=400, detail="Google account did not return required information."
         )
 
-    user = get_user_by_email(user_email)
+    user = await get_user_by_email(user_email)
     logger.debug(f"User found by email: {user}")
 
     if user:
@@ -319,10 +320,10 @@ def process_google_user(user_info: dict):
                 detail="An account with this email already exists. Please log in with your password."
             )
         logger.info("Returning tokens for existing Google user")
-        return create_and_return_auth_tokens(user["userId"])
+        return await create_and_return_auth_tokens(user["userId"])
 
     logger.info("Creating new Google user")
-    create_user(
+    await create_user(
         user_email=user_email,
         hashed_password=None,
         email_verified=True,
@@ -330,9 +331,9 @@ def process_google_user(user_info: dict):
         oauth_user_id=oauth_user_id,
     )
 
-    user = get_user_by_email(user_email)
+    user = await get_user_by_email(user_email)
     logger.info("Returning tokens for newly created Google user")
-    return create_and_return_auth_tokens(user["userId"])
+    return await create_and_return_auth_tokens(user["userId"])
 ##
 ##
 ##
@@ -383,7 +384,7 @@ async def apple_callback(request):
             raise HTTPException(
                 status_code=400, detail="Apple account did not return required information.")
 
-        tokens = process_apple_user(user_info)
+        tokens = await process_apple_user(user_info)
         access_token = tokens["accessToken"]
         refresh_token = tokens["refreshToken"]
 
@@ -400,7 +401,7 @@ async def apple_callback(request):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-def process_apple_user(user_info: dict):
+async def process_apple_user(user_info: dict):
     logger.info("Processing Apple user")
     user_email = user_info.get("email")
     oauth_user_id = user_info.get("sub")
@@ -410,7 +411,7 @@ def process_apple_user(user_info: dict):
             status_code=400, detail="Apple account did not return required information."
         )
 
-    user = get_user_by_email(user_email)
+    user = await get_user_by_email(user_email)
     logger.debug(f"User found by email: {user}")
 
     if user:
@@ -422,9 +423,9 @@ def process_apple_user(user_info: dict):
                 detail="An account with this email already exists. Please log in with your password."
             )
         logger.info("Returning tokens for existing Apple user")
-        return create_and_return_auth_tokens(user["userId"])
+        return await create_and_return_auth_tokens(user["userId"])
 
-    create_user(
+    await create_user(
         user_email=user_email,
         hashed_password=None,
         email_verified=True,
@@ -432,6 +433,6 @@ def process_apple_user(user_info: dict):
         oauth_user_id=oauth_user_id,
     )
 
-    user = get_user_by_email(user_email)
+    user = await get_user_by_email(user_email)
     logger.info("Returning tokens for newly created Apple user")
-    return create_and_return_auth_tokens(user["userId"])
+    return await create_and_return_auth_tokens(user["userId"])
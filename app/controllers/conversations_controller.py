@@ -1,37 +1,47 @@
-from app.services.database_service import delete_correction_from_conversation, get_conversation_by_user_id
+from app.services.async_database_service import delete_correction_from_conversation, get_conversation_by_user_id, get_conversation_with_feedback
 import logging
-from app.services.database_service import delete_conversation_by_id, search_conversations_in_db
+from app.services.async_database_service import delete_conversation_by_id, search_conversations_in_db, search_conversations_ranked
 from fastapi import HTTPException, UploadFile, File
-from app.schemas.reponse_schemas.conversation_response_schema import ConversationResponse
-from app.services.audio_processing_service import format_and_transcribe_audio
-from app.services.database_service import get_user_by_id, upsert_conversation, get_conversations_by_user_id
-from app.services.grammar_service import correct_grammar
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.schemas.reponse_schemas.conversation_job_response_schema import ConversationJobData, ConversationJobResponse
+from app.services.async_database_service import create_conversation_job, get_conversation_job
+from app.services.conversation_job_service import JOB_STAGES, enqueue_conversation_job
+from app.services.upload_storage import store_upload
+from app.schemas.reponse_schemas.conversation_response_schema import ConversationData, ConversationResponse
+from app.services.audio_processing_service import cache_transcription, format_and_transcribe_audio, get_cached_transcription, prepare_audio, remove_files, save_upload, transcribe_audio
+from app.services.async_database_service import get_user_by_id, upsert_conversation, get_conversations_by_user_id
+from app.services.grammar_service import assign_ids_to_feedback, build_analysis, correct_grammar, iter_chunk_feedback
+from app.utils.pagination_utils import decode_cursor
+from app.utils.sse_utils import SSE_HEADERS, format_sse
 
 logger = logging.getLogger(__name__)
 
 
-def add_new_conversation(user_id: str, file: UploadFile = File(...)) -> ConversationResponse:
+async def add_new_conversation(user_id: str, file: UploadFile = File(...)) -> ConversationResponse:
     try:
         logger.info(f"Starting add_new_conversation for user_id: {user_id}")
 
-        user = get_user_by_id(user_id)
+        user = await get_user_by_id(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
         logger.info("User found, starting transcription")
-        transcription = format_and_transcribe_audio(file, user)
+        # whisper and the llm calls are blocking, keep them off the event loop
+        transcription, audio_metadata = await run_in_threadpool(format_and_transcribe_audio, file, user)
 
         print(f"Transcription result: {transcription}")
 
         logger.info("Transcription completed, starting grammar correction")
-        response = correct_grammar(transcription, user)
+        response = await run_in_threadpool(correct_grammar, transcription, user)
         if not response["success"]:
             logger.error(f"Grammar correction failed: {response['error']}")
             raise HTTPException(status_code=422, detail=response["error"])
 
         logger.info("Grammar correction successful, upserting conversation")
-        conversation = upsert_conversation(response, user_id)
+        conversation = await upsert_conversation(response, user_id)
         logger.info("Conversation upserted successfully")
+        conversation.metadata = audio_metadata
         return conversation
 
     except ValueError as e:
@@ -47,36 +57,190 @@ def add_new_conversation(user_id: str, file: UploadFile = File(...)) -> Conversa
         )
 
 
-def get_conversations(user_id: str, page: int, limit: int) -> ConversationResponse:
-    return get_conversations_by_user_id(user_id, page, limit)
+async def stream_new_conversation(user_id: str, file: UploadFile = File(...)) -> StreamingResponse:
+    user = await get_user_by_id(user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
 
+    # the upload is closed once the handler returns, before the stream runs
+    try:
+        file_path, content_hash = await run_in_threadpool(save_upload, file)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to save file: {str(e)}")
+
+    return StreamingResponse(
+        conversation_events(user, file_path, content_hash),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
-def search_conversations(user_id: str, query: str, page: int, limit: int):
+
+async def conversation_events(user, file_path: str, content_hash: str):
+    # server sent events: transcription once whisper is done, then feedback
+    # for each chunk as its llm call finishes, then done with the saved
+    # conversation id. failures end the stream with an error event
+    try:
+        cached = get_cached_transcription(content_hash, user["targetLanguage"])
+        if cached is not None:
+            transcription, audio_metadata = cached
+        else:
+            audio, audio_metadata = await run_in_threadpool(prepare_audio, file_path)
+            transcription, model_metadata = await run_in_threadpool(transcribe_audio, audio, user["targetLanguage"])
+            audio_metadata.update(model_metadata)
+            cache_transcription(content_hash, user["targetLanguage"], transcription, audio_metadata)
+        yield format_sse("transcription", {"originalText": transcription, "metadata": audio_metadata})
+
+        # cached sentences are sent first, the rest one by one as the model
+        # finishes each. chunkIndex is the position of the first sentence in
+        # the event, clients order by it
+        feedback_by_chunk = {}
+        chunks = iter_chunk_feedback(
+            transcription, user["targetLanguage"], user["appLanguage"])
+        async for chunk_index, feedback in iterate_in_threadpool(chunks):
+            # the same ids are saved below, so clients can act on them now
+            feedback = assign_ids_to_feedback([
+                item for item in feedback
+                if "original" in item and "corrected" in item and "errors" in item
+            ])
+            if not feedback:
+                continue
+            feedback_by_chunk[chunk_index] = feedback
+            yield format_sse("feedback", {"chunkIndex": chunk_index, "sentenceFeedback": feedback})
+
+        sentence_feedback = [
+            item for index in sorted(feedback_by_chunk) for item in feedback_by_chunk[index]
+        ]
+        if not sentence_feedback:
+            yield format_sse("error", {
+                "error": "Failed to process transcription. No valid feedback was generated.",
+                "statusCode": 422,
+            })
+            return
+
+        response = {"success": True, "data": build_analysis(
+            transcription, sentence_feedback), "error": None}
+        conversation = await upsert_conversation(response, user["userId"])
+        if not conversation.success:
+            yield format_sse("error", {"error": conversation.error, "statusCode": 500})
+            return
+
+        yield format_sse("done", {"conversationId": conversation.data[0].conversationId})
+
+    except ValueError as e:
+        logger.error(f"ValueError: {str(e)}")
+        yield format_sse("error", {"error": str(e), "statusCode": 422})
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        yield format_sse("error", {
+            "error": f"An unexpected error occurred: {str(e)}",
+            "statusCode": 500,
+        })
+    finally:
+        remove_files(file_path)
+
+
+async def start_conversation_job(user_id: str, file: UploadFile = File(...)) -> JSONResponse:
+    user = await get_user_by_id(user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # the upload is gone once this request finishes, so keep a copy in
+    # gridfs where a worker on any node can read it
+    try:
+        upload_id = await run_in_threadpool(store_upload, file, user_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to save file: {str(e)}")
+
+    job_id = await create_conversation_job(user_id, JOB_STAGES)
+    await run_in_threadpool(enqueue_conversation_job, job_id, user_id, upload_id, file.filename or "")
+    logger.info(f"Queued conversation job {job_id} for user_id: {user_id}")
+
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "data": {
+            "jobId": job_id,
+            "status": "queued",
+            "statusUrl": f"/api/v1/conversations/jobs/{job_id}",
+        },
+        "error": None,
+    })
+
+
+async def get_conversation_job_status(job_id: str, user_id: str) -> ConversationJobResponse:
+    job = await get_conversation_job(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return ConversationJobResponse(
+        success=True,
+        data=ConversationJobData(**job),
+        error=None
+    )
+
+
+def parse_cursor(cursor: str | None):
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def get_conversations(user_id: str, page: int, limit: int, cursor: str = None, include_total: bool = True, view: str = "full") -> ConversationResponse:
+    after = parse_cursor(cursor)
+    return await get_conversations_by_user_id(user_id, page, limit, after, include_total, view)
+
+
+async def search_conversations(user_id: str, query: str, page: int, limit: int, cursor: str = None, include_total: bool = True, view: str = "full", error_type: str = None, sort: str = "relevance"):
+    after = parse_cursor(cursor)
     if not query.strip():
-        return get_conversations_by_user_id(user_id, page, limit)
+        return await get_conversations_by_user_id(user_id, page, limit, after, include_total, view)
+
+    if sort == "recent":
+        # newest first $text search, supports cursor pagination
+        return await search_conversations_in_db(user_id, query, page, limit, after, include_total, view)
+
+    if after:
+        # relevance order has no stable key to seek past, use page
+        raise HTTPException(
+            status_code=400, detail="cursor is not supported with sort=relevance")
+    return await search_conversations_ranked(user_id, query, page, limit, include_total, view, error_type)
+
+
+async def get_conversation(conversation_id: str, user_id: str) -> ConversationResponse:
+    conversation = await get_conversation_with_feedback(user_id, conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
 
-    return search_conversations_in_db(user_id, query, page, limit)
+    return ConversationResponse(
+        success=True,
+        data=[ConversationData(**conversation)],
+        error=None
+    )
 
 
-def delete_conversation(conversation_id: str, user_id: str):
-    conversation = get_conversation_by_user_id(user_id, conversation_id)
+async def delete_conversation(conversation_id: str, user_id: str):
+    conversation = await get_conversation_by_user_id(user_id, conversation_id)
     if not conversation:
         raise HTTPException(
             status_code=403, detail="Not authorized to modify this conversation")
 
-    success = delete_conversation_by_id(conversation_id)
+    success = await delete_conversation_by_id(conversation_id)
     if not success:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return {"success": True, "message": "Conversation deleted successfully"}
 
 
-def delete_correction(conversation_id: str, correction_id: str, user_id: str, ):
-    conversation = get_conversation_by_user_id(user_id, conversation_id)
+async def delete_correction(conversation_id: str, correction_id: str, user_id: str, ):
+    conversation = await get_conversation_by_user_id(user_id, conversation_id)
     if not conversation:
         raise HTTPException(
             status_code=403, detail="Not authorized to modify this conversation")
 
-    success = delete_correction_from_conversation(
+    success = await delete_correction_from_conversation(
         conversation_id, correction_id)
     if not success:
         raise HTTPException(status_code=404, detail="Correction not found")
@@ -0,0 +1,40 @@
+from ai_models.ollama_client import together_caller
+from ai_models.whisper_model import get_model_registry
+from app.mongo.MongoClient import get_pool_stats
+from app.services.async_database_service import user_cache
+from app.services.audio_processing_service import transcription_cache
+from app.services.conversation_job_service import get_work_queue
+from app.services.grammar_service import get_feedback_cache
+
+
+def get_mongo_pool_metrics():
+    return {"success": True, "data": get_pool_stats(), "error": None}
+
+
+def get_user_cache_metrics():
+    return {"success": True, "data": user_cache.snapshot(), "error": None}
+
+
+def get_work_queue_metrics():
+    # job counts by kind and status
+    return {"success": True, "data": get_work_queue().stats(), "error": None}
+
+
+def get_llm_metrics():
+    # retry counters and circuit breaker state per provider
+    return {"success": True, "data": {"together": together_caller.snapshot()}, "error": None}
+
+
+def get_feedback_cache_metrics():
+    # how often sentence feedback came from the cache instead of the llm
+    return {"success": True, "data": get_feedback_cache().snapshot(), "error": None}
+
+
+def get_transcription_cache_metrics():
+    # uploads that skipped conversion and whisper
+    return {"success": True, "data": transcription_cache.snapshot(), "error": None}
+
+
+def get_asr_model_metrics():
+    # which whisper models this process holds and how often they were swapped
+    return {"success": True, "data": get_model_registry().snapshot(), "error": None}
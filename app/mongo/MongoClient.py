@@ -1,7 +1,114 @@
-from pymongo import MongoClient
+import asyncio
+import logging
+import threading
+from pymongo import AsyncMongoClient, MongoClient
 from app.config import Config
+from app.mongo.pool_stats import PoolStatsListener
 
-def get_mongo_client():
-    mongo_uri = Config.MONGO_URI
-    client = MongoClient(mongo_uri)
-    return client
+logger = logging.getLogger(__name__)
+
+# a process opens up to three clients, each with its own pool of up to
+# MONGO_MAX_POOL_SIZE connections:
+#   sync: GridFS uploads, the work queue, the feedback cache and migrations
+#   async: the server loop, used by every route
+#   asyncShim: the database_service loop that worker threads go through
+# each pool has its own listener so the metrics show them apart
+
+# one client per process. MongoClient is thread safe and owns its own
+# connection pool, so every request shares it instead of building a new one
+_client: MongoClient | None = None
+_client_lock = threading.Lock()
+
+# AsyncMongoClient is bound to the event loop it runs on, so keep one per loop.
+# in practice that is the server loop plus the sync shim loop in database_service
+_async_clients: dict[asyncio.AbstractEventLoop, AsyncMongoClient] = {}
+_loop_labels: dict[asyncio.AbstractEventLoop, str] = {}
+
+_pool_listeners: dict[str, PoolStatsListener] = {}
+_pool_listeners_lock = threading.Lock()
+
+
+def get_pool_listener(label: str) -> PoolStatsListener:
+    with _pool_listeners_lock:
+        listener = _pool_listeners.get(label)
+        if listener is None:
+            listener = PoolStatsListener()
+            _pool_listeners[label] = listener
+        return listener
+
+
+def label_event_loop(loop: asyncio.AbstractEventLoop, label: str):
+    # names the pool of the async client created on loop, the default is async
+    with _client_lock:
+        _loop_labels[loop] = label
+
+
+def _client_options(label: str) -> dict:
+    return {
+        "maxPoolSize": Config.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": Config.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": Config.MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": Config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "event_listeners": [get_pool_listener(label)],
+    }
+
+
+def init_mongo_client() -> MongoClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            logger.info("Creating shared MongoClient")
+            _client = MongoClient(Config.MONGO_URI, **_client_options("sync"))
+        return _client
+
+
+def get_mongo_client() -> MongoClient:
+    # falls back to lazy creation for scripts and tests that skip app startup
+    if _client is None:
+        return init_mongo_client()
+    return _client
+
+
+def close_mongo_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            logger.info("Closing shared MongoClient")
+            _client.close()
+            _client = None
+
+
+def get_async_mongo_client() -> AsyncMongoClient:
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            label = _loop_labels.get(loop, "async")
+            logger.info(f"Creating shared AsyncMongoClient ({label})")
+            client = AsyncMongoClient(Config.MONGO_URI, **_client_options(label))
+            _async_clients[loop] = client
+        return client
+
+
+async def close_async_mongo_client():
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_clients.pop(loop, None)
+    if client is not None:
+        logger.info("Closing shared AsyncMongoClient")
+        await client.close()
+
+
+def get_pool_stats() -> dict:
+    # totals over every pool in the process, and each pool by label
+    with _pool_listeners_lock:
+        listeners = dict(_pool_listeners)
+    pools = {label: listener.snapshot() for label, listener in listeners.items()}
+    stats = {
+        name: sum(pool[name] for pool in pools.values())
+        for name in PoolStatsListener().snapshot()
+    }
+    stats["maxPoolSize"] = Config.MONGO_MAX_POOL_SIZE
+    stats["maxConnections"] = Config.MONGO_MAX_POOL_SIZE * len(pools)
+    stats["pools"] = pools
+    return stats
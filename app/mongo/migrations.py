@@ -0,0 +1,344 @@
+# versioned index and schema migrations.
+# runs at app startup (see app.app lifespan) or by hand:
+#   python -m app.mongo.migrations            apply pending migrations, then verify
+#   python -m app.mongo.migrations --verify   only check the hot queries
+import argparse
+import logging
+import re
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, TEXT, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.config import Config
+from app.mongo.MongoClient import get_mongo_client
+from app.mongo.schemas.db_conversation_schema import PREVIEW_SIZE
+from app.utils.pagination_utils import CONVERSATION_SORT, build_after_filter
+from app.utils.search_utils import build_search_fields
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "schemaMigrations"
+
+
+def get_database():
+    return get_mongo_client()[Config.MONGO_DB_NAME]
+
+
+def _create_core_indexes(db):
+    users = db["users"]
+    users.create_index([("userId", ASCENDING)],
+                       name="userId_unique", unique=True)
+    # anonymous users store userEmail as null, so only enforce uniqueness on
+    # real addresses. an equality match on a string satisfies $gt "" so the
+    # planner can still use this index for get_user_by_email
+    users.create_index(
+        [("userEmail", ASCENDING)],
+        name="userEmail_unique",
+        unique=True,
+        partialFilterExpression={"userEmail": {"$gt": ""}},
+    )
+    users.create_index([("refreshToken", ASCENDING)], name="refreshToken")
+
+    conversations = db["conversations"]
+    conversations.create_index(
+        [("conversationId", ASCENDING)], name="conversationId_unique", unique=True)
+    conversations.create_index(
+        [("userId", ASCENDING), ("createdAt", DESCENDING)], name="userId_createdAt")
+
+    # only one text index is allowed per collection. replace any hand-made
+    # one with a compound index so $text searches are scoped to one user
+    for index in conversations.list_indexes():
+        if "textIndexVersion" in index and index["name"] != "userId_originalText_text":
+            logger.info(f"Dropping existing text index {index['name']}")
+            conversations.drop_index(index["name"])
+    conversations.create_index(
+        [("userId", ASCENDING), ("originalText", TEXT)], name="userId_originalText_text")
+
+    codes = db["verificationCodes"]
+    codes.create_index(
+        [("userId", ASCENDING), ("purpose", ASCENDING)], name="userId_purpose")
+    # let mongo clean up expired codes on its own
+    codes.create_index([("expiresAt", ASCENDING)],
+                       name="expiresAt_ttl", expireAfterSeconds=0)
+
+
+def _add_conversation_keyset_index(db):
+    # keyset pagination sorts on (createdAt, conversationId). this index also
+    # covers every query userId_createdAt served, so drop the old one
+    conversations = db["conversations"]
+    conversations.create_index(
+        [("userId", ASCENDING), ("createdAt", DESCENDING),
+         ("conversationId", DESCENDING)],
+        name="userId_createdAt_conversationId")
+    if "userId_createdAt" in conversations.index_information():
+        conversations.drop_index("userId_createdAt")
+
+
+def _backfill_conversation_counts(db):
+    counts = db["conversations"].aggregate([
+        {"$group": {"_id": "$userId", "count": {"$sum": 1}}}
+    ])
+    requests = [
+        UpdateOne({"userId": row["_id"]}, {"$set": {"conversationCount": row["count"]}})
+        for row in counts
+    ]
+    # users with no conversations yet
+    requests.append(UpdateMany(
+        {"conversationCount": {"$exists": False}}, {"$set": {"conversationCount": 0}}))
+    db["users"].bulk_write(requests, ordered=True)
+
+
+def _split_sentence_feedback(db):
+    feedback_collection = db["sentenceFeedback"]
+    feedback_collection.create_index(
+        [("conversationId", ASCENDING), ("position", ASCENDING)], name="conversationId_position")
+    feedback_collection.create_index(
+        [("conversationId", ASCENDING), ("id", ASCENDING)], name="conversationId_id_unique", unique=True)
+    feedback_collection.create_index([("userId", ASCENDING)], name="userId")
+
+    # move embedded feedback out one conversation at a time. the upserts make
+    # this safe to re-run if it is interrupted part way through
+    conversations = db["conversations"]
+    legacy_conversations = conversations.find(
+        {"sentenceFeedback": {"$exists": True}},
+        {"_id": 0, "conversationId": 1, "userId": 1,
+            "createdAt": 1, "sentenceFeedback": 1}
+    )
+    for conversation in legacy_conversations:
+        sentence_feedback = conversation["sentenceFeedback"]
+        if sentence_feedback:
+            feedback_collection.bulk_write([
+                ReplaceOne(
+                    {"conversationId": conversation["conversationId"],
+                        "id": feedback["id"]},
+                    {
+                        **feedback,
+                        "conversationId": conversation["conversationId"],
+                        "userId": conversation["userId"],
+                        "position": position,
+                        "createdAt": conversation["createdAt"],
+                    },
+                    upsert=True,
+                )
+                for position, feedback in enumerate(sentence_feedback)
+            ], ordered=False)
+
+        conversations.update_one(
+            {"conversationId": conversation["conversationId"]},
+            {
+                "$set": {
+                    "sentenceCount": len(sentence_feedback),
+                    "errorCount": sum(len(feedback.get("errors", [])) for feedback in sentence_feedback),
+                    "feedbackSeq": len(sentence_feedback),
+                    "previewFeedback": sentence_feedback[:PREVIEW_SIZE],
+                },
+                "$unset": {"sentenceFeedback": ""},
+            }
+        )
+
+
+def _add_sentence_search_index(db):
+    feedback_collection = db["sentenceFeedback"]
+    feedback_collection.create_index(
+        [("userId", ASCENDING), ("searchTerms", ASCENDING)], name="userId_searchTerms")
+
+    # backfill search fields on feedback written before the index existed
+    requests = []
+    for feedback in feedback_collection.find({"searchTerms": {"$exists": False}}):
+        requests.append(UpdateOne(
+            {"_id": feedback["_id"]}, {"$set": build_search_fields(feedback)}))
+        if len(requests) == 1000:
+            feedback_collection.bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        feedback_collection.bulk_write(requests, ordered=False)
+
+
+def _add_conversation_job_indexes(db):
+    jobs = db["conversationJobs"]
+    jobs.create_index([("jobId", ASCENDING)], name="jobId_unique", unique=True)
+    jobs.create_index([("userId", ASCENDING)], name="userId")
+    # finished or abandoned jobs are only useful for a few days
+    jobs.create_index([("createdAt", ASCENDING)],
+                      name="createdAt_ttl", expireAfterSeconds=7 * 24 * 3600)
+
+
+def _add_work_queue_indexes(db):
+    queue = db["workQueue"]
+    queue.create_index([("jobId", ASCENDING)], name="jobId_unique", unique=True)
+    # one index per claim query, see MongoQueueStore.claim
+    queue.create_index(
+        [("status", ASCENDING), ("kind", ASCENDING), ("availableAt", ASCENDING)],
+        name="status_kind_availableAt")
+    queue.create_index(
+        [("status", ASCENDING), ("kind", ASCENDING), ("leaseExpiresAt", ASCENDING)],
+        name="status_kind_leaseExpiresAt")
+    # finished jobs only; dead jobs are kept until someone looks at them
+    queue.create_index([("finishedAt", ASCENDING)],
+                       name="finishedAt_ttl", expireAfterSeconds=7 * 24 * 3600)
+
+
+def _add_feedback_cache_indexes(db):
+    cache = db["feedbackCache"]
+    cache.create_index([("key", ASCENDING)], name="key_unique", unique=True)
+    # each entry carries its own expiry, see FeedbackCache
+    cache.create_index([("expiresAt", ASCENDING)],
+                       name="expiresAt_ttl", expireAfterSeconds=0)
+
+
+def _add_saved_jobs_index(db):
+    # finds the conversation a retried conversation job was already saved to
+    db["conversations"].create_index(
+        [("userId", ASCENDING), ("savedJobs.jobId", ASCENDING)], name="userId_savedJobs_jobId")
+
+
+# (version, name, function). append new migrations, never reorder or edit
+# ones that have already shipped
+MIGRATIONS = [
+    (1, "create core indexes", _create_core_indexes),
+    (2, "add conversation keyset pagination index", _add_conversation_keyset_index),
+    (3, "backfill per-user conversation counts", _backfill_conversation_counts),
+    (4, "split sentence feedback into its own collection", _split_sentence_feedback),
+    (5, "add sentence search index", _add_sentence_search_index),
+    (6, "add conversation job indexes", _add_conversation_job_indexes),
+    (7, "add work queue indexes", _add_work_queue_indexes),
+    (8, "add feedback cache indexes", _add_feedback_cache_indexes),
+    (9, "add saved conversation jobs index", _add_saved_jobs_index),
+]
+
+
+def get_hot_queries(now: datetime) -> list:
+    # (name, collection, filter, sort) for every query on a request path.
+    # each one must be served by an index. now fills the date filters
+    return [
+        ("get_user_by_id", "users", {"userId": "probe"}, None),
+        ("get_user_by_email", "users", {"userEmail": "probe@example.com"}, None),
+        ("get_user_by_refresh_token", "users", {"refreshToken": "probe"}, None),
+        ("get_conversations_by_user_id", "conversations",
+         {"userId": "probe"}, CONVERSATION_SORT),
+        ("get_conversations_by_user_id (cursor)", "conversations",
+         {"userId": "probe", **build_after_filter((now, "probe"))}, CONVERSATION_SORT),
+        ("merge_conversation", "conversations",
+         {"userId": "probe", "createdAt": {"$gte": now}}, CONVERSATION_SORT),
+        ("get_saved_job_conversation", "conversations",
+         {"userId": "probe", "savedJobs.jobId": "probe"}, None),
+        ("get_conversation_by_user_id", "conversations",
+         {"userId": "probe", "conversationId": "probe"}, None),
+        ("delete_conversation_by_id", "conversations",
+         {"conversationId": "probe"}, None),
+        ("search_conversations_in_db", "conversations",
+         {"userId": "probe", "$text": {"$search": "probe"}}, None),
+        ("get_sentence_feedback", "sentenceFeedback",
+         {"conversationId": "probe"}, [("position", ASCENDING)]),
+        ("attach_sentence_feedback", "sentenceFeedback",
+         {"conversationId": {"$in": ["probe", "probe2"]}}, [("conversationId", ASCENDING), ("position", ASCENDING)]),
+        ("delete_correction_from_conversation", "sentenceFeedback",
+         {"conversationId": "probe", "id": "probe"}, None),
+        ("delete_all_conversations_by_user_id (feedback)", "sentenceFeedback",
+         {"userId": "probe"}, None),
+        ("search_conversations_ranked", "sentenceFeedback",
+         {"userId": "probe", "searchTerms": {"$in": ["pr", re.compile("^probe")]}}, [("createdAt", DESCENDING)]),
+        ("get_conversation_job", "conversationJobs",
+         {"jobId": "probe", "userId": "probe"}, None),
+        ("delete_all_conversations_by_user_id (jobs)", "conversationJobs",
+         {"userId": "probe"}, None),
+        ("WorkQueue.claim (expired lease)", "workQueue",
+         {"status": "running", "kind": {"$in": ["probe"]}, "leaseExpiresAt": {"$lt": now}}, None),
+        ("WorkQueue.claim (queued)", "workQueue",
+         {"status": "queued", "kind": {"$in": ["probe"]}, "availableAt": {"$lte": now}}, [("availableAt", ASCENDING)]),
+        ("WorkQueue.count_queued", "workQueue",
+         {"status": "queued", "kind": "probe"}, None),
+        ("WorkQueue.update_owned", "workQueue",
+         {"jobId": "probe", "status": "running", "leaseOwner": "probe"}, None),
+        ("FeedbackCache.get_many", "feedbackCache",
+         {"key": {"$in": ["probe", "probe2"]}, "expiresAt": {"$gt": now}}, None),
+        ("get_verification_code", "verificationCodes",
+         {"userId": "probe", "purpose": "email_verification"}, None),
+    ]
+
+
+def get_applied_versions(db) -> set:
+    return {doc["version"] for doc in db[MIGRATIONS_COLLECTION].find({}, {"version": 1})}
+
+
+def run_migrations() -> list:
+    db = get_database()
+    db[MIGRATIONS_COLLECTION].create_index(
+        [("version", ASCENDING)], name="version_unique", unique=True)
+
+    applied = get_applied_versions(db)
+    newly_applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+
+        logger.info(f"Applying migration {version}: {name}")
+        migrate(db)
+
+        try:
+            db[MIGRATIONS_COLLECTION].insert_one({
+                "version": version,
+                "name": name,
+                "appliedAt": datetime.utcnow(),
+            })
+        except DuplicateKeyError:
+            # another process applied it at the same time. migrations are
+            # idempotent so that is fine
+            pass
+        newly_applied.append(version)
+
+    return newly_applied
+
+
+def _find_stages(plan) -> set:
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= _find_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            stages |= _find_stages(item)
+    return stages
+
+
+def verify_hot_queries() -> dict:
+    db = get_database()
+    plans = {}
+    collscans = []
+    for name, collection, query_filter, sort in get_hot_queries(datetime.utcnow()):
+        cursor = db[collection].find(query_filter)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = cursor.explain()
+        stages = _find_stages(explain["queryPlanner"]["winningPlan"])
+        plans[name] = sorted(stages)
+        if "COLLSCAN" in stages:
+            collscans.append(name)
+
+    if collscans:
+        raise RuntimeError(
+            f"Hot queries are not using an index (COLLSCAN): {', '.join(collscans)}")
+
+    return plans
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Apply Mongo index migrations and verify hot query plans.")
+    parser.add_argument("--verify", action="store_true",
+                        help="only verify hot queries, do not apply migrations")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if not args.verify:
+        applied = run_migrations()
+        print(f"Applied migrations: {applied or 'none'}")
+
+    for name, stages in verify_hot_queries().items():
+        print(f"{name}: {', '.join(stages)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import threading
+from pymongo import monitoring
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    # counts the pool events of one client so we can see how busy it is.
+    # pymongo calls these from its own threads, so guard with a lock
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checked_out = 0
+            self.wait_queue_length = 0
+            self.connections_open = 0
+            self.connections_created = 0
+            self.connections_closed = 0
+            self.checkout_failures = 0
+            self.pool_clears = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+            self.connections_open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+            self.connections_open = max(0, self.connections_open - 1)
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.wait_queue_length += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.wait_queue_length = max(0, self.wait_queue_length - 1)
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.wait_queue_length = max(0, self.wait_queue_length - 1)
+            self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkedOut": self.checked_out,
+                "waitQueueLength": self.wait_queue_length,
+                "connectionsOpen": self.connections_open,
+                "connectionsCreated": self.connections_created,
+                "connectionsClosed": self.connections_closed,
+                "checkoutFailures": self.checkout_failures,
+                "poolClears": self.pool_clears,
+            }
+
@@ -0,0 +1,34 @@
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+from datetime import datetime
+
+
+class DbJobStage(BaseModel):
+    # pending, running, succeeded, failed, or skipped when an identical
+    # upload was already transcribed
+    status: str = "pending"
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
+    durationMs: Optional[int] = None
+    error: Optional[str] = None
+
+
+# one document per POST /api/v1/conversations?mode=job, in conversationJobs
+class DbConversationJob(BaseModel):
+    jobId: str
+    userId: str
+    # queued, running, succeeded or failed
+    status: str = "queued"
+    stages: Dict[str, DbJobStage]
+    createdAt: datetime
+    updatedAt: datetime
+    # ConversationResponse once the job has succeeded
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    # http status the sync endpoint would have returned for this error
+    errorStatusCode: Optional[int] = None
+    # set once the audio is transcribed, see prepare_audio
+    metadata: Optional[Dict[str, Any]] = None
+    # grammar feedback kept between analyze and save, so a retried save
+    # writes the same sentences with the same ids
+    analysis: Optional[dict] = None
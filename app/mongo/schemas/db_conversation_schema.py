@@ -2,6 +2,9 @@ from typing import List
 from pydantic import BaseModel
 from datetime import datetime
 
+# number of leading sentences kept on the conversation document itself
+PREVIEW_SIZE = 3
+
 
 class DbError(BaseModel):
     id: str
@@ -19,9 +22,29 @@ class DbSentenceFeedback(BaseModel):
     errors: List[DbError]
 
 
+# stored in the sentenceFeedback collection, one document per sentence
+class DbSentenceFeedbackDocument(DbSentenceFeedback):
+    conversationId: str
+    userId: str
+    position: int
+    createdAt: datetime
+    # see app/utils/search_utils.build_search_fields
+    searchTerms: List[str] = []
+    errorTypes: List[str] = []
+
+
 class DbConversation(BaseModel):
     userId: str
     conversationId: str
     createdAt: datetime
     originalText: str
-    sentenceFeedback: List[DbSentenceFeedback]
+    # summary only, the full feedback lives in the sentenceFeedback collection
+    sentenceCount: int = 0
+    errorCount: int = 0
+    # next free sentenceFeedback position. never decremented so positions
+    # stay unique after corrections are deleted
+    feedbackSeq: int = 0
+    previewFeedback: List[DbSentenceFeedback] = []
+    # the latest conversation jobs saved into this conversation, with the
+    # position of their first sentence, so a retried job doesn't merge twice
+    savedJobs: List[dict] = []
@@ -16,4 +16,5 @@ class DbUserSchema(BaseModel):
     oauthUserId: Optional[str] = None
     refreshToken: Optional[str] = None
     isAnonymous: bool = False
-    anonUserSecret: Optional[str] = None
\ No newline at end of file
+    anonUserSecret: Optional[str] = None
+    conversationCount: int = 0
\ No newline at end of file
@@ -19,28 +19,28 @@ router = APIRouter()
 
 
 @router.post("/register/anonymous", response_model=RegisterAnonymousUserResponse)
-def register_anonymous_user_route():
-    return register_anonymous_user()
+async def register_anonymous_user_route():
+    return await register_anonymous_user()
 
 
 @router.post("/login")
-def login(request: LoginRequest):
-    return login_user(request.userEmail, request.password)
+async def login(request: LoginRequest):
+    return await login_user(request.userEmail, request.password)
 
 
 @router.post("/register")
-def register(request: RegisterRequest):
-    return register_user(request.userEmail, request.password)
+async def register(request: RegisterRequest):
+    return await register_user(request.userEmail, request.password)
 
 
 @router.post("/auth/anonymous/restore")
-def restore_anonymous_user_route(request: RestoreAnonymousRequest):
-    return restore_anonymous_user(request.userId, request.userSecret)
+async def restore_anonymous_user_route(request: RestoreAnonymousRequest):
+    return await restore_anonymous_user(request.userId, request.userSecret)
 
 
 @router.post("/auth/anonymous/upgrade", response_model=UpgradeAnonymousUserResponse)
-def upgrade_anonymous_user_route(request: UpgradeAnonymousUserRequest):
-    return upgrade_anonymous_user(
+async def upgrade_anonymous_user_route(request: UpgradeAnonymousUserRequest):
+    return await upgrade_anonymous_user(
         request.userId,
         request.userSecret,
         request.userEmail,
@@ -49,48 +49,48 @@ def upgrade_anonymous_user_route(request: UpgradeAnonymousUserRequest):
 
 
 @router.post("/auth/request-email-verification")
-def request_email_verification_route(
+async def request_email_verification_route(
     user_id: str = Depends(get_current_user_from_token)
 ):
-    return request_email_verification(user_id)
+    return await request_email_verification(user_id)
 
 
 @router.post("/auth/verify-email")
-def verify_email_route(
+async def verify_email_route(
     request: VerifyEmailRequestSchema,
     user_id: str = Depends(get_current_user_from_token)
 ):
-    return verify_email(user_id, request.code)
+    return await verify_email(user_id, request.code)
 
 
 @router.delete("/delete-user")
-def delete_user_account(
+async def delete_user_account(
     user_id: str = Depends(get_current_user_from_token)
 ):
-    return delete_user(user_id)
+    return await delete_user(user_id)
 
 
 @router.post("/auth/refresh")
-def refresh_token(request: RefreshTokenRequest):
-    return refresh_user_token(request.refreshToken)
+async def refresh_token(request: RefreshTokenRequest):
+    return await refresh_user_token(request.refreshToken)
 
 
 @router.post("/auth/update-password")
-def update_password(
+async def update_password(
     passwordRequestBody: UpdatePasswordRequest,
     user_id: str = Depends(get_current_user_from_token)
 ):
-    return update_user_password(user_id, passwordRequestBody.currentPassword, passwordRequestBody.newPassword)
+    return await update_user_password(user_id, passwordRequestBody.currentPassword, passwordRequestBody.newPassword)
 
 
 @router.post("/auth/request-password-reset")
-def request_password_reset_route(request: RequestPasswordResetRequest):
-    return request_password_reset(request.userEmail)
+async def request_password_reset_route(request: RequestPasswordResetRequest):
+    return await request_password_reset(request.userEmail)
 
 
 @router.post("/auth/reset-password")
-def reset_password_route(request: ResetPasswordRequest):
-    return reset_password(request.userEmail, request.code, request.newPassword)
+async def reset_password_route(request: ResetPasswordRequest):
+    return await reset_password(request.userEmail, request.code, request.newPassword)
 
 
 # third party authentication routes
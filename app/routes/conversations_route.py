@@ -1,5 +1,7 @@
+from typing import Literal, Optional
 from fastapi import APIRouter, Depends, UploadFile, File
-from app.controllers.conversations_controller import add_new_conversation, delete_conversation, delete_correction, get_conversations, search_conversations
+from app.controllers.conversations_controller import add_new_conversation, delete_conversation, delete_correction, get_conversation, get_conversation_job_status, get_conversations, search_conversations, start_conversation_job, stream_new_conversation
+from app.schemas.reponse_schemas.conversation_job_response_schema import ConversationJobResponse
 from app.schemas.reponse_schemas.conversation_response_schema import ConversationResponse
 from app.utils.auth_utils import get_current_user_from_token
 
@@ -7,34 +9,65 @@ router = APIRouter()
 
 
 @router.post("/api/v1/conversations", response_model=ConversationResponse)
-def add_conversation_route(file: UploadFile = File(...), user_id: str = Depends(get_current_user_from_token)):
-    return add_new_conversation(user_id, file)
+async def add_conversation_route(
+    file: UploadFile = File(...),
+    user_id: str = Depends(get_current_user_from_token),
+    mode: Literal["sync", "job"] = "sync"
+):
+    # mode=job returns 202 with a job id straight away, poll the job route
+    if mode == "job":
+        return await start_conversation_job(user_id, file)
+    return await add_new_conversation(user_id, file)
+
+
+# text/event-stream of transcription, per chunk feedback and done events
+@router.post("/api/v1/conversations/stream")
+async def stream_conversation_route(file: UploadFile = File(...), user_id: str = Depends(get_current_user_from_token)):
+    return await stream_new_conversation(user_id, file)
+
+
+@router.get("/api/v1/conversations/jobs/{job_id}", response_model=ConversationJobResponse)
+async def fetch_conversation_job_route(job_id: str, user_id: str = Depends(get_current_user_from_token)):
+    return await get_conversation_job_status(job_id, user_id)
 
 
 @router.get("/api/v1/conversations", response_model=ConversationResponse)
-def fetch_conversations_route(
+async def fetch_conversations_route(
     user_id: str = Depends(get_current_user_from_token),
     page: int = 1,
-    limit: int = 10
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    includeTotal: bool = True,
+    view: Literal["full", "summary"] = "full"
 ):
-    return get_conversations(user_id, page, limit)
+    return await get_conversations(user_id, page, limit, cursor, includeTotal, view)
 
 
 @router.get("/api/v1/conversations/search", response_model=ConversationResponse)
-def search_conversations_route(
+async def search_conversations_route(
     query: str,
     user_id: str = Depends(get_current_user_from_token),
     page: int = 1,
-    limit: int = 10
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    includeTotal: bool = True,
+    view: Literal["full", "summary"] = "full",
+    errorType: Optional[str] = None,
+    sort: Literal["relevance", "recent"] = "relevance"
 ):
-    return search_conversations(user_id, query, page, limit)
+    return await search_conversations(user_id, query, page, limit, cursor, includeTotal, view, errorType, sort)
+
+
+@router.get("/api/v1/conversations/{conversation_id}", response_model=ConversationResponse)
+async def fetch_conversation_route(conversation_id: str, user_id: str = Depends(get_current_user_from_token)):
+    return await get_conversation(conversation_id, user_id)
 
 
 @router.delete("/api/v1/conversations/{conversation_id}")
-def delete_conversation_route(conversation_id: str, user_id: str = Depends(get_current_user_from_token)):
-    return delete_conversation(conversation_id, user_id)
+async def delete_conversation_route(conversation_id: str, user_id: str = Depends(get_current_user_from_token)):
+    return await delete_conversation(conversation_id, user_id)
 
 
 @router.delete("/api/v1/conversations/{conversation_id}/corrections/{correction_id}")
-def delete_correction_route(conversation_id: str, correction_id: str, user_id: str = Depends(get_current_user_from_token)):
-    return delete_correction(conversation_id, correction_id, user_id)
+async def delete_correction_route(conversation_id: str, correction_id: str, user_id: str = Depends(get_current_user_from_token)):
+    return await delete_correction(conversation_id, correction_id, user_id)
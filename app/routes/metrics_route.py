@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
+from app.controllers.metrics_controller import get_asr_model_metrics, get_feedback_cache_metrics, get_llm_metrics, get_mongo_pool_metrics, get_transcription_cache_metrics, get_user_cache_metrics, get_work_queue_metrics
+from app.utils.auth_utils import require_metrics_token
+
+router = APIRouter(dependencies=[Depends(require_metrics_token)])
+
+
+@router.get("/api/v1/metrics/mongo-pool")
+async def mongo_pool_metrics_route():
+    return get_mongo_pool_metrics()
+
+
+@router.get("/api/v1/metrics/user-cache")
+async def user_cache_metrics_route():
+    return get_user_cache_metrics()
+
+
+@router.get("/api/v1/metrics/work-queue")
+async def work_queue_metrics_route():
+    return await run_in_threadpool(get_work_queue_metrics)
+
+
+@router.get("/api/v1/metrics/llm")
+async def llm_metrics_route():
+    return get_llm_metrics()
+
+
+@router.get("/api/v1/metrics/feedback-cache")
+async def feedback_cache_metrics_route():
+    return get_feedback_cache_metrics()
+
+
+@router.get("/api/v1/metrics/transcription-cache")
+async def transcription_cache_metrics_route():
+    return get_transcription_cache_metrics()
+
+
+@router.get("/api/v1/metrics/asr-models")
+async def asr_model_metrics_route():
+    return get_asr_model_metrics()
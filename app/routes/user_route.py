@@ -11,28 +11,28 @@ router = APIRouter()
 
 
 @router.get("/api/v1/user/details")
-def get_user_details_route(user_id: str = Depends(get_current_user_from_token)):
-    return get_user_details(user_id)
+async def get_user_details_route(user_id: str = Depends(get_current_user_from_token)):
+    return await get_user_details(user_id)
 
 @router.patch("/api/v1/user/details")
-def update_user_details_route(
+async def update_user_details_route(
     userDetails: UserDetailsRequestSchema,
     user_id: str = Depends(get_current_user_from_token)
 ):
-    return update_user_details(user_id, userDetails)
+    return await update_user_details(user_id, userDetails)
 
 
 @router.post("/api/v1/user/request-email-change")
-def request_email_change_route(
+async def request_email_change_route(
     request: RequestEmailChangeRequestSchema,
     user_id: str = Depends(get_current_user_from_token)
 ):
-    return request_email_change(user_id, request.newEmail)
+    return await request_email_change(user_id, request.newEmail)
 
 
 @router.post("/api/v1/user/change-email")
-def change_email_route(
+async def change_email_route(
     request: ChangeEmailRequestSchema,
     user_id: str = Depends(get_current_user_from_token)
 ):
-    return change_user_email(user_id, request.newEmail, request.code)
+    return await change_user_email(user_id, request.newEmail, request.code)
@@ -0,0 +1,31 @@
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+from datetime import datetime
+from app.schemas.reponse_schemas.conversation_response_schema import ConversationResponse
+
+
+class JobStageResponse(BaseModel):
+    status: str
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
+    durationMs: Optional[int] = None
+    error: Optional[str] = None
+
+
+class ConversationJobData(BaseModel):
+    jobId: str
+    status: str
+    stages: Dict[str, JobStageResponse]
+    createdAt: datetime
+    updatedAt: datetime
+    # set once status is succeeded
+    result: Optional[ConversationResponse] = None
+    error: Optional[str] = None
+    errorStatusCode: Optional[int] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class ConversationJobResponse(BaseModel):
+    success: bool
+    data: Optional[ConversationJobData]
+    error: Optional[str]
@@ -1,4 +1,4 @@
-from typing import List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -23,16 +23,35 @@ class ConversationData(BaseModel):
     createdAt: datetime
     originalText: str
     sentenceFeedback: List[SentenceFeedbackResponse]
+    sentenceCount: Optional[int] = None
+    errorCount: Optional[int] = None
+
+
+# list item for view=summary, full feedback is loaded on demand
+class ConversationSummaryData(BaseModel):
+    conversationId: str
+    createdAt: datetime
+    originalText: str
+    sentenceCount: int
+    errorCount: int
 
 
 class PaginatedConversationsResponse(BaseModel):
-    conversations: List[ConversationData]
-    total: int
+    conversations: Union[List[ConversationData], List[ConversationSummaryData]]
+    total: Optional[int] = None
     page: int
     limit: int
+    nextCursor: Optional[str] = None
+    # error type counts across the search matches that were ranked
+    facets: Optional[Dict[str, int]] = None
+    # the search matched more sentences than were ranked, older ones left out
+    truncated: Optional[bool] = None
 
 
 class ConversationResponse(BaseModel):
     success: bool
     data: Optional[Union[List[ConversationData], PaginatedConversationsResponse]]
     error: Optional[str]
+    # how the recording behind a new conversation was processed, e.g. how
+    # much silence was trimmed. not stored
+    metadata: Optional[Dict[str, Any]] = None
@@ -0,0 +1,720 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import uuid
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from app.config import Config
+from app.mongo.MongoClient import get_async_mongo_client
+from app.mongo.schemas.db_conversation_job_schema import DbConversationJob, DbJobStage
+from app.mongo.schemas.db_conversation_schema import PREVIEW_SIZE, DbConversation, DbSentenceFeedback, DbSentenceFeedbackDocument
+from app.mongo.schemas.db_user_schema import DbUserSchema
+from app.schemas.reponse_schemas.conversation_response_schema import ConversationData, ConversationResponse
+from app.schemas.request_schemas.user_details_request_schema import UserDetailsRequestSchema
+from app.utils.cache_utils import UserCache, without_credentials
+from app.utils.pagination_utils import CONVERSATION_SORT, build_after_filter, get_next_cursor
+from app.utils.search_utils import build_search_fields, expand_fuzzy_terms, get_candidate_terms, max_edits, normalize, rank_conversations, tokenize
+
+
+# the same user document is read several times per request (auth, the
+# controller, grammar settings). every write to a user must invalidate it.
+# cached users have no password or secrets, pass fresh=True to read them
+user_cache = UserCache(Config.USER_CACHE_SIZE, Config.USER_CACHE_TTL_SECONDS)
+
+
+def get_collection(collection: str):
+    client = get_async_mongo_client()
+    db = client[Config.MONGO_DB_NAME]
+    return db[collection]
+
+
+async def store_refresh_token(user_id: str, refresh_token: str):
+    users_collection = get_collection("users")
+    result = await users_collection.update_one(
+        {"userId": user_id},
+        {"$set": {"refreshToken": refresh_token}}
+    )
+    user_cache.invalidate(user_id)
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+
+async def invalidate_refresh_token(user_id: str):
+    users_collection = get_collection("users")
+    result = await users_collection.update_one(
+        {"userId": user_id},
+        {"$unset": {"refreshToken": ""}}
+    )
+    user_cache.invalidate(user_id)
+
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+
+async def get_user_by_refresh_token(refresh_token: str):
+    users_collection = get_collection("users")
+    return await users_collection.find_one({"refreshToken": refresh_token})
+
+
+async def get_user_by_email(user_email: str, fresh: bool = False) -> DbUserSchema | None:
+    # fresh reads the database, for credential checks. other workers may
+    # still cache a user that was changed or deleted elsewhere
+    users_collection = get_collection("users")
+    normalized_email = user_email.strip().lower()
+    if not fresh:
+        cached_user = user_cache.get_by_email(normalized_email)
+        if cached_user is not None:
+            return cached_user
+
+    user = await users_collection.find_one({"userEmail": normalized_email})
+    if not user:
+        return None
+    user_cache.set(user)
+    return user if fresh else without_credentials(user)
+
+
+async def create_user(
+        user_email: str = None,
+        hashed_password: str = None,
+        email_verified: bool = False,
+        oauth_provider: str = None,
+        oauth_user_id: str = None,
+        is_anonymous: bool = False,
+        anon_user_secret: str = None,
+) -> None:
+    users_collection = get_collection("users")
+    user_id = str(uuid.uuid4())
+    new_user = DbUserSchema(
+        userId=user_id,
+        userEmail=user_email.strip().lower() if user_email else None,
+        emailVerified=email_verified,
+        username="New User",
+        targetLanguage="en",
+        appLanguage="en",
+        createdAt=datetime.utcnow(),
+        setupComplete=False,
+        password=hashed_password,
+        oauthProvider=oauth_provider,
+        oauthUserId=oauth_user_id,
+        isAnonymous=is_anonymous,
+        anonUserSecret=anon_user_secret
+    )
+    await users_collection.insert_one(new_user.dict())
+    return user_id
+
+
+async def delete_user_by_id(user_id: str) -> bool:
+    users_collection = get_collection("users")
+    result = await users_collection.delete_one({"userId": user_id})
+    user_cache.invalidate(user_id)
+    return result.deleted_count > 0
+
+
+async def get_user_by_id(user_id: str, fresh: bool = False) -> DbUserSchema | None:
+    if not fresh:
+        cached_user = user_cache.get_by_id(user_id)
+        if cached_user is not None:
+            return cached_user
+
+    users_collection = get_collection("users")
+    user = await users_collection.find_one({"userId": user_id})
+    if not user:
+        return None
+    user_cache.set(user)
+    return user if fresh else without_credentials(user)
+
+
+async def update_user_details_in_db(user_id: str, userDetails: UserDetailsRequestSchema) -> bool:
+    users_collection = get_collection("users")
+    update_data = {key: value for key,
+                   value in userDetails.items() if value is not None}
+    result = await users_collection.update_one(
+        {"userId": user_id}, {"$set": update_data}
+    )
+    user_cache.invalidate(user_id)
+    return result.modified_count > 0
+
+
+async def update_user_password_in_db(user_id: str, hashed_password: str):
+    users_collection = get_collection("users")
+
+    result = await users_collection.update_one(
+        {"userId": user_id},
+        {"$set": {"password": hashed_password}}
+    )
+    user_cache.invalidate(user_id)
+    return result
+
+
+async def get_conversation_count(user_id: str) -> int:
+    # maintained on the user document by create/delete so listing pages
+    # don't need a count_documents over the user's whole history
+    user = await get_collection("users").find_one(
+        {"userId": user_id}, {"_id": 0, "conversationCount": 1})
+    if user and "conversationCount" in user:
+        return user["conversationCount"]
+
+    # user predates the counter (see migration 3)
+    return await get_collection("conversations").count_documents({"userId": user_id})
+
+
+async def increment_conversation_count(user_id: str, amount: int):
+    if amount == 0:
+        return
+    # users without the counter yet keep counting their conversations
+    # until migration 3 sets it, an $inc would start it from 0
+    await get_collection("users").update_one(
+        {"userId": user_id, "conversationCount": {"$exists": True}},
+        {"$inc": {"conversationCount": amount}})
+    user_cache.invalidate(user_id)
+
+
+async def get_conversations_by_user_id(user_id: str, page: int, limit: int, after: tuple[datetime, str] = None, include_total: bool = True, view: str = "full") -> ConversationResponse:
+    try:
+        conversations_collection = get_collection("conversations")
+
+        query = {"userId": user_id}
+        if after:
+            # keyset pagination, seek straight past the previous page
+            query.update(build_after_filter(after))
+            skip = 0
+        else:
+            # num of documents to skip (legacy page/limit clients)
+            skip = (page - 1) * limit
+
+        # fetch one extra document to know if there is a next page
+        conversations = await conversations_collection.find(
+            query, get_list_projection(view)
+        ).sort(CONVERSATION_SORT).skip(skip).limit(limit + 1).to_list()
+        next_cursor = get_next_cursor(conversations, limit)
+        if view != "summary":
+            await attach_sentence_feedback(conversations)
+
+        total_conversations = await get_conversation_count(
+            user_id) if include_total else None
+
+        return ConversationResponse(
+            success=True,
+            data={
+                "conversations": conversations,
+                "total": total_conversations,
+                "page": page,
+                "limit": limit,
+                "nextCursor": next_cursor
+            },
+            error=None
+        )
+    except Exception as e:
+        return ConversationResponse(
+            success=False,
+            data=None,
+            error=f"An error occurred while fetching conversations: {str(e)}"
+        )
+
+
+# conversation documents only hold a summary, leave the preview out of list
+# responses since the full feedback is attached from sentenceFeedback
+CONVERSATION_LIST_PROJECTION = {"_id": 0, "previewFeedback": 0}
+
+# characters of originalText sent with each item in view=summary
+SUMMARY_TEXT_LENGTH = 200
+
+# truncate on the server so long transcripts never leave mongo
+CONVERSATION_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "conversationId": 1,
+    "createdAt": 1,
+    "originalText": {"$substrCP": ["$originalText", 0, SUMMARY_TEXT_LENGTH]},
+    "sentenceCount": {"$ifNull": ["$sentenceCount", 0]},
+    "errorCount": {"$ifNull": ["$errorCount", 0]},
+}
+
+
+def get_list_projection(view: str) -> dict:
+    if view == "summary":
+        return CONVERSATION_SUMMARY_PROJECTION
+    return CONVERSATION_LIST_PROJECTION
+
+
+async def get_sentence_feedback(conversation_id: str) -> list:
+    return await get_collection("sentenceFeedback").find(
+        {"conversationId": conversation_id}, SENTENCE_FEEDBACK_PROJECTION
+    ).sort("position", 1).to_list()
+
+
+async def attach_sentence_feedback(conversations: list):
+    # one indexed query for the whole page instead of one per conversation
+    if not conversations:
+        return
+
+    feedback_by_conversation = {
+        conversation["conversationId"]: [] for conversation in conversations}
+    feedback_cursor = get_collection("sentenceFeedback").find(
+        {"conversationId": {"$in": list(feedback_by_conversation)}},
+        {**SENTENCE_FEEDBACK_PROJECTION, "conversationId": 1}
+    ).sort([("conversationId", 1), ("position", 1)])
+    async for feedback in feedback_cursor:
+        feedback_by_conversation[feedback.pop("conversationId")].append(feedback)
+
+    for conversation in conversations:
+        conversation["sentenceFeedback"] = feedback_by_conversation[conversation["conversationId"]]
+
+
+async def get_conversation_with_feedback(user_id: str, conversation_id: str) -> dict | None:
+    conversation = await get_collection("conversations").find_one({
+        "userId": user_id,
+        "conversationId": conversation_id
+    }, CONVERSATION_LIST_PROJECTION)
+    if conversation:
+        conversation["sentenceFeedback"] = await get_sentence_feedback(conversation_id)
+    return conversation
+
+
+async def get_conversation_by_user_id(user_id: str, conversation_id: str) -> dict | None:
+    conversations_collection = get_collection("conversations")
+    return await conversations_collection.find_one({
+        "userId": user_id,
+        "conversationId": conversation_id
+    }, {"_id": 0})
+
+
+# uploads that land within this window of the user's latest conversation
+# are merged into it instead of starting a new one
+MERGE_WINDOW = timedelta(seconds=30)
+
+# job ids kept per conversation. a retry comes within minutes of the first
+# attempt, so only the latest few are needed
+SAVED_JOBS_KEPT = 20
+
+SENTENCE_FEEDBACK_PROJECTION = {
+    "_id": 0, "id": 1, "original": 1, "corrected": 1, "errors": 1}
+
+
+async def upsert_conversation(response: dict, user_id, job_id: str = None) -> ConversationResponse:
+    # job_id makes the save idempotent: a job retried after its feedback was
+    # merged gets the conversation it was saved to instead of merging again
+    if not response.get("success") or "data" not in response or not response["data"]:
+        return ConversationResponse(
+            success=False,
+            data=None,
+            error="Invalid response object. Missing required fields"
+        )
+
+    data = response["data"]
+
+    conversations_collection = get_collection("conversations")
+
+    data["userId"] = user_id
+    created_at_datetime = datetime.strptime(
+        data["createdAt"], "%Y-%m-%dT%H:%M:%S.%fZ")
+
+    # check and use only if valid feedback
+    data["sentenceFeedback"] = [
+        feedback for feedback in data["sentenceFeedback"]
+        if "id" in feedback and "original" in feedback and "corrected" in feedback and "errors" in feedback
+    ]
+
+    if job_id:
+        saved = await get_saved_job_conversation(
+            conversations_collection, created_at_datetime, data, job_id)
+        if saved:
+            print(f"Conversation job {job_id} already saved. Skipping merge.")
+            return saved
+
+    merged = await merge_conversation(
+        conversations_collection, created_at_datetime, data, job_id)
+    if merged:
+        print(f"Existing conversation found. Merged conversation.")
+        return merged
+
+    print(
+        f"Existing conversation not found. Creating new conversation.")
+    return await create_new_conversation(conversations_collection, created_at_datetime, data, job_id)
+
+
+async def get_saved_job_conversation(collection, created_at_datetime: datetime, data: dict, job_id: str) -> Optional[ConversationResponse]:
+    conversation = await collection.find_one(
+        {"userId": data["userId"], "savedJobs.jobId": job_id},
+        {"_id": 0, "conversationId": 1, "createdAt": 1, "originalText": 1,
+         "savedJobs": {"$elemMatch": {"jobId": job_id}}},
+    )
+    if not conversation:
+        return None
+
+    # the last attempt may have stopped before all its sentences were
+    # written. they have the same ids as then, so existing ones are skipped
+    sentence_feedback = [DbSentenceFeedback(**feedback).dict()
+                         for feedback in data["sentenceFeedback"]]
+    await insert_sentence_feedback(
+        data["userId"], conversation["conversationId"], created_at_datetime, sentence_feedback,
+        conversation["savedJobs"][0]["position"], skip_existing=True)
+
+    return ConversationResponse(
+        success=True,
+        data=[ConversationData(
+            conversationId=conversation["conversationId"],
+            createdAt=conversation["createdAt"],
+            originalText=conversation["originalText"],
+            sentenceFeedback=await get_sentence_feedback(conversation["conversationId"]),
+        )],
+        error=None
+    )
+
+
+def count_errors(sentence_feedback: list) -> int:
+    return sum(len(feedback["errors"]) for feedback in sentence_feedback)
+
+
+async def insert_sentence_feedback(user_id: str, conversation_id: str, created_at_datetime: datetime, sentence_feedback: list, first_position: int, skip_existing: bool = False):
+    # skip_existing ignores sentences already stored under the same id
+    if not sentence_feedback:
+        return
+
+    documents = [
+        DbSentenceFeedbackDocument(
+            **feedback,
+            conversationId=conversation_id,
+            userId=user_id,
+            position=first_position + index,
+            createdAt=created_at_datetime,
+            **build_search_fields(feedback),
+        ).dict()
+        for index, feedback in enumerate(sentence_feedback)
+    ]
+    try:
+        await get_collection("sentenceFeedback").insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        # 11000 is a duplicate key on conversationId_id_unique
+        if not skip_existing or any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+
+
+async def create_new_conversation(collection, created_at_datetime: datetime, data: ConversationData, job_id: str = None) -> ConversationResponse:
+    sentence_feedback = [DbSentenceFeedback(**feedback).dict()
+                         for feedback in data["sentenceFeedback"]]
+
+    new_conversation = DbConversation(
+        userId=data["userId"],
+        conversationId=str(uuid.uuid4()),
+        createdAt=created_at_datetime,
+        originalText=data["originalText"],
+        sentenceCount=len(sentence_feedback),
+        errorCount=count_errors(sentence_feedback),
+        feedbackSeq=len(sentence_feedback),
+        previewFeedback=sentence_feedback[:PREVIEW_SIZE],
+        savedJobs=[{"jobId": job_id, "position": 0}] if job_id else [],
+    )
+
+    await collection.insert_one(new_conversation.dict(by_alias=True))
+    await insert_sentence_feedback(
+        data["userId"], new_conversation.conversationId, created_at_datetime, sentence_feedback, 0)
+    await increment_conversation_count(data["userId"], 1)
+
+    return ConversationResponse(
+        success=True,
+        data=[ConversationData(
+            conversationId=new_conversation.conversationId,
+            createdAt=new_conversation.createdAt,
+            originalText=new_conversation.originalText,
+            sentenceFeedback=sentence_feedback
+        )],
+        error=None
+    )
+
+
+async def merge_conversation(collection, created_at_datetime: datetime, data: ConversationData, job_id: str = None) -> Optional[ConversationResponse]:
+    sentence_feedback = [DbSentenceFeedback(**feedback).dict()
+                         for feedback in data["sentenceFeedback"]]
+
+    summary = {
+        "originalText": {"$concat": ["$originalText", " ", {"$literal": data["originalText"]}]},
+        "sentenceCount": {"$add": [{"$ifNull": ["$sentenceCount", 0]}, len(sentence_feedback)]},
+        "errorCount": {"$add": [{"$ifNull": ["$errorCount", 0]}, count_errors(sentence_feedback)]},
+        "feedbackSeq": {"$add": [{"$ifNull": ["$feedbackSeq", 0]}, len(sentence_feedback)]},
+        "previewFeedback": {"$slice": [
+            {"$concatArrays": [{"$ifNull": ["$previewFeedback", []]}, {"$literal": sentence_feedback[:PREVIEW_SIZE]}]},
+            PREVIEW_SIZE
+        ]},
+        "createdAt": created_at_datetime,
+    }
+    if job_id:
+        # recorded in the same update as the merge. $feedbackSeq is still
+        # the value from before this update, the job's first position
+        summary["savedJobs"] = {"$slice": [
+            {"$concatArrays": [
+                {"$ifNull": ["$savedJobs", []]},
+                [{"jobId": {"$literal": job_id}, "position": {"$ifNull": ["$feedbackSeq", 0]}}],
+            ]},
+            -SAVED_JOBS_KEPT
+        ]}
+
+    # find the user's latest conversation inside the merge window and update
+    # its summary in one atomic step. the new sentences themselves go to the
+    # sentenceFeedback collection, so the conversation document stays small
+    # however long the session gets. feedbackSeq reserves their positions,
+    # which keeps two racing uploads from colliding. $literal stops mongo
+    # treating a "$" in the transcription as a field path
+    merged = await collection.find_one_and_update(
+        {
+            "userId": data["userId"],
+            "createdAt": {"$gte": created_at_datetime - MERGE_WINDOW},
+        },
+        [{"$set": summary}],
+        sort=CONVERSATION_SORT,
+        projection={"_id": 0, "conversationId": 1, "createdAt": 1,
+                    "originalText": 1, "feedbackSeq": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+
+    if not merged:
+        return None
+
+    await insert_sentence_feedback(
+        data["userId"], merged["conversationId"], created_at_datetime, sentence_feedback,
+        merged["feedbackSeq"] - len(sentence_feedback))
+
+    return ConversationResponse(
+        success=True,
+        data=[ConversationData(
+            conversationId=merged["conversationId"],
+            createdAt=merged["createdAt"],
+            originalText=merged["originalText"],
+            sentenceFeedback=await get_sentence_feedback(merged["conversationId"]),
+        )],
+        error=None
+    )
+
+
+async def search_conversations_in_db(user_id: str, query: str, page: int, limit: int, after: tuple[datetime, str] = None, include_total: bool = True, view: str = "full") -> ConversationResponse:
+    try:
+        conversations_collection = get_collection("conversations")
+
+        search_filter = {
+            "userId": user_id,
+            "$text": {"$search": query}
+        }
+
+        page_stages = []
+        if after:
+            page_stages.append({"$match": build_after_filter(after)})
+        else:
+            page_stages.append({"$skip": (page - 1) * limit})
+
+        # fetch one extra document to know if there is a next page
+        page_stages = [
+            {"$sort": dict(CONVERSATION_SORT)},
+            *page_stages,
+            {"$limit": limit + 1},
+            {"$project": get_list_projection(view)},
+        ]
+
+        if include_total:
+            # run the text query once and get the page and the total from it
+            result = await (await conversations_collection.aggregate([
+                {"$match": search_filter},
+                {"$facet": {
+                    "conversations": page_stages,
+                    "total": [{"$count": "count"}],
+                }},
+            ])).to_list()
+            conversations = result[0]["conversations"]
+            total_conversations = result[0]["total"][0]["count"] if result[0]["total"] else 0
+        else:
+            conversations = await (await conversations_collection.aggregate(
+                [{"$match": search_filter}, *page_stages])).to_list()
+            total_conversations = None
+
+        next_cursor = get_next_cursor(conversations, limit)
+        if view != "summary":
+            await attach_sentence_feedback(conversations)
+
+        return ConversationResponse(
+            success=True,
+            data={
+                "conversations": conversations,
+                "total": total_conversations,
+                "page": page,
+                "limit": limit,
+                "nextCursor": next_cursor
+            },
+            error=None
+        )
+    except Exception as e:
+        return ConversationResponse(
+            success=False,
+            data=None,
+            error=f"An error occurred while searching conversations: {str(e)}"
+        )
+
+
+# most recent matching sentences scored for relevance. total and facets
+# cover the same sentences, and truncated is set when there were more
+SEARCH_CANDIDATE_LIMIT = 1000
+
+
+async def search_conversations_ranked(user_id: str, query: str, page: int, limit: int, include_total: bool = True, view: str = "full", error_type: str = None) -> ConversationResponse:
+    try:
+        query_terms = tokenize(query)
+        if not query_terms:
+            return await get_conversations_by_user_id(user_id, page, limit, None, include_total, view)
+
+        # typos can't be found by prefix, widen them to the user's own
+        # indexed terms within a few edits first
+        feedback_collection = get_collection("sentenceFeedback")
+        fuzzy_terms = []
+        if any(max_edits(term) for term in query_terms):
+            vocabulary = await feedback_collection.distinct("searchTerms", {"userId": user_id})
+            fuzzy_terms = expand_fuzzy_terms(query_terms, vocabulary)
+
+        # the $match is range scans on the userId/searchTerms multikey
+        # index. one sentence past the limit tells us the result was cut.
+        # facets ignore the error type filter so clients can show the other
+        # types
+        type_filter = [{"$match": {"errorTypes": normalize(error_type).strip()}}] if error_type else []
+        results = await (await feedback_collection.aggregate([
+            {"$match": {
+                "userId": user_id,
+                "searchTerms": {"$in": get_candidate_terms(query_terms, fuzzy_terms)},
+            }},
+            {"$sort": {"createdAt": -1}},
+            {"$limit": SEARCH_CANDIDATE_LIMIT + 1},
+            {"$facet": {
+                "matched": [{"$count": "count"}],
+                "candidates": [{"$limit": SEARCH_CANDIDATE_LIMIT}] + type_filter + [
+                    {"$project": {"_id": 0, "id": 1, "conversationId": 1,
+                                  "createdAt": 1, "searchTerms": 1}},
+                ],
+                "facets": [
+                    {"$limit": SEARCH_CANDIDATE_LIMIT},
+                    {"$unwind": "$errorTypes"},
+                    {"$group": {"_id": "$errorTypes", "count": {"$sum": 1}}},
+                ],
+            }},
+        ])).to_list()
+        result = results[0]
+
+        ranked = rank_conversations(
+            query, result["candidates"], datetime.utcnow())
+        facets = {item["_id"]: item["count"] for item in result["facets"]}
+        matched = result["matched"][0]["count"] if result["matched"] else 0
+
+        page_ids = [item["conversationId"]
+                    for item in ranked[(page - 1) * limit: page * limit]]
+        conversations = await get_collection("conversations").find(
+            {"userId": user_id, "conversationId": {"$in": page_ids}},
+            get_list_projection(view)
+        ).to_list()
+        # keep relevance order
+        conversations.sort(key=lambda item: page_ids.index(item["conversationId"]))
+        if view != "summary":
+            await attach_sentence_feedback(conversations)
+
+        return ConversationResponse(
+            success=True,
+            data={
+                "conversations": conversations,
+                "total": len(ranked) if include_total else None,
+                "page": page,
+                "limit": limit,
+                "nextCursor": None,
+                "facets": facets,
+                "truncated": matched > SEARCH_CANDIDATE_LIMIT
+            },
+            error=None
+        )
+    except Exception as e:
+        return ConversationResponse(
+            success=False,
+            data=None,
+            error=f"An error occurred while searching conversations: {str(e)}"
+        )
+
+
+async def delete_conversation_by_id(conversation_id: str) -> bool:
+    conversations_collection = get_collection("conversations")
+    deleted = await conversations_collection.find_one_and_delete(
+        {"conversationId": conversation_id}, projection={"_id": 0, "userId": 1})
+    if not deleted:
+        return False
+
+    await get_collection("sentenceFeedback").delete_many(
+        {"conversationId": conversation_id})
+    await increment_conversation_count(deleted["userId"], -1)
+    return True
+
+
+async def delete_correction_from_conversation(conversation_id: str, correction_id: str) -> bool:
+    # a single indexed delete instead of a $pull scan over an embedded array
+    deleted = await get_collection("sentenceFeedback").find_one_and_delete(
+        {"conversationId": conversation_id, "id": correction_id},
+        projection={"_id": 0, "errors": 1}
+    )
+    if not deleted:
+        return False
+
+    conversations_collection = get_collection("conversations")
+    await conversations_collection.update_one(
+        {"conversationId": conversation_id},
+        {
+            "$inc": {"sentenceCount": -1, "errorCount": -len(deleted["errors"])},
+            "$pull": {"previewFeedback": {"id": correction_id}},
+        }
+    )
+    return True
+
+
+async def delete_all_conversations_by_user_id(user_id: str) -> int:
+    conversations_collection = get_collection("conversations")
+    result = await conversations_collection.delete_many({"userId": user_id})
+    await get_collection("sentenceFeedback").delete_many({"userId": user_id})
+    await get_collection("conversationJobs").delete_many({"userId": user_id})
+    await increment_conversation_count(user_id, -result.deleted_count)
+    return result.deleted_count
+
+
+async def create_conversation_job(user_id: str, stage_names: list) -> str:
+    now = datetime.utcnow()
+    job = DbConversationJob(
+        jobId=str(uuid.uuid4()),
+        userId=user_id,
+        stages={name: DbJobStage() for name in stage_names},
+        createdAt=now,
+        updatedAt=now,
+    )
+    await get_collection("conversationJobs").insert_one(job.dict())
+    return job.jobId
+
+
+async def update_conversation_job(job_id: str, update: dict):
+    # update is a flat $set, e.g. {"status": "running"} or dotted stage
+    # fields like {"stages.transcribe.status": "succeeded"}
+    await get_collection("conversationJobs").update_one(
+        {"jobId": job_id},
+        {"$set": {**update, "updatedAt": datetime.utcnow()}}
+    )
+
+
+async def get_conversation_job(job_id: str, user_id: str) -> dict | None:
+    return await get_collection("conversationJobs").find_one(
+        {"jobId": job_id, "userId": user_id}, {"_id": 0})
+
+
+async def add_verification_code(user_id: str, code: str, expires_at: datetime, purpose: str, email: str = None):
+    codes_collection = get_collection("verificationCodes")
+
+    # delete any existing codes for this user and purpose
+    await codes_collection.delete_many({"userId": user_id, "purpose": purpose})
+
+    await codes_collection.insert_one({
+        "userId": user_id,
+        "code": code,
+        "email": email,
+        "expiresAt": expires_at,
+        "purpose": purpose,
+        "createdAt": datetime.utcnow()
+    })
+
+
+async def get_verification_code(user_id: str, purpose: str):
+    codes_collection = get_collection("verificationCodes")
+    return await codes_collection.find_one({"userId": user_id, "purpose": purpose})
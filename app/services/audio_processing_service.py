@@ -1,14 +1,20 @@
+import json
 import logging
 import os
-# used for file manipulation (copying files)
-import shutil
+import subprocess
+import threading
 import uuid
+import numpy as np
+from ai_models.model_tiers import MODEL_TIERS, get_tier_model_size, select_model_tier
+from ai_models.parallel_transcription import ParallelTranscriber
+from ai_models.whisper_model import get_asr_backend, get_asr_backend_options
+from app.config import Config
 from app.mongo.schemas.db_user_schema import DbUserSchema
-from paths import DATA_DIR
-# handles audio file conversion and manipulation
-from pydub import AudioSegment
+from app.utils.cache_utils import TTLCache
+from app.utils.audio_utils import check_audio_probe, detect_speech, get_dbfs, join_segments
+from app.utils.file_utils import copy_and_hash
+from paths import DATA_DIR, MODEL_SIZE
 import nltk
-from ai_models.whisper_model import whisper_model
 
 nltk.download("punkt")
 nltk.download("punkt_tab")
@@ -17,74 +23,278 @@ nltk.download("punkt_tab")
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# whisper's input format: mono 16khz float32 in [-1, 1]
+SAMPLE_RATE = 16000
+DECODE_TIMEOUT_SECONDS = 120
+# pause left between speech segments once the silence is cut
+SEGMENT_GAP_SECONDS = 0.2
 
-def format_and_transcribe_audio(file, user: DbUserSchema):
+# transcriptions of recent uploads by content, so a client retrying the same
+# upload doesn't pay for conversion and whisper again
+transcription_cache = TTLCache(
+    Config.TRANSCRIPTION_CACHE_SIZE, Config.TRANSCRIPTION_CACHE_TTL_SECONDS)
+
+_parallel_transcriber: ParallelTranscriber | None = None
+_parallel_transcriber_lock = threading.Lock()
+
+# recordings being transcribed in this process, part of the pressure the
+# model tier is picked by
+_active_transcriptions = 0
+_active_transcriptions_lock = threading.Lock()
+
+
+def get_whisper_model(model_size: str = MODEL_SIZE):
+    # loaded on first use so api nodes that only queue jobs never load
+    # whisper or torch
+    return get_asr_backend(model_size)
+
+
+def get_parallel_transcriber() -> ParallelTranscriber:
+    global _parallel_transcriber
+    with _parallel_transcriber_lock:
+        if _parallel_transcriber is None:
+            _parallel_transcriber = ParallelTranscriber(
+                Config.ASR_BACKEND,
+                MODEL_SIZE,
+                processes=Config.TRANSCRIBE_PROCESSES,
+                threads_per_process=Config.TRANSCRIBE_THREADS_PER_PROCESS,
+                chunk_seconds=Config.TRANSCRIBE_SEGMENT_SECONDS,
+                overlap_seconds=Config.TRANSCRIBE_OVERLAP_SECONDS,
+                backend_options=get_asr_backend_options(),
+            )
+        return _parallel_transcriber
+
+
+def close_parallel_transcriber():
+    if _parallel_transcriber is not None:
+        _parallel_transcriber.close()
+
+
+def format_and_transcribe_audio(file, user: DbUserSchema) -> tuple[str, dict]:
+    # returns the transcription and metadata about the audio, see
+    # prepare_audio
 
     print(f"Received file: {file.filename}")
 
+    # save uploaded file
+    try:
+        file_path, content_hash = save_upload(file)
+    except Exception as e:
+        raise RuntimeError(f"Failed to save file: {str(e)}") from e
+
+    target_language = user["targetLanguage"]
+
+    # the same upload again, e.g. a client retry
+    cached = get_cached_transcription(content_hash, target_language)
+    if cached is not None:
+        remove_files(file_path)
+        return cached
+
+    try:
+        # decode to samples in memory and drop the silence
+        audio, metadata = prepare_audio(file_path)
+
+        # transcribe
+        transcription, model_metadata = transcribe_audio(audio, target_language)
+        metadata.update(model_metadata)
+    finally:
+        # clean up temporary files
+        remove_files(file_path)
+
+    cache_transcription(content_hash, target_language, transcription, metadata)
+    return transcription, metadata
+
+
+# the pipeline stages below are also run one at a time by the job workers
+def save_upload(file) -> tuple[str, str]:
+    # returns the saved path and the sha256 of the upload
     unique_id = str(uuid.uuid4())
     ext = os.path.splitext(file.filename)[1] or ".m4a"
     file_path = os.path.join(DATA_DIR, f"{unique_id}{ext}")
 
-    # save uploaded file
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        return {
-            "success": False,
-            "data": None,
-            "error": f"Failed to save file: {str(e)}"
-        }
+    with open(file_path, "wb") as buffer:
+        content_hash = copy_and_hash(file.file, buffer)
 
     print(f"File saved to: {file_path}")
-    # convert to WAV
-    wav_path = clean_audio(file_path)
+    return file_path, content_hash
+
 
-    if is_silent(wav_path):
+def get_transcription_cache_key(content_hash: str, model_size: str, target_language: str) -> tuple:
+    # another model or language gives another transcription
+    return (content_hash, model_size, target_language)
+
+
+def get_cached_transcription(content_hash: str, target_language: str) -> tuple[str, dict] | None:
+    # which model a recording gets depends on how much speech it has, which
+    # isn't known before decoding. look under every size it could get and
+    # only reuse one that is still what it would get now
+    model_sizes = {MODEL_SIZE} | {
+        get_tier_model_size(tier, target_language, Config.ENGLISH_ONLY_MODELS)
+        for tier in MODEL_TIERS.values()
+    }
+    for model_size in sorted(model_sizes):
+        cached = transcription_cache.get(
+            get_transcription_cache_key(content_hash, model_size, target_language))
+        if cached is None:
+            continue
+        transcription, metadata = cached
+        tier_name, planned_size, _, _ = plan_transcription(
+            metadata["speechSeconds"], target_language)
+        if (tier_name, planned_size) != (metadata["modelTier"], model_size):
+            continue
+        print(f"Reusing transcription for upload {content_hash[:12]}")
+        return transcription, {**metadata, "transcriptionCached": True}
+    return None
+
+
+def cache_transcription(content_hash: str, target_language: str, transcription: str, metadata: dict):
+    # a smaller model picked because transcription was busy would otherwise
+    # be served to later uploads that should get the full one
+    if metadata.get("modelTierReduced"):
+        return
+    transcription_cache.set(
+        get_transcription_cache_key(content_hash, metadata["modelSize"], target_language),
+        (transcription, metadata))
+
+
+def prepare_audio(file_path: str) -> tuple[np.ndarray, dict]:
+    # checks the header, then decodes the upload once. the samples are used
+    # for the silence checks and go straight to whisper, no wav on disk.
+    # returns the speech only samples and how much silence was cut
+    probe_audio(file_path)
+    audio = decode_audio(file_path)
+
+    if is_silent(audio):
         raise ValueError("No speech detected in the audio file (silence).")
 
-    print(f"Converted to WAV: {wav_path}")
-    
-    target_language = user["targetLanguage"]
+    print(f"Decoded {len(audio) / SAMPLE_RATE:.1f}s of audio")
+    return trim_silence(audio)
+
+
+def trim_silence(audio: np.ndarray) -> tuple[np.ndarray, dict]:
+    # voice activity detection, so whisper doesn't spend time on lead-in
+    # silence and long pauses
+    if Config.VAD_ENABLED:
+        segments = detect_speech(
+            audio, SAMPLE_RATE, use_flatness=Config.VAD_SPECTRAL_FLATNESS)
+        if len(segments) == 0:
+            raise ValueError("No speech detected in the audio file (silence).")
+        speech = join_segments(audio, segments, int(SAMPLE_RATE * SEGMENT_GAP_SECONDS))
+    else:
+        segments, speech = [(0, len(audio))], audio
+
+    audio_seconds = len(audio) / SAMPLE_RATE
+    trimmed_seconds = max(0.0, audio_seconds - len(speech) / SAMPLE_RATE)
+    metadata = {
+        "audioSeconds": round(audio_seconds, 2),
+        "speechSeconds": round(len(speech) / SAMPLE_RATE, 2),
+        "trimmedSeconds": round(trimmed_seconds, 2),
+        "trimmedRatio": round(trimmed_seconds / audio_seconds, 4) if audio_seconds else 0.0,
+        "speechSegments": len(segments),
+        "transcriptionCached": False,
+    }
+    print(f"Trimmed {metadata['trimmedSeconds']}s of silence ({metadata['trimmedRatio']:.0%})")
+    return speech, metadata
+
+
+def choose_model_tier(speech_seconds: float, target_language: str, pressure: int = 0) -> tuple[str, str, dict]:
+    # returns the tier name, model size and decode options
+    if not Config.MODEL_TIERS_ENABLED:
+        return "default", MODEL_SIZE, {}
+    tier_name = select_model_tier(
+        speech_seconds, pressure, Config.SHORT_CLIP_SECONDS,
+        Config.LONG_AUDIO_SECONDS, Config.MODEL_TIER_BUSY_JOBS)
+    tier = MODEL_TIERS[tier_name]
+    model_size = get_tier_model_size(tier, target_language, Config.ENGLISH_ONLY_MODELS)
+    return tier_name, model_size, tier["decodeOptions"]
+
+
+def plan_transcription(speech_seconds: float, target_language: str, pressure: int = 0) -> tuple[str, str, dict, bool]:
+    # returns the tier name, the model size that actually runs, decode
+    # options and whether the recording is cut into parallel segments
+    tier_name, model_size, decode_options = choose_model_tier(
+        speech_seconds, target_language, pressure)
+    parallel = Config.TRANSCRIBE_PROCESSES > 1 and speech_seconds > Config.LONG_AUDIO_SECONDS
+    if parallel:
+        # every pool process holds MODEL_SIZE
+        model_size = MODEL_SIZE
+    return tier_name, model_size, decode_options, parallel
+
+
+def transcribe_audio(audio: np.ndarray, target_language: str, queued_jobs: int = 0) -> tuple[str, dict]:
+    # returns the transcription and which model made it. queued_jobs is how
+    # many audio jobs are waiting behind this one, if the caller knows
+    global _active_transcriptions
+    speech_seconds = len(audio) / SAMPLE_RATE
+    with _active_transcriptions_lock:
+        pressure = _active_transcriptions + queued_jobs
+        _active_transcriptions += 1
+    try:
+        tier_name, model_size, decode_options, parallel = plan_transcription(
+            speech_seconds, target_language, pressure)
+        # compared by what actually runs, the parallel path always has
+        # MODEL_SIZE whatever the tier
+        _, unloaded_size, unloaded_options, _ = plan_transcription(
+            speech_seconds, target_language)
+        reduced = (model_size, decode_options) != (unloaded_size, unloaded_options)
+        if parallel:
+            print(f"Transcribing {speech_seconds:.0f}s in parallel segments ({tier_name} tier)")
+            transcription = get_parallel_transcriber().transcribe(
+                audio, target_language, SAMPLE_RATE, decode_options)
+        else:
+            print(f"Transcribing {speech_seconds:.0f}s with {model_size} ({tier_name} tier)")
+            transcription = get_whisper_model(model_size).transcribe(
+                audio, target_language, decode_options)
+    finally:
+        with _active_transcriptions_lock:
+            _active_transcriptions -= 1
 
-    # transcribe
-    transcription = whisper_model.transcribe(wav_path, target_language)
     if not transcription.strip():
         raise ValueError("No speech detected in the audio file.")
+    # reduced when transcription was busy and the model or decode options
+    # differ from what the recording gets otherwise
+    return transcription, {"modelTier": tier_name, "modelSize": model_size, "modelTierReduced": reduced}
 
-    # clean up temporary files
-    try:
-        os.remove(file_path)
-        os.remove(wav_path)
-    except Exception:
-        pass
-
-    return transcription
-
-
-def clean_audio(input_path: str) -> str:
-    output_path = input_path.replace(".mp3", ".wav").replace(".m4a", ".wav")
-    convert_to_wav(input_path, output_path)
-    print(f"Converted audio file saved to: {output_path}")
-    return output_path
-
-# wav is commonly used for audio processing because its uncompressed
-def convert_to_wav(input_path: str, output_path: str):
-    print(f"Converting audio file to WAV: {input_path} -> {output_path}")
-    audio = AudioSegment.from_file(input_path)
-    audio = audio.set_channels(1).set_frame_rate(
-        16000)  # mono, 16khz (standard format)
-    audio.export(output_path, format="wav")
-
-
-def is_silent(wav_path: str, silence_thresh: float = -40.0) -> bool:
-    audio = AudioSegment.from_file(wav_path)
-    print(f"Is audio silent?: {audio.dBFS < silence_thresh}")
-    return audio.dBFS < silence_thresh
-
-def transcribe(wav_path: str) -> str:
-    print(f"Transcribing audio file: {wav_path}")
-    thing = whisper_model.transcribe(wav_path)
-    print(f"Transcription result: {thing}")
-    return thing
+
+def remove_files(*paths):
+    for path in paths:
+        if not path:
+            continue
+        try:
+            os.remove(path)
+        except Exception:
+            pass
+
+
+def probe_audio(file_path: str) -> float:
+    # reads only the container header, so malformed or overlong uploads are
+    # rejected before paying for a decode
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-print_format", "json",
+         "-show_entries", "format=duration:stream=codec_type", file_path],
+        capture_output=True, timeout=DECODE_TIMEOUT_SECONDS,
+    )
+    if result.returncode != 0:
+        raise ValueError("The audio file could not be read.")
+    return check_audio_probe(json.loads(result.stdout or b"{}"), Config.MAX_AUDIO_SECONDS)
+
+
+def decode_audio(file_path: str) -> np.ndarray:
+    # one ffmpeg pass to mono 16khz float32 on stdout. reads from the saved
+    # upload rather than stdin because m4a files often keep their index at
+    # the end, which ffmpeg can't seek to in a pipe
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-v", "error", "-threads", "0", "-i", file_path,
+         "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-"],
+        capture_output=True, timeout=DECODE_TIMEOUT_SECONDS,
+    )
+    if result.returncode != 0:
+        raise ValueError(
+            f"The audio file could not be decoded: {result.stderr.decode(errors='ignore').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def is_silent(audio: np.ndarray, silence_thresh: float = -40.0) -> bool:
+    dbfs = get_dbfs(audio)
+    print(f"Is audio silent?: {dbfs < silence_thresh}")
+    return dbfs < silence_thresh
@@ -0,0 +1,225 @@
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from app.config import Config
+from app.services import database_service
+from app.services.audio_processing_service import cache_transcription, get_cached_transcription, prepare_audio, remove_files, transcribe_audio
+from app.services.grammar_service import correct_grammar
+from app.services.upload_storage import delete_upload, download_upload
+from app.services.work_queue import MongoQueueStore, WorkQueue, run_worker
+
+logger = logging.getLogger(__name__)
+
+# in the order the workers run them
+JOB_STAGES = ["convert", "transcribe", "analyze", "save"]
+
+# work queue job kinds. audio workers need whisper, grammar workers only
+# need the llm client, so they can run on different nodes
+AUDIO_JOB = "conversation.audio"
+GRAMMAR_JOB = "conversation.grammar"
+
+_work_queue: WorkQueue | None = None
+_work_queue_lock = threading.Lock()
+_embedded_workers_stop = threading.Event()
+
+
+def get_work_queue() -> WorkQueue:
+    global _work_queue
+    with _work_queue_lock:
+        if _work_queue is None:
+            _work_queue = WorkQueue(
+                MongoQueueStore(database_service.get_collection("workQueue")),
+                lease_seconds=Config.WORK_QUEUE_LEASE_SECONDS,
+                max_attempts=Config.WORK_QUEUE_MAX_ATTEMPTS,
+                retry_delay_seconds=Config.WORK_QUEUE_RETRY_DELAY_SECONDS,
+                on_dead=handle_dead_job,
+            )
+        return _work_queue
+
+
+def enqueue_conversation_job(job_id: str, user_id: str, upload_id: str, filename: str) -> str:
+    return get_work_queue().enqueue(AUDIO_JOB, {
+        "conversationJobId": job_id,
+        "userId": user_id,
+        "uploadId": upload_id,
+        "filename": filename,
+    })
+
+
+class JobStageError(Exception):
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RetryableJobError(RuntimeError):
+    # left to the work queue, which backs off and runs the job again
+    pass
+
+
+@contextmanager
+def job_stage(job_id: str, stage: str):
+    started_at = datetime.utcnow()
+    start = time.perf_counter()
+    database_service.update_conversation_job(job_id, {
+        "status": "running",
+        f"stages.{stage}.status": "running",
+        f"stages.{stage}.startedAt": started_at,
+    })
+
+    status, error = "succeeded", None
+    try:
+        yield
+    except Exception as e:
+        status, error = "failed", str(e)
+        raise
+    finally:
+        duration_ms = int((time.perf_counter() - start) * 1000)
+        database_service.update_conversation_job(job_id, {
+            f"stages.{stage}.status": status,
+            f"stages.{stage}.finishedAt": datetime.utcnow(),
+            f"stages.{stage}.durationMs": duration_ms,
+            f"stages.{stage}.error": error,
+        })
+        logger.info(f"Job {job_id} stage {stage} {status} in {duration_ms}ms")
+
+
+def get_job_user(payload: dict):
+    user = database_service.get_user_by_id(payload["userId"])
+    if not user:
+        raise JobStageError("User not found", 404)
+    return user
+
+
+def process_audio_job(payload: dict):
+    # retried by the queue on unexpected errors, so only clean up the upload
+    # once the audio is dealt with for good
+    job_id = payload["conversationJobId"]
+    file_path = None
+    try:
+        user = get_job_user(payload)
+        file_path, content_hash = download_upload(payload["uploadId"], payload["filename"])
+
+        cached = get_cached_transcription(content_hash, user["targetLanguage"])
+        if cached is None:
+            with job_stage(job_id, "convert"):
+                audio, metadata = prepare_audio(file_path)
+
+            with job_stage(job_id, "transcribe"):
+                transcription, model_metadata = transcribe_audio(
+                    audio, user["targetLanguage"], get_work_queue().count_queued(AUDIO_JOB))
+            metadata.update(model_metadata)
+            cache_transcription(content_hash, user["targetLanguage"], transcription, metadata)
+            database_service.update_conversation_job(job_id, {"metadata": metadata})
+        else:
+            transcription, metadata = cached
+            database_service.update_conversation_job(job_id, {
+                "metadata": metadata,
+                "stages.convert.status": "skipped",
+                "stages.transcribe.status": "skipped",
+            })
+
+        get_work_queue().enqueue(GRAMMAR_JOB, {
+            "conversationJobId": job_id,
+            "userId": payload["userId"],
+            "transcription": transcription,
+        })
+        delete_upload(payload["uploadId"])
+
+    # bad audio won't get better on a retry
+    except (JobStageError, ValueError) as e:
+        fail_conversation_job(job_id, str(e), getattr(e, "status_code", 422))
+        delete_upload(payload["uploadId"])
+    finally:
+        remove_files(file_path)
+
+
+def process_grammar_job(payload: dict):
+    # may run again after the save, e.g. when the lease ran out or the job
+    # update below failed. the analysis is kept on the job and the save is
+    # keyed by the job id, so a retry doesn't merge the sentences twice
+    job_id = payload["conversationJobId"]
+    try:
+        job = database_service.get_conversation_job(job_id, payload["userId"]) or {}
+        if job.get("status") == "succeeded":
+            return {"conversationId": job["result"]["data"][0]["conversationId"]}
+
+        user = get_job_user(payload)
+
+        response = job.get("analysis")
+        if response is None:
+            with job_stage(job_id, "analyze"):
+                response = correct_grammar(payload["transcription"], user)
+                if not response["success"]:
+                    if response.get("retryable"):
+                        raise RetryableJobError(response["error"])
+                    raise JobStageError(response["error"], 422)
+            database_service.update_conversation_job(job_id, {"analysis": response})
+
+        with job_stage(job_id, "save"):
+            conversation = database_service.upsert_conversation(
+                response, payload["userId"], job_id)
+
+        database_service.update_conversation_job(job_id, {
+            "status": "succeeded",
+            "result": conversation.dict(),
+        })
+        return {"conversationId": conversation.data[0].conversationId}
+
+    except (JobStageError, ValueError) as e:
+        fail_conversation_job(job_id, str(e), getattr(e, "status_code", 422))
+
+
+JOB_HANDLERS = {
+    AUDIO_JOB: process_audio_job,
+    GRAMMAR_JOB: process_grammar_job,
+}
+
+
+def handle_dead_job(job: dict):
+    payload = job["payload"]
+    fail_conversation_job(
+        payload["conversationJobId"], f"An unexpected error occurred: {job['lastError']}", 500)
+    if payload.get("uploadId"):
+        delete_upload(payload["uploadId"])
+
+
+def fail_conversation_job(job_id: str, error: str, status_code: int):
+    logger.error(f"Job {job_id} failed: {error}")
+    try:
+        database_service.update_conversation_job(job_id, {
+            "status": "failed",
+            "error": error,
+            "errorStatusCode": status_code,
+        })
+    except Exception:
+        logger.exception(f"Could not record failure for job {job_id}")
+
+
+def get_worker_id(index: int = 0) -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{index}"
+
+
+def start_embedded_workers():
+    # lets a single process serve the api and run jobs. set
+    # CONVERSATION_JOB_WORKERS=0 on api nodes when workers run separately
+    # (python -m app.worker)
+    _embedded_workers_stop.clear()
+    for index in range(Config.CONVERSATION_JOB_WORKERS):
+        threading.Thread(
+            target=run_worker,
+            args=(get_work_queue(), JOB_HANDLERS, get_worker_id(index),
+                  _embedded_workers_stop, Config.WORK_QUEUE_POLL_INTERVAL_SECONDS),
+            name=f"conversation-worker-{index}",
+            daemon=True,
+        ).start()
+
+
+def stop_embedded_workers():
+    # running jobs are not waited for, their leases run out and another
+    # worker picks them up
+    _embedded_workers_stop.set()
@@ -0,0 +1,153 @@
+# sentence level cache of grammar feedback. learners repeat the same
+# sentences a lot (greetings, drills, re-recordings), so feedback is kept per
+# normalized sentence, languages, model and prompt version. a bounded LRU in
+# each process sits in front of a shared mongo collection whose entries
+# expire on their own
+import copy
+import hashlib
+import json
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from app.utils.cache_utils import TTLCache
+
+
+def normalize_sentence(sentence: str) -> str:
+    # whisper output for the same words can differ in unicode form and spacing
+    return " ".join(unicodedata.normalize("NFC", sentence).split())
+
+
+def get_feedback_key(sentence: str, target_language: str, app_language: str, model: str, prompt_version: str) -> str:
+    key = json.dumps([normalize_sentence(sentence), target_language,
+                     app_language, model, prompt_version], ensure_ascii=False)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(feedback, sentence: str) -> bool:
+    # feedback is matched to sentences by position. if the model merged two
+    # sentences and split another the counts still line up, so only cache
+    # feedback whose original is the sentence it would be cached under
+    return (
+        isinstance(feedback, dict)
+        and "error" not in feedback
+        and isinstance(feedback.get("original"), str)
+        and normalize_sentence(feedback["original"]) == normalize_sentence(sentence)
+        and isinstance(feedback.get("corrected"), str)
+        and isinstance(feedback.get("errors"), list)
+    )
+
+
+class MongoFeedbackStore:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get_many(self, keys: list, now: datetime) -> dict:
+        # the ttl monitor only runs every minute, skip what already expired
+        documents = self.collection.find(
+            {"key": {"$in": keys}, "expiresAt": {"$gt": now}},
+            {"_id": 0, "key": 1, "feedback": 1},
+        )
+        return {document["key"]: document["feedback"] for document in documents}
+
+    def set_many(self, entries: dict, now: datetime, expires_at: datetime):
+        self.collection.bulk_write([
+            UpdateOne(
+                {"key": key},
+                {"$set": {"feedback": feedback, "createdAt": now, "expiresAt": expires_at}},
+                upsert=True,
+            )
+            for key, feedback in entries.items()
+        ], ordered=False)
+
+
+class InMemoryFeedbackStore:
+    # same interface as MongoFeedbackStore, for tests
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: list, now: datetime) -> dict:
+        with self._lock:
+            return {
+                key: copy.deepcopy(self._entries[key][1])
+                for key in keys
+                if key in self._entries and self._entries[key][0] > now
+            }
+
+    def set_many(self, entries: dict, now: datetime, expires_at: datetime):
+        with self._lock:
+            for key, feedback in entries.items():
+                self._entries[key] = (expires_at, copy.deepcopy(feedback))
+
+
+class FeedbackCache:
+    # store is optional and best effort: if mongo is unreachable we fall back
+    # to the llm, never fail the request
+    def __init__(self, store=None, maxsize: int = 4096, ttl_seconds: float = 30 * 24 * 3600, clock=datetime.utcnow):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._memory = TTLCache(maxsize, ttl_seconds)
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ["lookups", "memoryHits", "storeHits", "misses", "writes", "storeErrors"], 0)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def get_many(self, keys: list) -> dict:
+        # {key: feedback} for every key that is cached, copies the caller
+        # may change
+        unique_keys = list(dict.fromkeys(keys))
+        found = {}
+        for key in unique_keys:
+            feedback = self._memory.get(key)
+            if feedback is not None:
+                found[key] = feedback
+        memory_hits = len(found)
+
+        missing = [key for key in unique_keys if key not in found]
+        if missing and self.store is not None:
+            try:
+                stored = self.store.get_many(missing, self._clock())
+            except Exception as e:
+                print(f"Feedback cache lookup failed: {e}")
+                self._count("storeErrors")
+                stored = {}
+            for key, feedback in stored.items():
+                self._memory.set(key, feedback)
+                found[key] = feedback
+
+        self._count("lookups", len(unique_keys))
+        self._count("memoryHits", memory_hits)
+        self._count("storeHits", len(found) - memory_hits)
+        self._count("misses", len(unique_keys) - len(found))
+        return {key: copy.deepcopy(feedback) for key, feedback in found.items()}
+
+    def set_many(self, entries: dict):
+        entries = {key: copy.deepcopy(feedback) for key, feedback in entries.items()}
+        if not entries:
+            return
+        for key, feedback in entries.items():
+            self._memory.set(key, feedback)
+        self._count("writes", len(entries))
+        if self.store is None:
+            return
+        now = self._clock()
+        try:
+            self.store.set_many(entries, now, now + timedelta(seconds=self.ttl_seconds))
+        except Exception as e:
+            print(f"Feedback cache write failed: {e}")
+            self._count("storeErrors")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        hits = counters["memoryHits"] + counters["storeHits"]
+        return {
+            **counters,
+            "hitRatio": round(hits / counters["lookups"], 4) if counters["lookups"] else 0.0,
+            "memory": self._memory.snapshot(),
+        }
@@ -1,12 +1,88 @@
+import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import json
 import uuid
 import nltk
-from ai_models.ollama_client import chat_with_ollama
+from nltk.tokenize import PunktTokenizer
+from ai_models.ollama_client import StreamInterruptedError, stream_chat_with_ollama, together_caller
+from ai_models.prompt_builder import PROMPT_VERSION, build_grammar_messages, chunk_by_token_budget
+from ai_models.resilience import deadline, deadline_after, remaining_time
+from app.config import Config
 from app.mongo.schemas.db_user_schema import DbUserSchema
+from app.services import database_service
+from app.services.feedback_cache import FeedbackCache, MongoFeedbackStore, get_feedback_key, is_cacheable
+from app.utils.concurrency_utils import iter_streamed
+
+logger = logging.getLogger(__name__)
 
 nltk.download('punkt')
+nltk.download('punkt_tab')
+
+GRAMMAR_MODEL = "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"
+
+# punkt models by language code, loaded once per process instead of on
+# every sent_tokenize call
+PUNKT_LANGUAGES = {
+    "en": "english",
+    "es": "spanish",
+    "fr": "french",
+}
+_sentence_tokenizers: dict[str, PunktTokenizer] = {}
+_sentence_tokenizers_lock = threading.Lock()
+
+_feedback_cache: FeedbackCache | None = None
+_feedback_cache_lock = threading.Lock()
+
+# every request in the process shares this pool, so LLM_MAX_CONCURRENCY caps
+# chunk analyses in flight. the provider limit in ollama_client sits on top
+_analysis_executor: ThreadPoolExecutor | None = None
+_analysis_executor_lock = threading.Lock()
+
+
+def get_analysis_executor() -> ThreadPoolExecutor:
+    global _analysis_executor
+    with _analysis_executor_lock:
+        if _analysis_executor is None:
+            _analysis_executor = ThreadPoolExecutor(
+                max_workers=Config.LLM_MAX_CONCURRENCY, thread_name_prefix="chunk-analysis")
+        return _analysis_executor
+
+
+def get_feedback_cache() -> FeedbackCache:
+    global _feedback_cache
+    with _feedback_cache_lock:
+        if _feedback_cache is None:
+            _feedback_cache = FeedbackCache(
+                MongoFeedbackStore(database_service.get_collection("feedbackCache")),
+                maxsize=Config.FEEDBACK_CACHE_SIZE,
+                ttl_seconds=Config.FEEDBACK_CACHE_TTL_SECONDS,
+            )
+        return _feedback_cache
+
+
+def get_sentence_tokenizer(language: str) -> PunktTokenizer:
+    punkt_language = PUNKT_LANGUAGES.get(language, "english")
+    with _sentence_tokenizers_lock:
+        tokenizer = _sentence_tokenizers.get(punkt_language)
+        if tokenizer is None:
+            tokenizer = PunktTokenizer(punkt_language)
+            _sentence_tokenizers[punkt_language] = tokenizer
+        return tokenizer
+
+
+def preload_sentence_tokenizers():
+    for language in PUNKT_LANGUAGES:
+        try:
+            get_sentence_tokenizer(language)
+        except LookupError as e:
+            # punkt data missing, the first request will try again
+            print(f"Could not load sentence tokenizer for {language}: {e}")
+
+
+preload_sentence_tokenizers()
+
 
 def correct_grammar(transcription, user: DbUserSchema, target_language: str = None):
 
@@ -23,11 +99,21 @@ def correct_grammar(transcription, user: DbUserSchema, target_language: str = No
     # analyze text
     response = analyze_text(transcription, target_language, app_language)
 
+    if "error" in response:
+        return {
+            "success": False,
+            "data": None,
+            "error": response["error"]
+        }
+
     if not response.get("sentenceFeedback") or all("error" in feedback for feedback in response["sentenceFeedback"]):
+        # there was text to analyze, so the model failed, was unreachable or
+        # ran out of time. worth trying again later
         return {
             "success": False,
             "data": None,
-            "error": "Failed to process transcription. No valid feedback was generated."
+            "error": "Failed to process transcription. No valid feedback was generated.",
+            "retryable": True
         }
 
     # assign ids to sentence and errors
@@ -45,23 +131,19 @@ def analyze_text(transcription: str, target_language: str, app_language: str):
     if not transcription.strip():
         return {"error": "Transcription is empty"}
 
-    chunks = chunk_sentences(transcription)
+    # feedback arrives in any order, put the sentences back in spoken order
+    feedback_by_position = dict(iter_chunk_feedback(
+        transcription, target_language, app_language))
+    sentence_feedback = [
+        feedback
+        for position in sorted(feedback_by_position)
+        for feedback in feedback_by_position[position]
+    ]
 
-    sentence_feedback = []
-    for chunk in chunks:
-        feedback = ollama_analysis_with_retry(
-            chunk, target_language, app_language)
-
-        if "error" in feedback:
-            print(f"Error in chunk analysis: {feedback['error']}")
-            continue
+    return build_analysis(transcription, sentence_feedback)
 
-        # if feedback is a list, extend instead of append to sentence_feedback
-        if isinstance(feedback, list):
-            sentence_feedback.extend(feedback)
-        else:
-            sentence_feedback.append(feedback)
 
+def build_analysis(transcription: str, sentence_feedback: list) -> dict:
     return {
         "createdAt": datetime.utcnow().isoformat() + "Z",
         "originalText": transcription,
@@ -69,24 +151,94 @@ def analyze_text(transcription: str, target_language: str, app_language: str):
     }
 
 
-def chunk_sentences(text, max_sentences=5):
-    sentences = nltk.sent_tokenize(text)
-
-    chunks = []
-
-    # Loop over sentences, grouping them into chunks of max_sentences
-    for i in range(0, len(sentences), max_sentences):
-        chunk = sentences[i:i+max_sentences]
-        chunks.append(chunk)
-
-    return chunks
-
+def iter_chunk_feedback(transcription: str, target_language: str, app_language: str):
+    # yields (position, list of sentence feedback) as results come in, so not
+    # in spoken order. position is the index of the first sentence covered,
+    # sorting by it restores the order. sentences with cached feedback are
+    # yielded straight away, the rest one at a time as the model finishes
+    # each of them. sentences of chunks that still fail after retries are
+    # skipped
+    sentences = split_sentences(transcription, target_language)
+    keys = [
+        get_feedback_key(sentence, target_language, app_language, GRAMMAR_MODEL, PROMPT_VERSION)
+        for sentence in sentences
+    ]
+    feedback_cache = get_feedback_cache()
+    cached = feedback_cache.get_many(keys)
+    misses = [position for position, key in enumerate(keys) if key not in cached]
+    # the running hit ratio is on the feedback cache metrics endpoint
+    logger.debug("Feedback cache: %d/%d sentences cached", len(sentences) - len(misses), len(sentences))
+
+    for position, key in enumerate(keys):
+        if key in cached:
+            yield position, [{"original": sentences[position].strip(), **cached[key]}]
+    if not misses:
+        return
+
+    chunks = chunk_by_token_budget(
+        [sentences[position] for position in misses],
+        Config.LLM_CHUNK_TOKEN_BUDGET, Config.LLM_CHUNK_MAX_SENTENCES)
+    # sentence positions of each chunk
+    chunk_positions = []
+    offset = 0
+    for chunk in chunks:
+        chunk_positions.append(misses[offset:offset + len(chunk)])
+        offset += len(chunk)
 
-def ollama_analysis_with_retry(chunk: list, target_language: str, app_language: str, retries: int = 3, delay: int = 2):
-    for attempt in range(retries):
-        response = ollama_analysis(chunk, target_language, app_language)
-        if "error" not in response:
-            return response
+    # every chunk shares one time budget for the whole recording
+    deadline_at = deadline_after(Config.LLM_REQUEST_BUDGET_SECONDS)
+    executor = get_analysis_executor()
+    to_cache = {}
+    try:
+        for index, (offset, feedback) in iter_streamed(executor, analyze_chunk, chunks, target_language, app_language, deadline_at):
+            position = chunk_positions[index][offset]
+            if len(feedback) == 1 and is_cacheable(feedback[0], sentences[position]):
+                to_cache[keys[position]] = {"corrected": feedback[0]["corrected"], "errors": feedback[0]["errors"]}
+            yield position, feedback
+    finally:
+        # one write for the recording, also when the client went away
+        if to_cache:
+            feedback_cache.set_many(to_cache)
+
+
+def split_sentences(text: str, language: str = "en") -> list:
+    return get_sentence_tokenizer(language).tokenize(text)
+
+
+def chunk_sentences(text, language: str = "en"):
+    # split in the transcription's language, then group sentences by token
+    # count so long and short sentences make similar sized requests
+    return chunk_by_token_budget(
+        split_sentences(text, language), Config.LLM_CHUNK_TOKEN_BUDGET, Config.LLM_CHUNK_MAX_SENTENCES)
+
+
+def analyze_chunk(chunk: list, emit, target_language: str, app_language: str, deadline_at: float):
+    # runs on a pool thread, so the deadline has to be set up here.
+    # emit((offset, feedback)) passes feedback on as it is parsed, offset is
+    # the place in the chunk of the first sentence it covers
+    with deadline(deadline_at):
+        response = ollama_analysis_with_retry(chunk, emit, target_language, app_language)
+    if response:
+        print(f"Error in chunk analysis: {response['error']}")
+
+
+def ollama_analysis_with_retry(chunk: list, emit, target_language: str, app_language: str, retries: int = 3):
+    # provider errors are already retried inside stream_chat_with_ollama. this
+    # only asks again when the reply broke off or couldn't be used. sentences
+    # passed on by an earlier attempt aren't passed on again. the backoff
+    # sleeps this pool thread, not the event loop
+    delivered = set()
+    for attempt in range(1, retries + 1):
+        response = ollama_analysis(chunk, emit, delivered, target_language, app_language)
+        if response is None:
+            return None
+        if not response.get("retryable") or attempt == retries:
+            break
+
+        delay = together_caller.policy.compute_delay(attempt)
+        remaining = remaining_time()
+        if remaining is not None and delay >= remaining:
+            break
         print(f"Retrying Ollama API... Attempt {attempt + 1}/{retries}")
         time.sleep(delay)
 
@@ -98,8 +250,10 @@ def ollama_analysis_with_retry(chunk: list, target_language: str, app_language:
     }
 
 
-def ollama_analysis(chunk: list, target_language: str, app_language: str):
-
+def ollama_analysis(chunk: list, emit, delivered: set, target_language: str, app_language: str):
+    # feedback whose original is the sentence at its place in the reply is
+    # passed on as soon as the model closes it. the rest (the model merged or
+    # split sentences) is passed on together once the reply is complete
     if not chunk or not any(sentence.strip() for sentence in chunk):
         return {
             "error": "Chunk is empty or contains only invalid sentences",
@@ -108,72 +262,34 @@ def ollama_analysis(chunk: list, target_language: str, app_language: str):
             "errors": []
         }
 
-    LANGUAGE_MAP = {
-        "en": "English",
-        "es": "Spanish",
-        "fr": "French"
-    }
-
-    target_language_full = LANGUAGE_MAP.get(target_language, target_language)
-    app_language_full = LANGUAGE_MAP.get(app_language, app_language)
-
-    sentence_templates = []
-    for sentence in chunk:
-        sentence_templates.append({
-            "original": sentence.strip(),
-            "corrected": "the_corrected_version_of_the_sentence",
-            "errors": [
-                {
-                    "error": "description_of_the_error",
-                    "reason": "grammatical_reason_for_the_error",
-                    "suggestion": "suggestion_to_fix_the_error",
-                    "improvedClause": "the_corrected_version_of_the_clause",
-                    "type": "type_of_error" 
-                }
-            ]
-        })
-
-    # convert to JSON string
-    sentence_templates_json = json.dumps(sentence_templates, indent=2)
-
-    # Build the prompt
-    prompt = f"""
-    The following transcription is in {target_language_full}. It represents spoken language, not written text. Focus only on correcting grammar, word choice, and clarity. Do not correct punctuation, capitalization, or any other aspects of written formatting, even if they appear incorrect. Ignore punctuation-related issues such as missing commas, periods, or quotation marks. Do not classify punctuation-related issues as grammar errors.
-
-    A sentence may have no errors at all. If there are no errors in a sentence, return an empty `errors` array for that sentence.
-
-    Analyze the transcription and return the results in this structured JSON format:
-    {sentence_templates_json}
-
-    For each sentence:
-    1. Identify errors and create an `errors` array.
-    2. For each error, include:
-       - `error`: A description of the error.
-       - `reason`: The grammatical reason for the error.
-       - `suggestion`: How to fix the error.
-       - `improvedClause`: The corrected clause.
-       - `type`: The type of error (e.g., "grammar", "word choice", "pronunciation", "spelling", "punctuation", "capitalization").
-    3. Provide the `corrected` sentence with all errors fixed.
-
-    Your explanations should be in {app_language_full}.
-
-    ### Transcription:
-    {chunk}
-    """
+    messages = build_grammar_messages(chunk, target_language, app_language)
+    unmatched = []
 
     try:
-        response = chat_with_ollama(
-            model="meta-llama/Llama-3.3-70B-Instruct-Turbo-Free", prompt=prompt
-        )
-
-        return response
-    except json.JSONDecodeError as e:
+        for offset, sentence in enumerate(stream_chat_with_ollama(model=GRAMMAR_MODEL, messages=messages)):
+            if offset < len(chunk) and is_cacheable(sentence, chunk[offset]):
+                if offset not in delivered:
+                    delivered.add(offset)
+                    emit((offset, [sentence]))
+            else:
+                unmatched.append(sentence)
+    except StreamInterruptedError as e:
+        print(f"Ollama API Error: {e}")
+        return {
+            "error": f"An unexpected error occurred while processing the transcription: {str(e)}",
+            "original": chunk,
+            "corrected": None,
+            "errors": [],
+            "retryable": True
+        }
+    except ValueError as e:
         print(f"JSON Decode Error: {e}")
         return {
             "error": "Failed to process transcription due to invalid JSON response from Ollama.",
             "original": chunk,
             "corrected": None,
-            "errors": []
+            "errors": [],
+            "retryable": True
         }
     except Exception as e:
         print(f"Ollama API Error: {e}")
@@ -184,6 +300,14 @@ def ollama_analysis(chunk: list, target_language: str, app_language: str):
             "errors": []
         }
 
+    remaining = [offset for offset in range(len(chunk)) if offset not in delivered]
+    if unmatched and remaining:
+        emit((remaining[0], unmatched))
+    elif unmatched:
+        # every sentence already has its feedback, the rest is extra
+        print(f"Dropping {len(unmatched)} unmatched feedback items")
+    return None
+
 
 def assign_ids_to_feedback(sentence_feedback: list) -> list:
     for sentence in sentence_feedback:
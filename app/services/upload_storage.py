@@ -0,0 +1,42 @@
+# uploads waiting for a worker live in gridfs so any node can process them
+import os
+import uuid
+from bson import ObjectId
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+from app.config import Config
+from app.mongo.MongoClient import get_mongo_client
+from app.utils.file_utils import copy_and_hash
+from paths import DATA_DIR
+
+UPLOAD_BUCKET = "uploads"
+
+
+def get_upload_bucket() -> GridFSBucket:
+    db = get_mongo_client()[Config.MONGO_DB_NAME]
+    return GridFSBucket(db, bucket_name=UPLOAD_BUCKET)
+
+
+def store_upload(file, user_id: str) -> str:
+    upload_id = get_upload_bucket().upload_from_stream(
+        file.filename or "upload.m4a",
+        file.file,
+        metadata={"userId": user_id, "contentType": file.content_type},
+    )
+    return str(upload_id)
+
+
+def download_upload(upload_id: str, filename: str) -> tuple[str, str]:
+    # workers convert from a local copy, named and hashed like save_upload
+    ext = os.path.splitext(filename)[1] or ".m4a"
+    file_path = os.path.join(DATA_DIR, f"{uuid.uuid4()}{ext}")
+    with open(file_path, "wb") as buffer, get_upload_bucket().open_download_stream(ObjectId(upload_id)) as upload:
+        content_hash = copy_and_hash(upload, buffer)
+    return file_path, content_hash
+
+
+def delete_upload(upload_id: str):
+    try:
+        get_upload_bucket().delete(ObjectId(upload_id))
+    except NoFile:
+        pass
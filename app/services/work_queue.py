@@ -0,0 +1,308 @@
+# durable work queue for the transcription and grammar workers.
+# jobs are claimed with a lease that the worker keeps extending while it
+# runs. if a worker dies its lease runs out and another worker picks the job
+# up again, so handlers must be safe to run more than once. jobs that keep
+# failing are moved to the dead state instead of being retried forever
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"
+
+
+class MongoQueueStore:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def insert(self, job: dict):
+        self.collection.insert_one(dict(job))
+
+    def get(self, job_id: str) -> dict | None:
+        return self.collection.find_one({"jobId": job_id}, {"_id": 0})
+
+    def claim(self, kinds: list, worker_id: str, now: datetime, lease_expires_at: datetime) -> dict | None:
+        update = {
+            "$set": {
+                "status": RUNNING,
+                "leaseOwner": worker_id,
+                "leaseExpiresAt": lease_expires_at,
+                "heartbeatAt": now,
+                "updatedAt": now,
+            },
+            "$inc": {"attempts": 1},
+        }
+        # jobs whose worker went away first, then the oldest queued job.
+        # two queries so each one is served by its own index
+        job = self.collection.find_one_and_update(
+            {"status": RUNNING, "kind": {"$in": kinds},
+                "leaseExpiresAt": {"$lt": now}},
+            update,
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job:
+            return job
+        return self.collection.find_one_and_update(
+            {"status": QUEUED, "kind": {"$in": kinds},
+                "availableAt": {"$lte": now}},
+            update,
+            sort=[("availableAt", ASCENDING)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def update_owned(self, job_id: str, worker_id: str, fields: dict) -> bool:
+        # only the worker holding the lease may change a running job
+        result = self.collection.update_one(
+            {"jobId": job_id, "status": RUNNING, "leaseOwner": worker_id},
+            {"$set": fields},
+        )
+        return result.matched_count > 0
+
+    def count_queued(self, kind: str) -> int:
+        return self.collection.count_documents({"status": QUEUED, "kind": kind})
+
+    def count_by_status(self) -> dict:
+        rows = self.collection.aggregate([
+            {"$group": {"_id": {"kind": "$kind", "status": "$status"}, "count": {"$sum": 1}}}
+        ])
+        counts = {}
+        for row in rows:
+            counts.setdefault(row["_id"]["kind"], {})[row["_id"]["status"]] = row["count"]
+        return counts
+
+
+class InMemoryQueueStore:
+    # same behaviour as MongoQueueStore for tests and single process runs
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def insert(self, job: dict):
+        with self._lock:
+            self._jobs[job["jobId"]] = dict(job)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def claim(self, kinds: list, worker_id: str, now: datetime, lease_expires_at: datetime) -> dict | None:
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job["status"] == RUNNING and job["kind"] in kinds and job["leaseExpiresAt"] < now
+            ]
+            queued = sorted(
+                (job for job in self._jobs.values()
+                 if job["status"] == QUEUED and job["kind"] in kinds and job["availableAt"] <= now),
+                key=lambda job: job["availableAt"],
+            )
+            candidates = expired or queued
+            if not candidates:
+                return None
+
+            job = candidates[0]
+            job.update({
+                "status": RUNNING,
+                "leaseOwner": worker_id,
+                "leaseExpiresAt": lease_expires_at,
+                "heartbeatAt": now,
+                "updatedAt": now,
+                "attempts": job["attempts"] + 1,
+            })
+            return dict(job)
+
+    def update_owned(self, job_id: str, worker_id: str, fields: dict) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job["status"] != RUNNING or job["leaseOwner"] != worker_id:
+                return False
+            job.update(fields)
+            return True
+
+    def count_queued(self, kind: str) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values()
+                       if job["status"] == QUEUED and job["kind"] == kind)
+
+    def count_by_status(self) -> dict:
+        counts = {}
+        with self._lock:
+            for job in self._jobs.values():
+                by_status = counts.setdefault(job["kind"], {})
+                by_status[job["status"]] = by_status.get(job["status"], 0) + 1
+        return counts
+
+
+class WorkQueue:
+    def __init__(self, store, lease_seconds: float = 120, max_attempts: int = 3, retry_delay_seconds: float = 10, clock=datetime.utcnow, on_dead=None):
+        self.store = store
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.retry_delay = timedelta(seconds=retry_delay_seconds)
+        self.clock = clock
+        # called with the job when it is dead lettered
+        self.on_dead = on_dead
+
+    def enqueue(self, kind: str, payload: dict, max_attempts: int = None) -> str:
+        now = self.clock()
+        job_id = str(uuid.uuid4())
+        self.store.insert({
+            "jobId": job_id,
+            "kind": kind,
+            "payload": payload,
+            "status": QUEUED,
+            "attempts": 0,
+            "maxAttempts": max_attempts or self.max_attempts,
+            "availableAt": now,
+            "leaseOwner": None,
+            "leaseExpiresAt": None,
+            "heartbeatAt": None,
+            "lastError": None,
+            "result": None,
+            "createdAt": now,
+            "updatedAt": now,
+        })
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        return self.store.get(job_id)
+
+    def claim(self, kinds: list, worker_id: str) -> dict | None:
+        while True:
+            now = self.clock()
+            job = self.store.claim(kinds, worker_id, now, now + self.lease)
+            if job is None:
+                return None
+            if job["attempts"] <= job["maxAttempts"]:
+                return job
+            # its last attempt lost the lease, most likely the worker died
+            # part way through. don't hand it out again
+            self._dead_letter(job, worker_id, job.get("lastError") or "Lease expired")
+
+    def heartbeat(self, job: dict, worker_id: str) -> bool:
+        now = self.clock()
+        return self.store.update_owned(job["jobId"], worker_id, {
+            "leaseExpiresAt": now + self.lease,
+            "heartbeatAt": now,
+            "updatedAt": now,
+        })
+
+    def complete(self, job: dict, worker_id: str, result=None) -> bool:
+        now = self.clock()
+        return self.store.update_owned(job["jobId"], worker_id, {
+            "status": DONE,
+            "result": result,
+            "leaseOwner": None,
+            "leaseExpiresAt": None,
+            "finishedAt": now,
+            "updatedAt": now,
+        })
+
+    def fail(self, job: dict, worker_id: str, error: str, retryable: bool = True) -> str:
+        if retryable and job["attempts"] < job["maxAttempts"]:
+            now = self.clock()
+            # back off 1x, 2x, 4x... the retry delay between attempts
+            delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+            self.store.update_owned(job["jobId"], worker_id, {
+                "status": QUEUED,
+                "availableAt": now + delay,
+                "lastError": error,
+                "leaseOwner": None,
+                "leaseExpiresAt": None,
+                "updatedAt": now,
+            })
+            return QUEUED
+
+        self._dead_letter(job, worker_id, error)
+        return DEAD
+
+    def _dead_letter(self, job: dict, worker_id: str, error: str):
+        now = self.clock()
+        moved = self.store.update_owned(job["jobId"], worker_id, {
+            "status": DEAD,
+            "lastError": error,
+            "leaseOwner": None,
+            "leaseExpiresAt": None,
+            "deadAt": now,
+            "updatedAt": now,
+        })
+        if not moved:
+            return
+        logger.error(f"Job {job['jobId']} ({job['kind']}) dead lettered: {error}")
+        if self.on_dead:
+            try:
+                self.on_dead({**job, "lastError": error})
+            except Exception:
+                logger.exception(f"on_dead failed for job {job['jobId']}")
+
+    def count_queued(self, kind: str) -> int:
+        # includes jobs waiting out a retry delay
+        return self.store.count_queued(kind)
+
+    def stats(self) -> dict:
+        return self.store.count_by_status()
+
+
+@contextmanager
+def lease_heartbeat(queue: WorkQueue, job: dict, worker_id: str):
+    # keep extending the lease from a side thread while the handler runs
+    stop = threading.Event()
+    interval = queue.lease.total_seconds() / 3
+
+    def beat():
+        while not stop.wait(interval):
+            if not queue.heartbeat(job, worker_id):
+                logger.warning(f"Lost the lease on job {job['jobId']}")
+                return
+
+    thread = threading.Thread(target=beat, name=f"heartbeat-{job['jobId']}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_worker(queue: WorkQueue, handlers: dict, worker_id: str, stop_event: threading.Event, poll_interval: float = 1.0):
+    # handlers maps job kind -> function(payload) returning the job result.
+    # raising marks the attempt failed and the job is retried
+    kinds = list(handlers)
+    logger.info(f"Worker {worker_id} started for {', '.join(kinds)}")
+    while not stop_event.is_set():
+        try:
+            job = queue.claim(kinds, worker_id)
+        except Exception:
+            logger.exception(f"Worker {worker_id} could not claim a job")
+            stop_event.wait(poll_interval)
+            continue
+
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+
+        process_job(queue, handlers, job, worker_id)
+    logger.info(f"Worker {worker_id} stopped")
+
+
+def process_job(queue: WorkQueue, handlers: dict, job: dict, worker_id: str):
+    try:
+        with lease_heartbeat(queue, job, worker_id):
+            result = handlers[job["kind"]](job["payload"])
+    except Exception as e:
+        logger.exception(f"Job {job['jobId']} ({job['kind']}) attempt {job['attempts']} failed")
+        queue.fail(job, worker_id, str(e))
+        return
+
+    if not queue.complete(job, worker_id, result):
+        logger.warning(f"Job {job['jobId']} finished after its lease was taken over")
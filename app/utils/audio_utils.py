@@ -0,0 +1,154 @@
+# helpers for decoded audio, mono float32 samples in [-1, 1]
+import numpy as np
+
+
+def check_audio_probe(probe: dict, max_seconds: float) -> float:
+    if not any(stream.get("codec_type") == "audio" for stream in probe.get("streams", [])):
+        raise ValueError("The file does not contain any audio.")
+    try:
+        duration = float(probe.get("format", {})["duration"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("The audio file has no readable duration.")
+    if duration > max_seconds:
+        raise ValueError(
+            f"The recording is too long ({duration:.0f}s), the limit is {max_seconds:.0f}s.")
+    return duration
+
+
+def get_dbfs(audio: np.ndarray) -> float:
+    # loudness relative to full scale, like pydub's AudioSegment.dBFS
+    if audio.size == 0:
+        return float("-inf")
+    rms = np.sqrt(np.mean(np.square(audio, dtype=np.float64)))
+    return float(20 * np.log10(rms)) if rms > 0 else float("-inf")
+
+
+def frame_audio(audio: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    # (frames, frame_length) view over the samples, the last partial frame is
+    # zero padded
+    if len(audio) < frame_length:
+        audio = np.pad(audio, (0, frame_length - len(audio)))
+    else:
+        remainder = (len(audio) - frame_length) % hop_length
+        if remainder:
+            audio = np.pad(audio, (0, hop_length - remainder))
+    return np.lib.stride_tricks.sliding_window_view(audio, frame_length)[::hop_length]
+
+
+def get_frame_energy_db(frames: np.ndarray) -> np.ndarray:
+    return 10 * np.log10(np.mean(np.square(frames, dtype=np.float64), axis=1) + 1e-12)
+
+
+def get_spectral_flatness(frames: np.ndarray) -> np.ndarray:
+    # close to 1 for noise, close to 0 for tonal sounds like voiced speech
+    power = np.abs(np.fft.rfft(frames * np.hanning(frames.shape[1]), axis=1)) ** 2 + 1e-12
+    return np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+
+
+def get_runs(mask: np.ndarray) -> np.ndarray:
+    # (start, end) index pairs of the runs of True in mask, end exclusive
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.column_stack((np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def detect_speech(
+    audio: np.ndarray,
+    sample_rate: int,
+    frame_ms: float = 30,
+    hop_ms: float = 10,
+    margin_db: float = 12,
+    min_db: float = -50,
+    use_flatness: bool = False,
+    flatness_threshold: float = 0.5,
+    min_speech_ms: float = 60,
+    preroll_ms: float = 100,
+    hangover_ms: float = 300,
+) -> np.ndarray:
+    # energy based voice activity detection. returns (start, end) sample
+    # pairs of speech. a frame is speech when it is louder than both min_db
+    # and the clip's noise floor plus margin_db (capped below its loud
+    # frames, so clips with no pauses keep their quiet syllables). bursts
+    # shorter than min_speech_ms are dropped, then each speech run is
+    # widened by preroll_ms before and hangover_ms after so word onsets and
+    # short pauses inside sentences survive
+    frame_length = int(sample_rate * frame_ms / 1000)
+    hop_length = int(sample_rate * hop_ms / 1000)
+    if len(audio) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    frames = frame_audio(audio, frame_length, hop_length)
+    energy_db = get_frame_energy_db(frames)
+    noise_floor, loud = np.percentile(energy_db, [10, 95])
+    threshold = max(min_db, min(noise_floor + margin_db, loud - 2 * margin_db))
+    speech = energy_db > threshold
+    if use_flatness:
+        speech &= get_spectral_flatness(frames) < flatness_threshold
+
+    # drop clicks and other short bursts
+    runs = get_runs(speech)
+    runs = runs[runs[:, 1] - runs[:, 0] >= max(1, round(min_speech_ms / hop_ms))]
+    marks = np.zeros(len(speech) + 1, dtype=np.int64)
+    np.add.at(marks, runs[:, 0], 1)
+    np.add.at(marks, runs[:, 1], -1)
+    speech = np.cumsum(marks)[:-1] > 0
+
+    # hangover: frame i is kept if there is speech from i - hangover to
+    # i + preroll
+    preroll = round(preroll_ms / hop_ms)
+    hangover = round(hangover_ms / hop_ms)
+    kernel = np.ones(preroll + hangover + 1)
+    speech = np.convolve(speech, kernel)[preroll:preroll + len(speech)] > 0
+
+    segments = get_runs(speech)
+    if len(segments) == 0:
+        return segments
+    segments[:, 0] *= hop_length
+    segments[:, 1] = np.minimum((segments[:, 1] - 1) * hop_length + frame_length, len(audio))
+    # a frame reaches frame_length past its start, so runs only a frame or
+    # two apart overlap in samples. merge runs that touch or overlap
+    starts_new = np.concatenate(([True], segments[1:, 0] > segments[:-1, 1]))
+    ends_run = np.concatenate((starts_new[1:], [True]))
+    return np.column_stack((segments[starts_new, 0], segments[ends_run, 1]))
+
+
+def join_segments(audio: np.ndarray, segments: np.ndarray, gap_samples: int) -> np.ndarray:
+    # speech segments back to back with a short pause between them (never
+    # longer than the one that was cut), so the model still hears where one
+    # phrase ends
+    if len(segments) == 0:
+        return audio[:0]
+    parts = []
+    previous_end = None
+    for start, end in segments:
+        if previous_end is not None:
+            parts.append(np.zeros(max(0, min(gap_samples, start - previous_end)), dtype=audio.dtype))
+        parts.append(audio[start:end])
+        previous_end = end
+    return np.concatenate(parts)
+
+
+def plan_chunks(audio: np.ndarray, sample_rate: int, chunk_seconds: float, overlap_seconds: float, hop_ms: float = 10) -> np.ndarray:
+    # (start, end) sample pairs covering audio in pieces of at most
+    # chunk_seconds plus overlap on each side. each cut is made at the
+    # quietest frame of the last 40% of its window, which after
+    # trim_silence is usually one of the pauses left between phrases
+    chunk_length = int(sample_rate * chunk_seconds)
+    overlap = int(sample_rate * overlap_seconds)
+    if len(audio) <= chunk_length:
+        return np.array([[0, len(audio)]], dtype=np.int64)
+
+    hop_length = int(sample_rate * hop_ms / 1000)
+    energy_db = get_frame_energy_db(frame_audio(audio, hop_length, hop_length))
+    cuts = [0]
+    while len(audio) - cuts[-1] > chunk_length:
+        search_start = (cuts[-1] + int(chunk_length * 0.6)) // hop_length
+        search_end = (cuts[-1] + chunk_length) // hop_length
+        frame = search_start + int(np.argmin(energy_db[search_start:search_end]))
+        cuts.append(frame * hop_length + hop_length // 2)
+    cuts.append(len(audio))
+
+    cuts = np.array(cuts, dtype=np.int64)
+    return np.column_stack((
+        np.maximum(cuts[:-1] - overlap, 0),
+        np.minimum(cuts[1:] + overlap, len(audio)),
+    ))
@@ -1,11 +1,12 @@
+import hmac
 import random
 import jwt
 from datetime import datetime, timedelta
-from fastapi import Depends, HTTPException
+from fastapi import Depends, Header, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from app.config import Config
-from app.services.database_service import add_verification_code, get_verification_code, store_refresh_token
+from app.services.async_database_service import add_verification_code, get_verification_code, store_refresh_token
 
 SECRET_KEY = Config.SECRET_KEY
 ALGORITHM = Config.ALGORITHM
@@ -19,12 +20,12 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-def create_and_return_auth_tokens(user_id: str):
+async def create_and_return_auth_tokens(user_id: str):
     access_token = create_access_token(data={"sub": str(user_id)})
     refresh_token = create_refresh_token(data={"sub": str(user_id)})
 
     # store refresh token in database
-    store_refresh_token(user_id, refresh_token)
+    await store_refresh_token(user_id, refresh_token)
 
     return {
         "accessToken": access_token,
@@ -66,6 +67,15 @@ def get_current_user_from_token(token: str = Depends(oauth2_scheme)):
     return decode_token(token)
 
 
+def require_metrics_token(x_metrics_token: str = Header(None)):
+    # internal state is for operators and scrapers, not app users, who can
+    # all get a token through anonymous registration
+    if not Config.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_metrics_token or not hmac.compare_digest(x_metrics_token, Config.METRICS_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid metrics token")
+
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -78,19 +88,19 @@ def generate_verification_code(length=6):
     return ''.join([str(random.randint(0, 9)) for _ in range(length)])
 
 
-def create_email_verification_code(user_id: str, email: str = None, expires_minutes: int = 10) -> str:
+async def create_email_verification_code(user_id: str, email: str = None, expires_minutes: int = 10) -> str:
 
     code = generate_verification_code()
     expires_at = datetime.utcnow() + timedelta(minutes=expires_minutes)
 
-    add_verification_code(user_id, code, expires_at,
+    await add_verification_code(user_id, code, expires_at,
      'email_verification', email)
 
     return code
 
 
-def verify_email_verification_code(user_id: str, code: str, email: str = None) -> bool:
-    verification_code = get_verification_code(user_id, 'email_verification')
+async def verify_email_verification_code(user_id: str, code: str, email: str = None) -> bool:
+    verification_code = await get_verification_code(user_id, 'email_verification')
 
     if not verification_code or verification_code['code'] != code or verification_code['expiresAt'] < datetime.utcnow():
         return False
@@ -101,15 +111,15 @@ def verify_email_verification_code(user_id: str, code: str, email: str = None) -
     return True
 
 
-def create_password_reset_code(user_id: str, expires_minutes: int = 10) -> str:
+async def create_password_reset_code(user_id: str, expires_minutes: int = 10) -> str:
     code = generate_verification_code()
     expires_at = datetime.utcnow() + timedelta(minutes=expires_minutes)
-    add_verification_code(user_id, code, expires_at, 'password_reset')
+    await add_verification_code(user_id, code, expires_at, 'password_reset')
     return code
 
 
-def verify_password_reset_code(user_id: str, code: str) -> bool:
-    verification_code = get_verification_code(user_id, 'password_reset')
+async def verify_password_reset_code(user_id: str, code: str) -> bool:
+    verification_code = await get_verification_code(user_id, 'password_reset')
     if (
         not verification_code or
         verification_code['code'] != code or
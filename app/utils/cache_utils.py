@@ -0,0 +1,154 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_MISSING = object()
+
+# invalidation only reaches the process that made the change, so secrets are
+# never cached. credential checks read the user from the database
+USER_CREDENTIAL_FIELDS = ("password", "refreshToken", "anonUserSecret")
+
+
+def without_credentials(user: dict) -> dict:
+    return {field: value for field, value in user.items() if field not in USER_CREDENTIAL_FIELDS}
+
+
+class TTLCache:
+    # bounded LRU where entries also expire after ttl seconds. shared by the
+    # event loop and worker threads, so guard with a lock
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxSize": self.maxsize,
+                "ttlSeconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class UserCache:
+    # user documents keyed by userId, plus an email -> userId index.
+    # lookups check the current request's memo first, then the process wide
+    # TTL cache. writers must call invalidate so neither serves stale data
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self._users = TTLCache(maxsize, ttl, clock)
+        self._emails = TTLCache(maxsize, ttl, clock)
+        self._request_users: ContextVar[dict | None] = ContextVar(
+            "request_users", default=None)
+        self._lock = threading.Lock()
+        self.request_hits = 0
+        self.invalidations = 0
+
+    @contextmanager
+    def request_scope(self):
+        token = self._request_users.set({})
+        try:
+            yield
+        finally:
+            self._request_users.reset(token)
+
+    def get_by_id(self, user_id: str):
+        request_users = self._request_users.get()
+        if request_users is not None and user_id in request_users:
+            with self._lock:
+                self.request_hits += 1
+            return copy.deepcopy(request_users[user_id])
+
+        user = self._users.get(user_id)
+        if user is None:
+            return None
+        if request_users is not None:
+            request_users[user_id] = user
+        return copy.deepcopy(user)
+
+    def get_by_email(self, email: str):
+        user_id = self._emails.get(email)
+        if user_id is None:
+            return None
+        user = self.get_by_id(user_id)
+        # the address may have changed since the index entry was written
+        if user is None or user.get("userEmail") != email:
+            return None
+        return user
+
+    def set(self, user: dict):
+        # keep our own copy so callers can't change the cached document
+        user = copy.deepcopy(without_credentials(user))
+        self._users.set(user["userId"], user)
+        if user.get("userEmail"):
+            self._emails.set(user["userEmail"], user["userId"])
+        request_users = self._request_users.get()
+        if request_users is not None:
+            request_users[user["userId"]] = user
+
+    def invalidate(self, user_id: str):
+        self._users.delete(user_id)
+        request_users = self._request_users.get()
+        if request_users is not None:
+            request_users.pop(user_id, None)
+        with self._lock:
+            self.invalidations += 1
+
+    def clear(self):
+        self._users.clear()
+        self._emails.clear()
+
+    def snapshot(self) -> dict:
+        users = self._users.snapshot()
+        emails = self._emails.snapshot()
+        with self._lock:
+            request_hits = self.request_hits
+            invalidations = self.invalidations
+        return {
+            **users,
+            "requestHits": request_hits,
+            "emailHits": emails["hits"],
+            "emailMisses": emails["misses"],
+            "invalidations": invalidations,
+        }
@@ -0,0 +1,49 @@
+import queue
+import threading
+from concurrent.futures import Executor
+
+
+def iter_streamed(executor: Executor, fn, items: list, *args):
+    # runs fn(item, emit, *args) for every item on the executor and yields
+    # (index, value) for each emit(value) as it happens, so a worker can pass
+    # on partial results before it returns. exceptions are re-raised. if the
+    # caller stops early, work that hasn't started yet is cancelled
+    results = queue.Queue()
+    finished = object()
+
+    def run(index, item):
+        try:
+            return fn(item, lambda value: results.put((index, value)), *args)
+        finally:
+            results.put((index, finished))
+
+    futures = [executor.submit(run, index, item) for index, item in enumerate(items)]
+    try:
+        pending = len(futures)
+        while pending:
+            index, value = results.get()
+            if value is finished:
+                pending -= 1
+                futures[index].result()
+                continue
+            yield index, value
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+class ProviderLimits:
+    # caps concurrent calls to each upstream provider across the process,
+    # whichever thread or request they come from
+    def __init__(self, limits: dict, default_limit: int):
+        self._limits = dict(limits)
+        self._default_limit = default_limit
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def slot(self, provider: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if provider not in self._semaphores:
+                self._semaphores[provider] = threading.BoundedSemaphore(
+                    self._limits.get(provider, self._default_limit))
+            return self._semaphores[provider]
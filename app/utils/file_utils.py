@@ -0,0 +1,13 @@
+import hashlib
+
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def copy_and_hash(source, destination) -> str:
+    # copies one file object to another and returns the sha256 of what was
+    # copied, so uploads are hashed while they are written, not read twice
+    digest = hashlib.sha256()
+    for block in iter(lambda: source.read(COPY_BLOCK_SIZE), b""):
+        digest.update(block)
+        destination.write(block)
+    return digest.hexdigest()
@@ -0,0 +1,45 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+# conversations are listed newest first, with conversationId as a tie breaker
+# so that two conversations created in the same millisecond keep a stable order
+CONVERSATION_SORT = [("createdAt", -1), ("conversationId", -1)]
+
+
+def encode_cursor(created_at: datetime, conversation_id: str) -> str:
+    payload = json.dumps(
+        {"c": created_at.isoformat(), "i": conversation_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["c"]), str(payload["i"])
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def build_after_filter(after: tuple[datetime, str]) -> dict:
+    # everything strictly after the cursor in CONVERSATION_SORT order.
+    # with the userId/createdAt/conversationId index this is a single seek
+    created_at, conversation_id = after
+    return {
+        "$or": [
+            {"createdAt": {"$lt": created_at}},
+            {"createdAt": created_at, "conversationId": {"$lt": conversation_id}},
+        ]
+    }
+
+
+def get_next_cursor(documents: list, limit: int) -> str | None:
+    # callers fetch limit + 1 documents; the extra one only tells us whether
+    # another page exists and is trimmed off here
+    if len(documents) <= limit:
+        return None
+    del documents[limit:]
+    last = documents[-1]
+    return encode_cursor(last["createdAt"], last["conversationId"])
@@ -0,0 +1,190 @@
+import math
+import re
+import unicodedata
+from datetime import datetime
+
+# matches of a query term against an indexed term, best first
+EXACT_MATCH_WEIGHT = 1.0
+PREFIX_MATCH_WEIGHT = 0.8
+FUZZY_MATCH_WEIGHT = 0.6
+
+# query terms shorter than this only match exactly
+MIN_PREFIX_LENGTH = 3
+
+# indexed terms a misspelled query term is widened to, closest first
+MAX_FUZZY_EXPANSIONS = 10
+
+# how much a brand new conversation is boosted over an old one, and how fast
+# that boost fades
+RECENCY_BOOST = 0.5
+RECENCY_HALF_LIFE_DAYS = 30
+
+# other matching sentences in a conversation add a little on top of the best one
+EXTRA_SENTENCE_WEIGHT = 0.1
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    # casefold and strip accents so "qué" matches "que"
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> list[str]:
+    return _WORD_RE.findall(normalize(text or ""))
+
+
+def build_search_fields(feedback: dict) -> dict:
+    # indexed alongside each sentenceFeedback document
+    texts = [feedback.get("original", ""), feedback.get("corrected", "")]
+    error_types = set()
+    for error in feedback.get("errors", []):
+        texts.extend([
+            error.get("error", ""),
+            error.get("suggestion", ""),
+            error.get("improvedClause", ""),
+            error.get("type", ""),
+        ])
+        if error.get("type"):
+            error_types.add(normalize(error["type"]).strip())
+
+    terms = set()
+    for text in texts:
+        terms.update(tokenize(text))
+
+    return {"searchTerms": sorted(terms), "errorTypes": sorted(error_types)}
+
+
+def get_candidate_terms(query_terms: list[str], fuzzy_terms: list[str] = ()) -> list:
+    # values for a searchTerms $in on the multikey index: short terms as they
+    # are, longer ones as anchored regexes (index range scans) so "par" finds
+    # "park", and the user's own terms a typo is close to (see
+    # expand_fuzzy_terms) as they are
+    prefixes = sorted({term for term in query_terms if len(term) >= MIN_PREFIX_LENGTH})
+    exact = sorted({term for term in query_terms if len(term) < MIN_PREFIX_LENGTH} | set(fuzzy_terms))
+    return exact + [re.compile("^" + re.escape(term)) for term in prefixes]
+
+
+def expand_fuzzy_terms(query_terms: list[str], vocabulary: list[str]) -> list[str]:
+    # indexed terms within max_edits of a query term, so "recieve" retrieves
+    # sentences with "receive". vocabulary is the user's distinct searchTerms
+    expanded = set()
+    for query_term in dict.fromkeys(query_terms):
+        allowed_edits = max_edits(query_term)
+        if not allowed_edits:
+            continue
+        close = []
+        for term in vocabulary:
+            if term == query_term or abs(len(term) - len(query_term)) > allowed_edits:
+                continue
+            distance = edit_distance(query_term, term, allowed_edits)
+            if distance <= allowed_edits:
+                close.append((distance, term))
+        expanded.update(term for _, term in sorted(close)[:MAX_FUZZY_EXPANSIONS])
+    return sorted(expanded)
+
+
+def max_edits(term: str) -> int:
+    if len(term) < 4:
+        return 0
+    if len(term) < 8:
+        return 1
+    return 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    # optimal string alignment distance, so a swapped pair of letters (the
+    # most common typo) costs one edit. gives up early once over limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            distance = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            )
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                distance = min(distance, before_previous[j - 2] + 1)
+            current.append(distance)
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return previous[-1]
+
+
+def match_weight(query_term: str, terms: list[str]) -> float:
+    best = 0.0
+    allowed_edits = max_edits(query_term)
+    for term in terms:
+        if term == query_term:
+            return EXACT_MATCH_WEIGHT
+        if len(query_term) >= MIN_PREFIX_LENGTH and term.startswith(query_term):
+            best = max(best, PREFIX_MATCH_WEIGHT)
+        elif best < FUZZY_MATCH_WEIGHT and allowed_edits and edit_distance(query_term, term, allowed_edits) <= allowed_edits:
+            best = FUZZY_MATCH_WEIGHT
+    return best
+
+
+def recency_multiplier(created_at: datetime, now: datetime) -> float:
+    age_days = max(0.0, (now - created_at).total_seconds() / 86400)
+    return 1 + RECENCY_BOOST * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def rank_conversations(query: str, candidates: list[dict], now: datetime) -> list[dict]:
+    # candidates are sentenceFeedback documents with conversationId,
+    # createdAt and searchTerms. returns the matching conversations, best
+    # first
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    if not query_terms:
+        return []
+
+    matches = []
+    document_frequency = dict.fromkeys(query_terms, 0)
+    for candidate in candidates:
+        weights = {
+            term: match_weight(term, candidate.get("searchTerms", []))
+            for term in query_terms
+        }
+        if not any(weights.values()):
+            continue
+        for term, weight in weights.items():
+            if weight:
+                document_frequency[term] += 1
+        matches.append((candidate, weights))
+
+    total_sentences = len(matches) or 1
+    conversations = {}
+    for candidate, weights in matches:
+        matched_terms = [term for term, weight in weights.items() if weight]
+        # rarer terms count for more, and sentences matching every query
+        # term beat ones matching only some of them
+        score = sum(
+            weights[term] * math.log(1 + total_sentences / document_frequency[term])
+            for term in matched_terms
+        ) * len(matched_terms) / len(query_terms)
+
+        conversation = conversations.setdefault(candidate["conversationId"], {
+            "conversationId": candidate["conversationId"],
+            "createdAt": candidate["createdAt"],
+            "sentenceScores": [],
+            "matchedSentenceIds": [],
+        })
+        conversation["createdAt"] = max(conversation["createdAt"], candidate["createdAt"])
+        conversation["sentenceScores"].append(score)
+        conversation["matchedSentenceIds"].append(candidate.get("id"))
+
+    ranked = []
+    for conversation in conversations.values():
+        scores = sorted(conversation.pop("sentenceScores"), reverse=True)
+        score = scores[0] + EXTRA_SENTENCE_WEIGHT * sum(scores[1:])
+        conversation["score"] = score * recency_multiplier(conversation["createdAt"], now)
+        ranked.append(conversation)
+
+    ranked.sort(key=lambda item: (item["score"], item["createdAt"]), reverse=True)
+    return ranked
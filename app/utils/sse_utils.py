@@ -0,0 +1,13 @@
+import json
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # stop nginx from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_sse(event: str, data) -> str:
+    # json never contains a raw newline, so each event is a single data line
+    payload = json.dumps(data, default=str, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
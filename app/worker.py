@@ -0,0 +1,55 @@
+# standalone conversation worker. claims jobs from the workQueue collection,
+# so any number of these can run on any node next to the api:
+#   python -m app.worker                      audio and grammar jobs
+#   python -m app.worker --kinds grammar      only llm analysis, no whisper
+import argparse
+import logging
+import signal
+import threading
+from app.config import Config
+from app.services.audio_processing_service import close_parallel_transcriber
+from app.services.conversation_job_service import AUDIO_JOB, GRAMMAR_JOB, JOB_HANDLERS, get_work_queue, get_worker_id
+from app.services.work_queue import run_worker
+
+KINDS = {"audio": AUDIO_JOB, "grammar": GRAMMAR_JOB}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Process queued conversation jobs.")
+    parser.add_argument("--kinds", nargs="+", choices=sorted(KINDS), default=sorted(KINDS),
+                        help="job kinds to claim")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="jobs to run at the same time")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    handlers = {KINDS[kind]: JOB_HANDLERS[KINDS[kind]] for kind in args.kinds}
+    stop_event = threading.Event()
+    # finish the current job, then exit
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    threads = [
+        threading.Thread(
+            target=run_worker,
+            args=(get_work_queue(), handlers, get_worker_id(index),
+                  stop_event, Config.WORK_QUEUE_POLL_INTERVAL_SECONDS),
+            name=f"conversation-worker-{index}",
+        )
+        for index in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    close_parallel_transcriber()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# word error rate and realtime factor of each asr backend on a folder of clips:
+#   python -m benchmarks.asr_backends samples/ --model small --language es
+# every clip needs a reference transcript next to it, session.m4a -> session.txt.
+# needs ffmpeg and the engine of every backend that is compared
+import argparse
+import os
+import time
+from ai_models.asr_backends import ASR_BACKENDS, create_asr_backend
+from benchmarks.asr_metrics import SAMPLE_RATE, load_audio, normalize_words, realtime_factor, word_error_rate
+
+AUDIO_EXTENSIONS = (".m4a", ".mp3", ".wav", ".ogg", ".webm", ".flac")
+
+
+def find_clips(directory: str) -> list:
+    # (audio path, reference text) for each clip that has a transcript
+    clips = []
+    for name in sorted(os.listdir(directory)):
+        base, extension = os.path.splitext(name)
+        reference_path = os.path.join(directory, base + ".txt")
+        if extension.lower() in AUDIO_EXTENSIONS and os.path.exists(reference_path):
+            with open(reference_path, encoding="utf-8") as reference:
+                clips.append((os.path.join(directory, name), reference.read()))
+    return clips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ASR backends on reference clips.")
+    parser.add_argument("clips", help="folder of recordings with a .txt transcript each")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--backends", nargs="+", choices=sorted(ASR_BACKENDS), default=sorted(ASR_BACKENDS))
+    args = parser.parse_args()
+
+    clips = [(path, load_audio(path), reference) for path, reference in find_clips(args.clips)]
+    if not clips:
+        parser.error(f"no clips with a transcript in {args.clips}")
+    audio_seconds = sum(len(audio) for _, audio, _ in clips) / SAMPLE_RATE
+    print(f"{len(clips)} clips, {audio_seconds:.1f}s of audio, {os.cpu_count()} cores")
+
+    print(f"{'backend':<18}{'clip':<28}{'wer':>8}{'rtf':>8}")
+    for name in args.backends:
+        backend = create_asr_backend(name, args.model).load()
+        backend.warmup()
+        total_seconds = 0.0
+        errors = 0.0
+        reference_words = 0
+        for path, audio, reference in clips:
+            start = time.perf_counter()
+            text = backend.transcribe(audio, args.language)
+            seconds = time.perf_counter() - start
+            total_seconds += seconds
+            wer = word_error_rate(reference, text)
+            # weight by length so the total is the corpus word error rate
+            words = len(normalize_words(reference))
+            errors += wer * words
+            reference_words += words
+            clip_seconds = len(audio) / SAMPLE_RATE
+            print(f"{name:<18}{os.path.basename(path)[:27]:<28}{wer:>8.1%}"
+                  f"{realtime_factor(seconds, clip_seconds):>8.3f}")
+        total_wer = errors / reference_words if reference_words else 0.0
+        print(f"{name:<18}{'all':<28}{total_wer:>8.1%}"
+              f"{realtime_factor(total_seconds, audio_seconds):>8.3f}")
+        del backend
+
+
+if __name__ == "__main__":
+    main()
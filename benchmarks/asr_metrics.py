@@ -0,0 +1,45 @@
+# helpers shared by the transcription benchmarks
+import re
+import subprocess
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def load_audio(path: str) -> np.ndarray:
+    # the same decode as app.services.audio_processing_service.decode_audio
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-v", "error", "-i", path,
+         "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-"],
+        capture_output=True, check=True,
+    )
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def normalize_words(text: str) -> list:
+    return [word for word in re.sub(r"[^\w'\s]", " ", text.lower()).split() if word]
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    # word level levenshtein distance over the reference length
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = np.arange(len(hyp) + 1)
+    for i, ref_word in enumerate(ref, start=1):
+        current = np.empty_like(previous)
+        current[0] = i
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return float(previous[-1]) / len(ref)
+
+
+def realtime_factor(seconds_taken: float, audio_seconds: float) -> float:
+    # below 1 is faster than realtime
+    return seconds_taken / audio_seconds if audio_seconds else 0.0
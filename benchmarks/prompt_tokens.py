@@ -0,0 +1,109 @@
+# compares prompt tokens sent per recording by the old per-sentence template
+# prompt and the prompt builder:
+#   python -m benchmarks.prompt_tokens
+#   python -m benchmarks.prompt_tokens --file transcript.txt --budget 1200
+# counts are exact with tiktoken installed, otherwise estimated
+import argparse
+import json
+import re
+from ai_models import prompt_builder
+from ai_models.prompt_builder import build_grammar_messages, chunk_by_token_budget, count_message_tokens, count_tokens
+
+SAMPLE_TEXT = """Last weekend, I went to the park with my friends. We was very excited to spend time together because it was a sunny day. When we arrived, we first went to the cafe to buy some drink. I ordered a coffee and my friend Maria, she ordered a tea. We was talking about the new movie that just came out, and we decide to watch it later in the evening. It's a comedy film, so we was hoping it would make us laugh a lot.
+
+After we finish our drinks, we walked around the park. The park was really beautiful, with flowers everywhere. We seen some children playing on the swings and their parents were sitting on the bench, watching them. The birds were singing loud and there was a nice breeze that make the trees move. It's the perfect day for outdoor activities, I think.
+
+Later, we decided to play frisbee. We don't play it often, but it's always fun. We didn't have a lot of energy, so we only play for a little while before we went to sit down again. While sitting, we talked about plans for the future. I says that I want to travel to different countries and see new places. Maria said she want to learn how to cook better, and John says he's thinking about moving to another city for work.
+
+We was all really enjoying the time together. Sometimes, I feel that people don't appreciate the small moments like these. It's easy to get caught up in our busy lives and forget how important it is to relax with friends. That's why I think we should do things like this more often.
+
+Before we leave the park, we took some pictures. I didn't bring my camera, so I used my phone. The pictures was nice, and I am planning to show them to my family. It's always good to have memories from fun times. We said goodbye and promised to meet again soon. On the way back, we talked about how fun the day was, and how we can't wait to do it again.
+
+The only bad thing about the day was that I forgot my wallet at home, so I couldn't pay for the drinks. Thankfully, Maria paid for me. I feel bad for that, but she said it's okay. Next time, I will remember to bring my wallet with me."""
+
+
+def split_sentences(text: str) -> list:
+    try:
+        from nltk.tokenize import PunktTokenizer
+        return PunktTokenizer("english").tokenize(text)
+    except LookupError:
+        # no punkt data here, close enough for counting tokens
+        return [s for s in re.split(r"(?<=[.!?])\s+", text) if s]
+
+
+def build_legacy_prompt(chunk: list, target_language: str, app_language: str) -> str:
+    # the prompt ollama_analysis built before the prompt builder
+    target_language_full = prompt_builder.get_language_name(target_language)
+    app_language_full = prompt_builder.get_language_name(app_language)
+    sentence_templates = [
+        {
+            "original": sentence.strip(),
+            "corrected": "the_corrected_version_of_the_sentence",
+            "errors": [
+                {
+                    "error": "description_of_the_error",
+                    "reason": "grammatical_reason_for_the_error",
+                    "suggestion": "suggestion_to_fix_the_error",
+                    "improvedClause": "the_corrected_version_of_the_clause",
+                    "type": "type_of_error"
+                }
+            ]
+        }
+        for sentence in chunk
+    ]
+    sentence_templates_json = json.dumps(sentence_templates, indent=2)
+    return f"""
+    The following transcription is in {target_language_full}. It represents spoken language, not written text. Focus only on correcting grammar, word choice, and clarity. Do not correct punctuation, capitalization, or any other aspects of written formatting, even if they appear incorrect. Ignore punctuation-related issues such as missing commas, periods, or quotation marks. Do not classify punctuation-related issues as grammar errors.
+
+    A sentence may have no errors at all. If there are no errors in a sentence, return an empty `errors` array for that sentence.
+
+    Analyze the transcription and return the results in this structured JSON format:
+    {sentence_templates_json}
+
+    For each sentence:
+    1. Identify errors and create an `errors` array.
+    2. For each error, include:
+       - `error`: A description of the error.
+       - `reason`: The grammatical reason for the error.
+       - `suggestion`: How to fix the error.
+       - `improvedClause`: The corrected clause.
+       - `type`: The type of error (e.g., "grammar", "word choice", "pronunciation", "spelling", "punctuation", "capitalization").
+    3. Provide the `corrected` sentence with all errors fixed.
+
+    Your explanations should be in {app_language_full}.
+
+    ### Transcription:
+    {chunk}
+    """
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens per recording, old vs new.")
+    parser.add_argument("--file", help="transcript to use instead of the sample")
+    parser.add_argument("--budget", type=int, default=1200, help="LLM_CHUNK_TOKEN_BUDGET")
+    parser.add_argument("--max-sentences", type=int, default=12, help="LLM_CHUNK_MAX_SENTENCES")
+    args = parser.parse_args()
+
+    text = open(args.file, encoding="utf-8").read() if args.file else SAMPLE_TEXT
+    sentences = split_sentences(text)
+
+    legacy_chunks = [sentences[i:i + 5] for i in range(0, len(sentences), 5)]
+    legacy_tokens = sum(
+        count_tokens(build_legacy_prompt(chunk, "en", "en")) + 4 for chunk in legacy_chunks)
+
+    chunks = chunk_by_token_budget(sentences, args.budget, args.max_sentences)
+    messages = [build_grammar_messages(chunk, "en", "en") for chunk in chunks]
+    new_tokens = sum(count_message_tokens(m) for m in messages)
+    prefix_tokens = sum(count_tokens(m[0]["content"]) + 4 for m in messages)
+
+    counter = "tiktoken cl100k_base" if prompt_builder.tiktoken else "estimate (4 chars/token)"
+    print(f"sentences: {len(sentences)}, token counts: {counter}")
+    print(f"{'':<8}{'calls':>7}{'prompt tokens':>15}{'per call':>10}")
+    print(f"{'legacy':<8}{len(legacy_chunks):>7}{legacy_tokens:>15}{legacy_tokens // len(legacy_chunks):>10}")
+    print(f"{'builder':<8}{len(chunks):>7}{new_tokens:>15}{new_tokens // len(chunks):>10}")
+    print(f"saved: {1 - new_tokens / legacy_tokens:.0%} of prompt tokens, "
+          f"{prefix_tokens / new_tokens:.0%} of what's left is the cacheable system prefix")
+
+
+if __name__ == "__main__":
+    main()
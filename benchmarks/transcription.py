@@ -0,0 +1,59 @@
+# serial whisper vs the segmented process pool on one recording:
+#   python -m benchmarks.transcription session.m4a --language es --processes 4
+# needs the backend's engine and ffmpeg. the serial transcript is the reference
+# for the word error rate of the parallel one
+import argparse
+import os
+import time
+from ai_models.asr_backends import ASR_BACKENDS, create_asr_backend
+from ai_models.parallel_transcription import ParallelTranscriber
+from app.utils.audio_utils import detect_speech, join_segments
+from benchmarks.asr_metrics import load_audio, realtime_factor, word_error_rate
+
+SAMPLE_RATE = 16000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs parallel segmented transcription.")
+    parser.add_argument("audio", help="recording to transcribe, any format ffmpeg reads")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--backend", choices=sorted(ASR_BACKENDS), default="openai-whisper")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--processes", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--segment-seconds", type=float, default=60)
+    parser.add_argument("--overlap-seconds", type=float, default=1)
+    parser.add_argument("--no-vad", action="store_true", help="don't trim silence first")
+    args = parser.parse_args()
+
+    audio = load_audio(args.audio)
+    if not args.no_vad:
+        audio = join_segments(audio, detect_speech(audio, SAMPLE_RATE), int(SAMPLE_RATE * 0.2))
+    audio_seconds = len(audio) / SAMPLE_RATE
+    print(f"{audio_seconds:.1f}s of audio, {os.cpu_count()} cores")
+
+    backend = create_asr_backend(args.backend, args.model).load()
+    backend.warmup()
+    start = time.perf_counter()
+    serial_text = backend.transcribe(audio, args.language)
+    serial_seconds = time.perf_counter() - start
+    del backend
+
+    threads = max(1, (os.cpu_count() or 1) // args.processes)
+    transcriber = ParallelTranscriber(
+        args.backend, args.model, args.processes, threads, args.segment_seconds, args.overlap_seconds)
+    # load the models in every process before timing
+    transcriber.warmup()
+    start = time.perf_counter()
+    parallel_text = transcriber.transcribe(audio, args.language)
+    parallel_seconds = time.perf_counter() - start
+    transcriber.close()
+
+    print(f"{'':<22}{'seconds':>9}{'rtf':>8}")
+    print(f"{'serial':<22}{serial_seconds:>9.1f}{realtime_factor(serial_seconds, audio_seconds):>8.3f}")
+    print(f"{f'parallel ({args.processes}x{threads})':<22}{parallel_seconds:>9.1f}{realtime_factor(parallel_seconds, audio_seconds):>8.3f}")
+    print(f"speedup: {serial_seconds / parallel_seconds:.2f}x, "
+          f"word difference vs serial: {word_error_rate(serial_text, parallel_text):.1%}")
+
+
+if __name__ == "__main__":
+    main()
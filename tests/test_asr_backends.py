@@ -0,0 +1,77 @@
+import os
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from ai_models.asr_backends import FasterWhisperBackend, OpenAIWhisperBackend, create_asr_backend
+from benchmarks.asr_metrics import word_error_rate
+
+
+class FakeWhisperModel:
+    def __init__(self):
+        self.options = None
+
+    def transcribe(self, audio, language, **options):
+        self.options = options
+        return {"text": f" {language} {len(audio)}"}
+
+
+class FakeFasterWhisperModel:
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, language, beam_size, **options):
+        self.calls.append((len(audio), language, beam_size))
+        self.options = options
+        segments = (SimpleNamespace(text=text) for text in [" Hola,", " ¿qué tal?"])
+        return segments, SimpleNamespace(language=language)
+
+
+def test_create_asr_backend_by_name():
+    backend = create_asr_backend("faster-whisper", "small", compute_type="int8", beam_size=2)
+    assert isinstance(backend, FasterWhisperBackend)
+    assert backend.beam_size == 2
+    assert isinstance(create_asr_backend("openai-whisper", "small"), OpenAIWhisperBackend)
+    with pytest.raises(ValueError):
+        create_asr_backend("kaldi", "small")
+
+
+def test_openai_whisper_backend_returns_text():
+    backend = OpenAIWhisperBackend("small")
+    backend.model = FakeWhisperModel()
+    assert backend.transcribe(np.zeros(10, dtype=np.float32), "es") == " es 10"
+    # a beam of one is left to whisper's greedy decoder
+    backend.transcribe(np.zeros(10, dtype=np.float32), "es", {
+        "beam_size": 1, "condition_on_previous_text": False})
+    assert backend.model.options == {"condition_on_previous_text": False}
+
+
+def test_faster_whisper_backend_joins_segments_and_warms_up():
+    backend = FasterWhisperBackend("small", beam_size=3)
+    backend.model = FakeFasterWhisperModel()
+    assert backend.transcribe(np.zeros(10, dtype=np.float32), "es") == " Hola, ¿qué tal?"
+    backend.warmup()
+    backend.transcribe(np.zeros(10, dtype=np.float32), "es", {"beam_size": 1, "temperature": (0.0, 0.4)})
+    assert backend.model.calls == [(10, "es", 3), (16000, "en", 3), (10, "es", 1)]
+    assert backend.model.options == {"temperature": (0.0, 0.4)}
+
+
+def test_word_error_rate():
+    assert word_error_rate("We was very excited.", "we was very excited") == 0.0
+    # one substitution and one deletion over four words
+    assert word_error_rate("we were very excited", "we was excited") == 0.5
+    assert word_error_rate("", "") == 0.0
+    assert word_error_rate("", "hola") == 1.0
+
+
+@pytest.mark.skipif(not os.getenv("ASR_SAMPLES_DIR"), reason="set ASR_SAMPLES_DIR to a folder of clips")
+def test_backends_transcribe_sample_clips():
+    # slow, needs ffmpeg and the engines: every backend stays under 30% wer
+    from benchmarks.asr_backends import find_clips
+    from benchmarks.asr_metrics import load_audio
+    clips = find_clips(os.environ["ASR_SAMPLES_DIR"])
+    assert clips
+    for name in ["openai-whisper", "faster-whisper"]:
+        backend = create_asr_backend(name, os.getenv("ASR_SAMPLES_MODEL", "tiny")).load()
+        for path, reference in clips:
+            text = backend.transcribe(load_audio(path), os.getenv("ASR_SAMPLES_LANGUAGE", "en"))
+            assert word_error_rate(reference, text) < 0.3, path
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from app.utils.audio_utils import check_audio_probe, detect_speech, get_dbfs, join_segments, plan_chunks
+
+SAMPLE_RATE = 16000
+
+
+def test_probe_accepts_audio_within_limit():
+    probe = {"streams": [{"codec_type": "audio"}], "format": {"duration": "12.5"}}
+    assert check_audio_probe(probe, max_seconds=600) == 12.5
+
+
+@pytest.mark.parametrize("probe", [
+    {"streams": [{"codec_type": "video"}], "format": {"duration": "3"}},
+    {"streams": [{"codec_type": "audio"}], "format": {}},
+    {"streams": [{"codec_type": "audio"}], "format": {"duration": "N/A"}},
+    {"streams": [{"codec_type": "audio"}], "format": {"duration": "601"}},
+    {},
+])
+def test_probe_rejects_malformed_or_long_audio(probe):
+    with pytest.raises(ValueError):
+        check_audio_probe(probe, max_seconds=600)
+
+
+def test_silence_check_on_float_samples():
+    t = np.arange(SAMPLE_RATE, dtype=np.float32) / SAMPLE_RATE
+    tone = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    # a full scale sine is -3 dBFS, half scale is 6 dB lower
+    assert get_dbfs(tone) == pytest.approx(-9.03, abs=0.05)
+    assert get_dbfs(tone * 0.001) < -40
+    assert get_dbfs(np.zeros(SAMPLE_RATE, dtype=np.float32)) == float("-inf")
+    assert get_dbfs(np.array([], dtype=np.float32)) == float("-inf")
+
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def noise(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    return (0.001 * rng.standard_normal(int(SAMPLE_RATE * seconds))).astype(np.float32)
+
+
+@pytest.mark.parametrize("use_flatness", [False, True])
+def test_vad_finds_speech_and_bridges_short_pauses(use_flatness):
+    audio = np.concatenate([noise(3), tone(2), noise(0.2), tone(1), noise(4), tone(1), noise(2)])
+    segments = detect_speech(audio, SAMPLE_RATE, use_flatness=use_flatness) / SAMPLE_RATE
+
+    # the 0.2s pause is kept inside one segment, the 4s one is cut
+    assert len(segments) == 2
+    assert segments[0][0] == pytest.approx(2.9, abs=0.05)
+    assert segments[0][1] == pytest.approx(6.2 + 0.3, abs=0.05)
+    assert segments[1][0] == pytest.approx(10.1, abs=0.05)
+
+
+def test_vad_ignores_clicks_and_keeps_clips_without_pauses():
+    clicky = noise(3)
+    clicky[SAMPLE_RATE:SAMPLE_RATE + 100] = 0.5
+    assert len(detect_speech(clicky, SAMPLE_RATE)) == 0
+
+    speech = tone(2) * np.linspace(0.05, 1, 2 * SAMPLE_RATE, dtype=np.float32)
+    assert detect_speech(speech, SAMPLE_RATE).tolist() == [[0, len(speech)]]
+    assert len(detect_speech(np.array([], dtype=np.float32), SAMPLE_RATE)) == 0
+
+
+@pytest.mark.parametrize("pause", [0.41, 0.42, 0.43, 0.44])
+def test_vad_segments_never_overlap(pause):
+    # a pause just longer than the hangover leaves a frame between the runs,
+    # less than a frame length in samples
+    audio = np.concatenate([tone(1), noise(pause), tone(1)])
+    segments = detect_speech(audio, SAMPLE_RATE)
+    assert np.all(segments[1:, 0] > segments[:-1, 1])
+    joined = join_segments(audio, segments, int(SAMPLE_RATE * 0.2))
+    assert len(joined) <= len(audio)
+
+
+def test_join_segments_keeps_short_gaps():
+    audio = np.arange(100, dtype=np.float32) + 1
+    joined = join_segments(audio, np.array([[0, 10], [15, 20], [80, 90]]), gap_samples=8)
+    assert len(joined) == 10 + 5 + 5 + 8 + 10
+    assert np.count_nonzero(joined == 0) == 5 + 8
+    assert len(join_segments(audio, np.empty((0, 2), dtype=np.int64), 8)) == 0
+    # overlapping segments don't get a negative gap
+    assert len(join_segments(audio, np.array([[0, 10], [8, 20]]), gap_samples=8)) == 22
+
+
+def test_plan_chunks_cuts_at_pauses_with_overlap():
+    # 50s of speech with a pause at 20-20.5s and 40-40.5s
+    audio = np.concatenate([tone(20), noise(0.5), tone(19.5), noise(0.5), tone(9.5)])
+    chunks = plan_chunks(audio, SAMPLE_RATE, chunk_seconds=25, overlap_seconds=1) / SAMPLE_RATE
+
+    assert len(chunks) == 3
+    assert chunks[0][0] == 0 and chunks[-1][1] == pytest.approx(50)
+    # each cut is inside a pause, and pieces overlap by a second either side
+    assert 20 <= chunks[0][1] - 1 <= 20.5
+    assert chunks[1][0] == pytest.approx(chunks[0][1] - 2)
+    assert 40 <= chunks[1][1] - 1 <= 40.5
+    assert all(end - start <= 25 + 2 for start, end in chunks)
+
+    short = tone(3)
+    assert plan_chunks(short, SAMPLE_RATE, 25, 1).tolist() == [[0, len(short)]]
@@ -0,0 +1,82 @@
+from app.utils.cache_utils import TTLCache, UserCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    # "b" is the least recently used entry now
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    clock.now = 11
+    assert cache.get("a") is None
+    assert cache.snapshot()["hits"] == 2
+    assert cache.snapshot()["misses"] == 2
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_user_cache_invalidate_and_copies():
+    cache = UserCache(maxsize=10, ttl=30, clock=FakeClock())
+    cache.set({"userId": "u1", "userEmail": "a@example.com", "username": "Ana"})
+
+    user = cache.get_by_id("u1")
+    user["username"] = "changed"
+    assert cache.get_by_id("u1")["username"] == "Ana"
+    assert cache.get_by_email("a@example.com")["userId"] == "u1"
+
+    cache.invalidate("u1")
+    assert cache.get_by_id("u1") is None
+    assert cache.get_by_email("a@example.com") is None
+    assert cache.snapshot()["invalidations"] == 1
+
+
+def test_user_cache_never_holds_credentials():
+    # other workers can't invalidate this cache, so a changed password or
+    # secret must not be served from it
+    cache = UserCache(maxsize=10, ttl=30, clock=FakeClock())
+    user = {"userId": "u1", "userEmail": "a@example.com", "password": "hash",
+            "refreshToken": "token", "anonUserSecret": "secret"}
+    with cache.request_scope():
+        cache.set(user)
+        assert cache.get_by_id("u1") == {"userId": "u1", "userEmail": "a@example.com"}
+    assert cache.get_by_email("a@example.com") == {"userId": "u1", "userEmail": "a@example.com"}
+    assert user["password"] == "hash"
+
+
+def test_user_cache_ignores_stale_email_index():
+    cache = UserCache(maxsize=10, ttl=30, clock=FakeClock())
+    cache.set({"userId": "u1", "userEmail": "old@example.com"})
+    cache.set({"userId": "u1", "userEmail": "new@example.com"})
+
+    assert cache.get_by_email("old@example.com") is None
+    assert cache.get_by_email("new@example.com")["userId"] == "u1"
+
+
+def test_request_scope_memoizes_past_ttl():
+    clock = FakeClock()
+    cache = UserCache(maxsize=10, ttl=5, clock=clock)
+    with cache.request_scope():
+        cache.set({"userId": "u1"})
+        clock.now = 10
+        assert cache.get_by_id("u1") == {"userId": "u1"}
+        assert cache.snapshot()["requestHits"] == 1
+
+        cache.invalidate("u1")
+        assert cache.get_by_id("u1") is None
+
+    cache.set({"userId": "u2"})
+    assert cache.get_by_id("u2") == {"userId": "u2"}
+    assert cache.snapshot()["requestHits"] == 1
@@ -0,0 +1,72 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.utils.concurrency_utils import ProviderLimits, iter_streamed
+
+
+def test_iter_streamed_yields_partial_results_before_work_finishes():
+    release = threading.Event()
+
+    def work(item, emit):
+        emit(item * 10)
+        release.wait(1)
+        emit(item * 10 + 1)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = iter_streamed(executor, work, [1, 2])
+        first = {next(results), next(results)}
+        assert first == {(0, 10), (1, 20)}
+        release.set()
+        assert sorted(results) == [(0, 11), (1, 21)]
+
+
+def test_iter_streamed_reraises_worker_errors():
+    def work(item, emit):
+        emit(item)
+        raise ValueError("bad reply")
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results = iter_streamed(executor, work, [1])
+        assert next(results) == (0, 1)
+        with pytest.raises(ValueError):
+            next(results)
+
+
+def test_iter_streamed_cancels_pending_work_when_closed():
+    started = []
+
+    def work(item, emit):
+        started.append(item)
+        time.sleep(0.05)
+        emit(item)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results = iter_streamed(executor, work, list(range(10)))
+        next(results)
+        results.close()
+
+    assert len(started) < 10
+
+
+def test_provider_limits_cap_concurrency():
+    limits = ProviderLimits({"together": 2}, default_limit=1)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def call():
+        with limits.slot("together"):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        for _ in range(6):
+            executor.submit(call)
+
+    assert max(peak) == 2
+    assert limits.slot("together") is limits.slot("together")
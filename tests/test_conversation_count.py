@@ -0,0 +1,58 @@
+import asyncio
+import os
+
+# app.config reads these at import
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "5")
+os.environ.setdefault("REFRESH_TOKEN_EXPIRE_DAYS", "1")
+
+from app.services import async_database_service  # noqa: E402
+
+
+def matches(document, query):
+    for field, condition in query.items():
+        if isinstance(condition, dict) and "$exists" in condition:
+            if (field in document) != condition["$exists"]:
+                return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def find_one(self, query, projection=None):
+        return next((dict(document) for document in self.documents if matches(document, query)), None)
+
+    async def update_one(self, query, update):
+        for document in self.documents:
+            if matches(document, query):
+                for field, amount in update["$inc"].items():
+                    document[field] = document.get(field, 0) + amount
+                return
+
+    async def count_documents(self, query):
+        return sum(1 for document in self.documents if matches(document, query))
+
+
+def count_after(monkeypatch, users, conversations, amount):
+    collections = {"users": FakeCollection(users), "conversations": FakeCollection(conversations)}
+    monkeypatch.setattr(async_database_service, "get_collection", collections.get)
+
+    async def run():
+        await async_database_service.increment_conversation_count("u1", amount)
+        return await async_database_service.get_conversation_count("u1")
+    return asyncio.run(run())
+
+
+def test_counter_is_kept_up_to_date(monkeypatch):
+    conversations = [{"userId": "u1"}] * 3
+    assert count_after(monkeypatch, [{"userId": "u1", "conversationCount": 2}], conversations, 1) == 3
+
+
+def test_user_without_counter_is_not_started_from_zero(monkeypatch):
+    # before migration 3 ran, the count comes from the conversations
+    conversations = [{"userId": "u1"}] * 40
+    assert count_after(monkeypatch, [{"userId": "u1"}], conversations, 1) == 40
+    assert count_after(monkeypatch, [{"userId": "u1"}], conversations[:39], -1) == 39
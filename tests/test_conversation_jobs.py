@@ -0,0 +1,97 @@
+import os
+from types import SimpleNamespace
+import pytest
+
+# app.config reads these at import
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "5")
+os.environ.setdefault("REFRESH_TOKEN_EXPIRE_DAYS", "1")
+
+from app.services import conversation_job_service  # noqa: E402
+
+
+class FakeConversation:
+    def __init__(self, conversation_id):
+        self.data = [SimpleNamespace(conversationId=conversation_id)]
+
+    def dict(self):
+        return {"success": True, "data": [{"conversationId": self.data[0].conversationId}], "error": None}
+
+
+class FakeDatabase:
+    # the parts of database_service the grammar job uses. upsert_conversation
+    # keys saves by job id like the real one
+    def __init__(self):
+        self.jobs = {"job-1": {"jobId": "job-1", "userId": "u1", "status": "running"}}
+        self.saved = {}
+        self.merges = []
+        self.fail_result_update = True
+
+    def get_user_by_id(self, user_id):
+        return {"userId": user_id, "targetLanguage": "en", "appLanguage": "en"}
+
+    def get_conversation_job(self, job_id, user_id):
+        job = self.jobs.get(job_id)
+        return dict(job) if job and job["userId"] == user_id else None
+
+    def update_conversation_job(self, job_id, update):
+        if "result" in update and self.fail_result_update:
+            self.fail_result_update = False
+            raise ConnectionError("mongo went away")
+        self.jobs[job_id].update(update)
+
+    def upsert_conversation(self, response, user_id, job_id=None):
+        if job_id in self.saved:
+            return self.saved[job_id]
+        self.merges.append(response)
+        self.saved[job_id] = FakeConversation(f"conversation-{len(self.merges)}")
+        return self.saved[job_id]
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    for name in ["get_user_by_id", "get_conversation_job", "update_conversation_job", "upsert_conversation"]:
+        monkeypatch.setattr(conversation_job_service.database_service, name, getattr(database, name))
+    return database
+
+
+def test_grammar_job_retried_after_save_does_not_merge_again(database, monkeypatch):
+    analyses = []
+
+    def correct_grammar(transcription, user):
+        analyses.append(transcription)
+        return {"success": True, "data": {"originalText": transcription, "sentenceFeedback": [{"id": str(len(analyses))}]}}
+
+    monkeypatch.setattr(conversation_job_service, "correct_grammar", correct_grammar)
+    payload = {"conversationJobId": "job-1", "userId": "u1", "transcription": "We was tired."}
+
+    # saved, then recording the result fails and the queue retries
+    with pytest.raises(ConnectionError):
+        conversation_job_service.process_grammar_job(payload)
+    assert conversation_job_service.process_grammar_job(payload) == {"conversationId": "conversation-1"}
+
+    # the kept analysis is reused, so the sentence ids match the first save
+    assert len(analyses) == 1
+    assert len(database.merges) == 1
+    assert database.jobs["job-1"]["status"] == "succeeded"
+
+    # and once succeeded, another run only returns the result
+    assert conversation_job_service.process_grammar_job(payload) == {"conversationId": "conversation-1"}
+    assert len(database.merges) == 1
+
+
+def test_grammar_job_leaves_llm_failures_to_the_queue(database, monkeypatch):
+    failure = {"success": False, "data": None, "error": "No valid feedback was generated.", "retryable": True}
+    monkeypatch.setattr(conversation_job_service, "correct_grammar", lambda transcription, user: failure)
+    payload = {"conversationJobId": "job-1", "userId": "u1", "transcription": "We was tired."}
+
+    with pytest.raises(conversation_job_service.RetryableJobError):
+        conversation_job_service.process_grammar_job(payload)
+    assert database.jobs["job-1"]["status"] == "running"
+
+    # bad input won't get better on a retry
+    failure = {"success": False, "data": None, "error": "Transcription is empty"}
+    monkeypatch.setattr(conversation_job_service, "correct_grammar", lambda transcription, user: failure)
+    conversation_job_service.process_grammar_job(payload)
+    assert database.jobs["job-1"]["status"] == "failed"
+    assert database.jobs["job-1"]["errorStatusCode"] == 422
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from app.services.feedback_cache import FeedbackCache, InMemoryFeedbackStore, get_feedback_key, is_cacheable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime(2025, 6, 1)
+
+    def __call__(self):
+        return self.now
+
+
+class BrokenStore:
+    def get_many(self, keys, now):
+        raise ConnectionError("mongo is down")
+
+    def set_many(self, entries, now, expires_at):
+        raise ConnectionError("mongo is down")
+
+
+def key(sentence, target_language="en", app_language="en", model="model", prompt_version="2"):
+    return get_feedback_key(sentence, target_language, app_language, model, prompt_version)
+
+
+def test_key_normalizes_text_and_covers_languages_model_and_prompt():
+    assert key("I goes  home. ") == key(" I goes home.")
+    assert key("I goes home.") != key("i goes home.")
+    assert key("I goes home.") != key("I goes home.", app_language="es")
+    assert key("I goes home.") != key("I goes home.", model="other")
+    assert key("I goes home.") != key("I goes home.", prompt_version="3")
+
+
+def test_memory_then_store_hits_and_hit_ratio():
+    clock = FakeClock()
+    store = InMemoryFeedbackStore()
+    feedback = {"corrected": "I go home.", "errors": [{"error": "verb"}]}
+    FeedbackCache(store, clock=clock).set_many({"a": feedback})
+
+    # a fresh process only has the shared store
+    cache = FeedbackCache(store, clock=clock)
+    assert cache.get_many(["a", "b"]) == {"a": feedback}
+    hit = cache.get_many(["a"])["a"]
+    hit["errors"].clear()
+    assert cache.get_many(["a"])["a"] == feedback
+
+    snapshot = cache.snapshot()
+    assert (snapshot["storeHits"], snapshot["memoryHits"], snapshot["misses"]) == (1, 2, 1)
+    assert snapshot["hitRatio"] == 0.75
+
+
+def test_store_entries_expire():
+    clock = FakeClock()
+    store = InMemoryFeedbackStore()
+    FeedbackCache(store, ttl_seconds=60, clock=clock).set_many({"a": {"corrected": "", "errors": []}})
+    clock.now += timedelta(seconds=61)
+    assert FeedbackCache(store, clock=clock).get_many(["a"]) == {}
+
+
+def test_store_errors_fall_back_to_misses():
+    cache = FeedbackCache(BrokenStore())
+    cache.set_many({"a": {"corrected": "", "errors": []}})
+    assert cache.get_many(["a", "b"]) == {"a": {"corrected": "", "errors": []}}
+    assert cache.snapshot()["storeErrors"] == 2
+
+
+def test_only_complete_feedback_is_cacheable():
+    assert is_cacheable({"original": "x", "corrected": "x", "errors": []}, "x")
+    assert not is_cacheable({"error": "failed", "original": "x", "corrected": None, "errors": []}, "x")
+    assert not is_cacheable({"original": "x"}, "x")
+
+
+def test_misaligned_feedback_is_not_cacheable():
+    # the model merged the first two sentences and split the third, so the
+    # counts match but positions point at other sentences
+    sentences = ["I goes home.", " Then I eat.", " We was tired and went to sleep."]
+    feedback = [
+        {"original": "I goes home. Then I eat.", "corrected": "I go home. Then I eat.", "errors": []},
+        {"original": "We was tired", "corrected": "We were tired", "errors": []},
+        {"original": "and went to sleep.", "corrected": "and went to sleep.", "errors": []},
+    ]
+    assert not any(is_cacheable(item, sentence) for item, sentence in zip(feedback, sentences))
+    # whitespace differences still match
+    assert is_cacheable({"original": "Then  I eat.", "corrected": "Then I eat.", "errors": []}, " Then I eat.")
@@ -0,0 +1,14 @@
+import hashlib
+import io
+from app.utils import file_utils
+from app.utils.file_utils import copy_and_hash
+
+
+def test_copy_and_hash_matches_content_across_blocks(monkeypatch):
+    monkeypatch.setattr(file_utils, "COPY_BLOCK_SIZE", 7)
+    data = b"same upload bytes, retried by a flaky client" * 3
+    destination = io.BytesIO()
+
+    assert copy_and_hash(io.BytesIO(data), destination) == hashlib.sha256(data).hexdigest()
+    assert destination.getvalue() == data
+    assert copy_and_hash(io.BytesIO(b""), io.BytesIO()) == hashlib.sha256(b"").hexdigest()
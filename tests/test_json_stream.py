@@ -0,0 +1,62 @@
+import json
+import pytest
+from ai_models.json_stream import JsonArrayStreamParser, iter_content_deltas
+
+SENTENCES = [
+    {"original": "We was [there]", "corrected": "We were \"there\"", "errors": [
+        {"error": "agreement", "reason": "plural {subject}", "type": "grammar"}]},
+    {"original": "Fine", "corrected": "Fine", "errors": []},
+]
+
+
+def feed_in_pieces(parser, text, size):
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start:start + size]))
+    return items
+
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_parser_emits_each_element_as_it_closes(size):
+    text = "```json\n" + json.dumps(SENTENCES, indent=2) + "\n```\nHope this helps! [1]"
+    parser = JsonArrayStreamParser()
+
+    assert feed_in_pieces(parser, text, size) == SENTENCES
+    assert parser.done
+
+
+def test_parser_emits_before_the_array_closes():
+    parser = JsonArrayStreamParser()
+    text = json.dumps(SENTENCES)
+    first_end = text.index("}]}") + 3
+
+    assert parser.feed(text[:first_end]) == [SENTENCES[0]]
+    assert not parser.done
+    assert parser.feed(text[first_end:]) == [SENTENCES[1]]
+    assert parser.done
+
+
+def test_parser_ignores_text_after_close_and_top_level_scalars():
+    parser = JsonArrayStreamParser()
+
+    assert parser.feed('Sure: ["a ] b", {"x": 1}] then [{"y": 2}]') == [{"x": 1}]
+    assert parser.done
+
+
+def test_parser_rejects_broken_elements():
+    with pytest.raises(ValueError):
+        JsonArrayStreamParser().feed('[{"x": 1,}]')
+
+
+def test_content_deltas_stop_at_done():
+    lines = [
+        ": keep-alive",
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+        'data: {"choices": [{"delta": {"content": "[{\\"a\\""}}]}',
+        "",
+        'data: {"choices": [{"delta": {"content": ": 1}]"}}]}',
+        "data: [DONE]",
+        'data: {"choices": [{"delta": {"content": "ignored"}}]}',
+    ]
+
+    assert list(iter_content_deltas(lines)) == ['[{"a"', ": 1}]"]
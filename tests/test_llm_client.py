@@ -0,0 +1,64 @@
+import json
+import httpx
+import pytest
+from ai_models.json_stream import iter_content_deltas
+from ai_models.llm_client import LLMClient
+from ai_models.resilience import get_retry_after, is_retryable
+
+
+def stream_body(content):
+    chunk = {"choices": [{"delta": {"content": content}}]}
+    return f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode()
+
+
+def read_stream(response):
+    try:
+        return "".join(iter_content_deltas(response.iter_lines()))
+    finally:
+        response.close()
+
+
+def make_handler(requests, status_code=200, headers=None):
+    def handler(request):
+        requests.append(request)
+        if status_code != 200:
+            return httpx.Response(status_code, headers=headers or {}, json={"error": "nope"})
+        body = json.loads(request.content)
+        return httpx.Response(200, content=stream_body(f"echo {body['messages'][0]['content']}"))
+    return handler
+
+
+def test_chat_reuses_one_client_against_base_url():
+    requests = []
+    client = LLMClient("http://llm.local/v1/", api_key="secret",
+                       transport=httpx.MockTransport(make_handler(requests)))
+
+    first = read_stream(client.stream_chat("model", [{"role": "user", "content": "hi"}], temperature=0))
+    read_stream(client.stream_chat("model", [{"role": "user", "content": "again"}]))
+
+    assert first == "echo hi"
+    assert client.get_client() is client.get_client()
+    assert str(requests[0].url) == "http://llm.local/v1/chat/completions"
+    assert requests[0].headers["authorization"] == "Bearer secret"
+    assert json.loads(requests[0].content)["temperature"] == 0
+    assert json.loads(requests[0].content)["stream"] is True
+    client.close()
+
+
+def test_timeout_caps_connect_to_call_budget():
+    client = LLMClient("http://llm.local/v1", connect_timeout=5, read_timeout=60)
+
+    assert client.get_timeout().read == 60
+    assert client.get_timeout().connect == 5
+    assert client.get_timeout(2).connect == 2
+
+
+def test_error_responses_carry_status_and_retry_after():
+    client = LLMClient("http://llm.local/v1", transport=httpx.MockTransport(
+        make_handler([], status_code=429, headers={"Retry-After": "7"})))
+
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        client.stream_chat("model", [{"role": "user", "content": "hi"}])
+
+    assert is_retryable(error.value)
+    assert get_retry_after(error.value) == 7
@@ -0,0 +1,33 @@
+import os
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+# app.config reads these at import
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "5")
+os.environ.setdefault("REFRESH_TOKEN_EXPIRE_DAYS", "1")
+
+from app.config import Config  # noqa: E402
+from app.utils.auth_utils import require_metrics_token  # noqa: E402
+
+app = FastAPI()
+
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)])
+def metrics():
+    return {"success": True}
+
+
+client = TestClient(app)
+
+
+def test_metrics_are_off_without_a_configured_token(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_TOKEN", None)
+    assert client.get("/metrics", headers={"X-Metrics-Token": ""}).status_code == 404
+
+
+def test_metrics_need_the_metrics_token_not_a_user_token(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer user-token"}).status_code == 403
+    assert client.get("/metrics", headers={"X-Metrics-Token": "wrong"}).status_code == 403
+    assert client.get("/metrics", headers={"X-Metrics-Token": "s3cret"}).json() == {"success": True}
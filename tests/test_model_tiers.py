@@ -0,0 +1,98 @@
+import threading
+import pytest
+from ai_models.model_tiers import MODEL_TIERS, ModelRegistry, estimate_model_memory_mb, get_tier_model_size, select_model_tier
+
+
+def test_select_model_tier_by_length_and_pressure():
+    assert select_model_tier(3, 0, short_seconds=20, long_seconds=120, busy_jobs=4) == "fast"
+    assert select_model_tier(60, 0, short_seconds=20, long_seconds=120, busy_jobs=4) == "standard"
+    assert select_model_tier(300, 0, short_seconds=20, long_seconds=120, busy_jobs=4) == "long"
+    # busy: everything goes fast so the queue drains
+    assert select_model_tier(300, 4, short_seconds=20, long_seconds=120, busy_jobs=4) == "fast"
+    assert select_model_tier(300, 9, short_seconds=20, long_seconds=120, busy_jobs=0) == "long"
+
+
+def test_tier_model_size_by_language():
+    assert get_tier_model_size(MODEL_TIERS["fast"], "en") == "base.en"
+    assert get_tier_model_size(MODEL_TIERS["fast"], "en", english_only=False) == "base"
+    assert get_tier_model_size(MODEL_TIERS["fast"], "es") == "small"
+    assert get_tier_model_size({"modelSizes": {"default": "large-v3"}}, "en") == "large-v3"
+
+
+def test_estimate_model_memory():
+    assert estimate_model_memory_mb("small.en") == estimate_model_memory_mb("small")
+    assert estimate_model_memory_mb("small", "int8") < estimate_model_memory_mb("small")
+    assert estimate_model_memory_mb("large-v3") == estimate_model_memory_mb("large")
+
+
+def test_registry_loads_lazily_and_unloads_least_recently_used():
+    loaded = []
+
+    def load_backend(model_size):
+        loaded.append(model_size)
+        return object()
+
+    sizes = {"base": 300, "small": 1000, "medium": 3000}
+    registry = ModelRegistry(load_backend, memory_limit_mb=1500, estimate_memory_mb=sizes.get)
+    small = registry.get("small")
+    assert registry.get("small") is small
+    registry.get("base")
+    registry.get("small")
+    assert loaded == ["small", "base"]
+
+    # both fit, ordered by last use
+    registry.get("base")
+    registry.get("small")
+    assert registry.snapshot()["loaded"] == ["base", "small"]
+
+    # over the limit on its own, still loaded once everything else is gone
+    registry.get("medium")
+    snapshot = registry.snapshot()
+    assert snapshot["loaded"] == ["medium"]
+    assert snapshot["evictions"] == 2
+    assert snapshot["loads"] == 3
+
+
+def test_registry_serves_loaded_models_while_another_loads():
+    release = threading.Event()
+    started = threading.Event()
+    loaded = []
+
+    def load_backend(model_size):
+        loaded.append(model_size)
+        if model_size == "medium":
+            started.set()
+            assert release.wait(5)
+        return model_size
+
+    registry = ModelRegistry(load_backend, memory_limit_mb=10000, estimate_memory_mb=lambda size: 1)
+    assert registry.get("base") == "base"
+
+    results = []
+    loaders = [threading.Thread(target=lambda: results.append(registry.get("medium"))) for _ in range(2)]
+    for loader in loaders:
+        loader.start()
+    assert started.wait(5)
+    # base is answered without waiting for medium
+    assert registry.get("base") == "base"
+
+    release.set()
+    for loader in loaders:
+        loader.join(5)
+    assert results == ["medium", "medium"]
+    assert loaded == ["base", "medium"]
+
+
+def test_registry_load_failure_is_raised_and_retried():
+    attempts = []
+
+    def load_backend(model_size):
+        attempts.append(model_size)
+        if len(attempts) == 1:
+            raise RuntimeError("download failed")
+        return model_size
+
+    registry = ModelRegistry(load_backend, memory_limit_mb=10000, estimate_memory_mb=lambda size: 1)
+    with pytest.raises(RuntimeError):
+        registry.get("small")
+    assert registry.get("small") == "small"
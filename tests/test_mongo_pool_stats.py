@@ -0,0 +1,24 @@
+import os
+
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "5")
+os.environ.setdefault("REFRESH_TOKEN_EXPIRE_DAYS", "1")
+
+from app.mongo import MongoClient  # noqa: E402
+
+
+def test_pools_are_counted_apart_and_summed(monkeypatch):
+    monkeypatch.setattr(MongoClient, "_pool_listeners", {})
+    monkeypatch.setattr(MongoClient.Config, "MONGO_MAX_POOL_SIZE", 10)
+
+    sync = MongoClient.get_pool_listener("sync")
+    shim = MongoClient.get_pool_listener("asyncShim")
+    assert MongoClient.get_pool_listener("sync") is sync
+    for listener in (sync, shim, shim):
+        listener.connection_created(None)
+        listener.connection_checked_out(None)
+
+    stats = MongoClient.get_pool_stats()
+    assert stats["pools"]["sync"]["connectionsOpen"] == 1
+    assert stats["pools"]["asyncShim"]["checkedOut"] == 2
+    assert stats["connectionsOpen"] == 3
+    assert stats["maxConnections"] == 20
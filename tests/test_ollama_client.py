@@ -0,0 +1,29 @@
+import os
+import time
+import pytest
+
+# app.config reads these at import
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "5")
+os.environ.setdefault("REFRESH_TOKEN_EXPIRE_DAYS", "1")
+
+from ai_models import ollama_client  # noqa: E402
+from ai_models.resilience import DeadlineExceededError, deadline  # noqa: E402
+from app.utils.concurrency_utils import ProviderLimits  # noqa: E402
+
+
+def test_waiting_for_a_provider_slot_stops_at_the_deadline(monkeypatch):
+    limits = ProviderLimits({"together": 1}, default_limit=1)
+    monkeypatch.setattr(ollama_client, "provider_limits", limits)
+    monkeypatch.setattr(ollama_client.llm_client, "api_key", "key")
+    failures = ollama_client.together_caller.snapshot()["failures"]
+
+    # another call holds the only slot
+    limits.slot("together").acquire()
+    start = time.monotonic()
+    with deadline(start + 0.2):
+        with pytest.raises(DeadlineExceededError):
+            list(ollama_client.stream_chat_with_ollama("model", []))
+
+    assert time.monotonic() - start < 1
+    # not retried, and not counted against the provider
+    assert ollama_client.together_caller.snapshot()["failures"] == failures
@@ -0,0 +1,44 @@
+import pytest
+from datetime import datetime
+from app.utils.pagination_utils import build_after_filter, decode_cursor, encode_cursor, get_next_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 5, 1, 12, 30, 15, 123000)
+    cursor = encode_cursor(created_at, "conversation-1")
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, "conversation-1")
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "e30", "!!!"])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_after_filter_breaks_ties_on_conversation_id():
+    created_at = datetime(2025, 5, 1)
+    after_filter = build_after_filter((created_at, "b"))
+
+    assert after_filter == {
+        "$or": [
+            {"createdAt": {"$lt": created_at}},
+            {"createdAt": created_at, "conversationId": {"$lt": "b"}},
+        ]
+    }
+
+
+def test_next_cursor_only_when_more_pages():
+    documents = [
+        {"createdAt": datetime(2025, 5, 3), "conversationId": "c"},
+        {"createdAt": datetime(2025, 5, 2), "conversationId": "b"},
+        {"createdAt": datetime(2025, 5, 1), "conversationId": "a"},
+    ]
+
+    assert get_next_cursor(list(documents), 3) is None
+
+    page = list(documents)
+    cursor = get_next_cursor(page, 2)
+    assert len(page) == 2
+    assert decode_cursor(cursor) == (datetime(2025, 5, 2), "b")
@@ -0,0 +1,30 @@
+from ai_models.parallel_transcription import find_overlap, stitch_transcripts
+
+
+def test_stitch_drops_words_repeated_in_the_overlap():
+    texts = [
+        " Last weekend I went to the park with my friends.",
+        " with my friends. We was very excited",
+        " We was very excited, because it was sunny.",
+    ]
+    assert stitch_transcripts(texts) == (
+        "Last weekend I went to the park with my friends. We was very excited, because it was sunny.")
+
+
+def test_stitch_keeps_pieces_without_overlap():
+    assert stitch_transcripts([" Hola.", " ¿Qué tal?", ""]) == "Hola. ¿Qué tal?"
+    assert stitch_transcripts([]) == ""
+
+
+def test_overlap_is_limited_to_max_words():
+    previous = "a b c d e".split()
+    following = "b c d e f".split()
+    assert find_overlap(previous, following, max_words=10) == 4
+    assert find_overlap(previous, following, max_words=3) == 0
+
+
+def test_a_short_word_said_again_at_the_boundary_is_kept():
+    texts = [" I wanted to say that.", " That is why we left."]
+    assert stitch_transcripts(texts) == "I wanted to say that. That is why we left."
+    # a long single word is still taken as overlap
+    assert find_overlap(["we", "practiced"], ["practiced", "again"], max_words=10) == 1
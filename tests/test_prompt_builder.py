@@ -0,0 +1,31 @@
+import json
+from ai_models.prompt_builder import RESPONSE_SCHEMA, SYSTEM_PROMPT, build_grammar_messages, chunk_by_token_budget, count_tokens
+
+
+def test_static_prefix_is_shared_and_sentences_go_in_user_message():
+    first = build_grammar_messages([" I goes home. ", "She run."], "en", "es")
+    second = build_grammar_messages(["Yo tengo hambre."], "es", "en")
+
+    assert first[0] == second[0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert SYSTEM_PROMPT.count(RESPONSE_SCHEMA) == 1
+    user = first[1]["content"]
+    assert "English" in user and "Spanish" in user
+    assert json.loads(user.split("Sentences: ", 1)[1]) == ["I goes home.", "She run."]
+
+
+def test_chunks_respect_token_budget_and_sentence_cap():
+    short = "I goes home."
+    long = "This sentence is a good deal longer than the others are. " * 4
+    per_short = count_tokens(short) * 5
+
+    chunks = chunk_by_token_budget([short] * 5, per_short * 2, max_sentences=10)
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+    chunks = chunk_by_token_budget([short] * 5, 10_000, max_sentences=3)
+    assert [len(chunk) for chunk in chunks] == [3, 2]
+
+    # an oversized sentence still gets sent, on its own
+    chunks = chunk_by_token_budget([short, long, short], per_short * 2, max_sentences=10)
+    assert chunks == [[short], [long], [short]]
+
+    assert chunk_by_token_budget([], 100, 5) == []
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import re
+from datetime import datetime, timedelta
+
+# app.config reads these at import
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "5")
+os.environ.setdefault("REFRESH_TOKEN_EXPIRE_DAYS", "1")
+
+from app.services import async_database_service  # noqa: E402
+from app.utils.search_utils import build_search_fields  # noqa: E402
+
+NOW = datetime(2025, 6, 1)
+
+
+def matches(document, query):
+    for field, condition in query.items():
+        value = document.get(field)
+        values = value if isinstance(value, list) else [value]
+        if isinstance(condition, dict) and "$in" in condition:
+            if not any(
+                option.match(item) if isinstance(option, re.Pattern) else option == item
+                for option in condition["$in"] for item in values
+            ):
+                return False
+        elif condition not in values:
+            return False
+    return True
+
+
+def run_pipeline(documents, pipeline):
+    # just the stages the ranked search uses
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            documents = [document for document in documents if matches(document, spec)]
+        elif name == "$sort":
+            (field, direction), = spec.items()
+            documents = sorted(documents, key=lambda document: document[field], reverse=direction < 0)
+        elif name == "$limit":
+            documents = documents[:spec]
+        elif name == "$project":
+            documents = [{field: document[field] for field in spec if spec[field] and field in document} for document in documents]
+        elif name == "$unwind":
+            field = spec[1:]
+            documents = [{**document, field: item} for document in documents for item in document.get(field, [])]
+        elif name == "$group":
+            counts = {}
+            for document in documents:
+                key = document[spec["_id"][1:]]
+                counts[key] = counts.get(key, 0) + 1
+            documents = [{"_id": key, "count": count} for key, count in counts.items()]
+        elif name == "$count":
+            documents = [{spec: len(documents)}] if documents else []
+        elif name == "$facet":
+            documents = [{branch: run_pipeline(documents, stages) for branch, stages in spec.items()}]
+        else:
+            raise AssertionError(f"unexpected stage {name}")
+    return documents
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def to_list(self):
+        return self.documents
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def distinct(self, field, query):
+        return sorted({item for document in self.documents if matches(document, query) for item in document.get(field, [])})
+
+    async def aggregate(self, pipeline):
+        return FakeCursor(run_pipeline(self.documents, pipeline))
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(document) for document in self.documents if matches(document, query)])
+
+
+def make_feedback(conversation_id, sentence_id, text, days_old=0):
+    feedback = {"original": text, "corrected": text, "errors": []}
+    return {
+        "id": sentence_id,
+        "userId": "u1",
+        "conversationId": conversation_id,
+        "createdAt": NOW - timedelta(days=days_old),
+        **build_search_fields(feedback),
+    }
+
+
+def make_conversation(conversation_id, text):
+    return {"userId": "u1", "conversationId": conversation_id, "createdAt": NOW,
+            "originalText": text, "sentenceCount": 1, "errorCount": 0}
+
+
+def test_one_typo_query_finds_the_sentence(monkeypatch):
+    collections = {
+        "sentenceFeedback": FakeCollection([
+            make_feedback("c1", "s1", "I did not receive the letter"),
+            make_feedback("c2", "s2", "The weather was nice"),
+        ]),
+        "conversations": FakeCollection([
+            make_conversation("c1", "I did not receive the letter"),
+            make_conversation("c2", "The weather was nice"),
+        ]),
+    }
+    monkeypatch.setattr(async_database_service, "get_collection", collections.get)
+
+    response = asyncio.run(async_database_service.search_conversations_ranked(
+        "u1", "recieve", page=1, limit=10, view="summary"))
+
+    assert response.success, response.error
+    assert [item.conversationId for item in response.data.conversations] == ["c1"]
+    assert response.data.total == 1
+
+
+def test_total_and_facets_cover_only_the_ranked_sentences(monkeypatch):
+    collections = {
+        "sentenceFeedback": FakeCollection([
+            make_feedback(f"c{day}", f"s{day}", "we went to the park", days_old=day)
+            for day in range(3)
+        ]),
+        "conversations": FakeCollection([make_conversation(f"c{day}", "park") for day in range(3)]),
+    }
+    monkeypatch.setattr(async_database_service, "get_collection", collections.get)
+    monkeypatch.setattr(async_database_service, "SEARCH_CANDIDATE_LIMIT", 2)
+
+    response = asyncio.run(async_database_service.search_conversations_ranked(
+        "u1", "park", page=1, limit=10, view="summary"))
+
+    # the oldest match is left out, and the response says so
+    assert [item.conversationId for item in response.data.conversations] == ["c0", "c1"]
+    assert response.data.total == 2
+    assert response.data.truncated
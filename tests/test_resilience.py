@@ -0,0 +1,168 @@
+import random
+import time
+import httpx
+import pytest
+from ai_models.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceededError, ResilientCaller, RetryPolicy, StreamInterruptedError, deadline, get_retry_after, is_retryable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.response = FakeResponse(status_code, headers)
+        self.status_code = status_code
+
+
+def make_caller(max_attempts=3, breaker=None):
+    sleeps = []
+    caller = ResilientCaller(
+        "test",
+        RetryPolicy(max_attempts=max_attempts, base_delay=1, max_delay=8, rng=random.Random(1)),
+        breaker or CircuitBreaker(min_calls=100),
+        call_timeout=30,
+        sleep=sleeps.append,
+    )
+    return caller, sleeps
+
+
+def flaky(failures):
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return "ok"
+    return fn, calls
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(base_delay=1, max_delay=8, rng=random.Random(7))
+    for attempt in range(1, 8):
+        delays = [policy.compute_delay(attempt) for _ in range(50)]
+        assert all(0 <= delay <= min(8, 2 ** (attempt - 1)) for delay in delays)
+        assert len(set(delays)) > 1
+    assert policy.compute_delay(1, retry_after=5) == 5
+
+
+def test_retry_after_header():
+    assert get_retry_after(ProviderError(429, {"retry-after": "3"})) == 3
+    assert get_retry_after(ProviderError(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0
+    assert get_retry_after(ProviderError(429)) is None
+
+
+def test_only_transient_errors_are_retryable():
+    assert is_retryable(ProviderError(429))
+    assert is_retryable(ProviderError(503))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(ProviderError(400))
+    assert not is_retryable(ValueError("bad json"))
+
+
+def test_retryable_errors_are_matched_by_type():
+    assert is_retryable(httpx.ConnectTimeout("slow"))
+    assert is_retryable(httpx.ReadError("reset"))
+    assert is_retryable(httpx.RemoteProtocolError("closed early"))
+    assert is_retryable(StreamInterruptedError("cut"))
+    assert not is_retryable(httpx.UnsupportedProtocol("ftp"))
+
+    # names alone don't make an error transient
+    class ConnectionStringError(Exception):
+        pass
+    assert not is_retryable(ConnectionStringError())
+
+
+def test_call_retries_transient_errors_then_succeeds():
+    caller, sleeps = make_caller()
+    fn, calls = flaky([ProviderError(503), ProviderError(429, {"retry-after": "4"})])
+
+    assert caller.call(fn) == "ok"
+    assert len(calls) == 3
+    assert sleeps[1] >= 4
+    assert caller.snapshot()["retries"] == 2
+    assert caller.snapshot()["successes"] == 1
+
+
+def test_call_does_not_retry_client_errors():
+    caller, sleeps = make_caller()
+    fn, calls = flaky([ProviderError(400)])
+
+    with pytest.raises(ProviderError):
+        caller.call(fn)
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_call_gives_up_after_max_attempts():
+    caller, _ = make_caller(max_attempts=2)
+    fn, calls = flaky([ProviderError(500)] * 5)
+
+    with pytest.raises(ProviderError):
+        caller.call(fn)
+    assert len(calls) == 2
+
+
+def test_deadline_limits_timeout_and_skips_pointless_waits():
+    caller, sleeps = make_caller()
+    fn, calls = flaky([ProviderError(429, {"retry-after": "60"})])
+
+    with deadline(time.monotonic() + 5):
+        with pytest.raises(ProviderError):
+            caller.call(fn)
+    assert calls[0] <= 5
+    assert sleeps == []
+
+    with deadline(time.monotonic() - 1):
+        with pytest.raises(DeadlineExceededError):
+            caller.call(fn)
+
+
+def test_breaker_opens_on_high_error_rate_then_half_opens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, window_seconds=60, open_seconds=30, clock=clock)
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now = 31
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    # only one trial call at a time
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 62
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.snapshot()["timesOpened"] == 1
+
+
+def test_open_breaker_fails_fast():
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=2)
+    caller, _ = make_caller(max_attempts=5, breaker=breaker)
+    fn, calls = flaky([ProviderError(503)] * 10)
+
+    with pytest.raises(CircuitOpenError):
+        caller.call(fn)
+    assert len(calls) == 2
+    assert caller.snapshot()["rejected"] == 1
+    assert caller.snapshot()["breaker"]["state"] == "open"
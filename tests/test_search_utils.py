@@ -0,0 +1,77 @@
+import re
+from datetime import datetime, timedelta
+from app.utils.search_utils import build_search_fields, edit_distance, expand_fuzzy_terms, get_candidate_terms, match_weight, rank_conversations, tokenize
+
+NOW = datetime(2025, 6, 1)
+
+
+def make_candidate(conversation_id, sentence_id, text, error_types=(), days_old=0):
+    feedback = {
+        "original": text,
+        "corrected": text,
+        "errors": [{"error": "", "reason": "", "suggestion": "", "improvedClause": "", "type": t} for t in error_types],
+    }
+    return {
+        "id": sentence_id,
+        "conversationId": conversation_id,
+        "createdAt": NOW - timedelta(days=days_old),
+        **build_search_fields(feedback),
+    }
+
+
+def test_tokenize_strips_case_and_accents():
+    assert tokenize("¿Qué TAL, señor?") == ["que", "tal", "senor"]
+
+
+def test_build_search_fields_indexes_corrections_and_types():
+    fields = build_search_fields({
+        "original": "We was happy",
+        "corrected": "We were happy",
+        "errors": [{"error": "subject-verb agreement", "suggestion": "use were",
+                    "improvedClause": "we were", "type": "Grammar"}],
+    })
+
+    assert "were" in fields["searchTerms"]
+    assert "agreement" in fields["searchTerms"]
+    assert fields["errorTypes"] == ["grammar"]
+
+
+def test_match_weight_prefers_exact_then_prefix_then_fuzzy():
+    assert match_weight("park", ["park"]) == 1.0
+    assert match_weight("par", ["park"]) == 0.8
+    assert match_weight("pakr", ["park"]) == 0.6
+    assert match_weight("zoo", ["park"]) == 0.0
+
+
+def test_edit_distance_gives_up_past_limit():
+    assert edit_distance("kitten", "sitting", 3) == 3
+    assert edit_distance("kitten", "sitting", 1) == 2
+    assert edit_distance("pakr", "park", 1) == 1
+
+
+def test_candidate_terms_match_short_terms_exactly_and_longer_ones_by_prefix():
+    assert get_candidate_terms(["park", "we", "park"], ["pork"]) == ["pork", "we", re.compile("^park")]
+    assert match_weight("we", ["went"]) == 0.0
+
+
+def test_fuzzy_expansion_finds_close_indexed_terms():
+    vocabulary = ["receive", "recipe", "relieve", "we"]
+    assert expand_fuzzy_terms(["recieve", "we"], vocabulary) == ["receive", "relieve"]
+    assert expand_fuzzy_terms(["receive"], vocabulary) == []
+
+
+def test_rank_orders_by_relevance_with_recency_boost():
+    candidates = [
+        make_candidate("old-exact", "s1", "we went to the park", days_old=365),
+        make_candidate("new-partial", "s2", "the weather was nice", days_old=0),
+        make_candidate("new-exact", "s3", "the park was full", days_old=1),
+    ]
+
+    ranked = rank_conversations("park", candidates, NOW)
+
+    assert [item["conversationId"] for item in ranked] == ["new-exact", "old-exact"]
+    assert ranked[0]["matchedSentenceIds"] == ["s3"]
+
+
+def test_rank_empty_query():
+    assert rank_conversations("  ", [make_candidate("c1", "s1", "park")], NOW) == []
@@ -0,0 +1,14 @@
+import json
+from datetime import datetime
+from app.utils.sse_utils import format_sse
+
+
+def test_format_sse_single_data_line():
+    event = format_sse("feedback", {"original": "line one\nline two", "at": datetime(2025, 6, 1)})
+
+    lines = event.split("\n")
+    assert lines[0] == "event: feedback"
+    assert lines[1].startswith("data: ")
+    assert event.endswith("\n\n")
+    assert json.loads(lines[1][len("data: "):]) == {
+        "original": "line one\nline two", "at": "2025-06-01 00:00:00"}
@@ -0,0 +1,73 @@
+import os
+from types import SimpleNamespace
+import numpy as np
+
+# app.config reads these at import
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "5")
+os.environ.setdefault("REFRESH_TOKEN_EXPIRE_DAYS", "1")
+
+from app.services import audio_processing_service  # noqa: E402
+from app.services.audio_processing_service import Config, cache_transcription, get_cached_transcription, transcribe_audio  # noqa: E402
+
+
+class FakeBackend:
+    def __init__(self, model_size):
+        self.model_size = model_size
+
+    def transcribe(self, audio, language, decode_options=None):
+        return f" {self.model_size}"
+
+
+def test_transcriptions_from_a_reduced_tier_are_not_cached(monkeypatch):
+    monkeypatch.setattr(Config, "MODEL_TIERS_ENABLED", True)
+    monkeypatch.setattr(Config, "MODEL_TIER_BUSY_JOBS", 4)
+    monkeypatch.setattr(Config, "TRANSCRIBE_PROCESSES", 1)
+    monkeypatch.setattr(audio_processing_service, "get_whisper_model", FakeBackend)
+    audio = np.zeros(60 * 16000, dtype=np.float32)
+    metadata = {"speechSeconds": 60.0}
+
+    # busy: a minute of english gets the fast tier instead of standard
+    text, model_metadata = transcribe_audio(audio, "en", queued_jobs=10)
+    assert model_metadata == {"modelTier": "fast", "modelSize": "base.en", "modelTierReduced": True}
+    cache_transcription("busy-upload", "en", text, {**metadata, **model_metadata})
+    assert get_cached_transcription("busy-upload", "en") is None
+
+    text, model_metadata = transcribe_audio(audio, "en")
+    assert model_metadata["modelTierReduced"] is False
+    cache_transcription("quiet-upload", "en", text, {**metadata, **model_metadata})
+    assert get_cached_transcription("quiet-upload", "en")[1]["modelTier"] == "standard"
+
+
+def test_cached_transcription_is_only_served_for_the_model_that_made_it(monkeypatch):
+    monkeypatch.setattr(Config, "MODEL_TIERS_ENABLED", True)
+    monkeypatch.setattr(Config, "TRANSCRIBE_PROCESSES", 1)
+    monkeypatch.setattr(audio_processing_service, "get_whisper_model", FakeBackend)
+    audio = np.zeros(10 * 16000, dtype=np.float32)
+
+    # a short clip gets the fast tier's base.en even when idle
+    text, model_metadata = transcribe_audio(audio, "en")
+    assert model_metadata["modelSize"] == "base.en" and not model_metadata["modelTierReduced"]
+    cache_transcription("short-upload", "en", text, {"speechSeconds": 10.0, **model_metadata})
+    assert get_cached_transcription("short-upload", "en")[0] == " base.en"
+
+    # with tiers off the clip gets MODEL_SIZE, base.en's text isn't reused
+    monkeypatch.setattr(Config, "MODEL_TIERS_ENABLED", False)
+    assert get_cached_transcription("short-upload", "en") is None
+
+
+def test_parallel_path_reports_the_model_that_ran(monkeypatch):
+    monkeypatch.setattr(Config, "MODEL_TIERS_ENABLED", True)
+    monkeypatch.setattr(Config, "MODEL_TIER_BUSY_JOBS", 4)
+    monkeypatch.setattr(Config, "TRANSCRIBE_PROCESSES", 2)
+    monkeypatch.setattr(Config, "LONG_AUDIO_SECONDS", 30)
+    parallel = SimpleNamespace(transcribe=lambda audio, language, sample_rate, decode_options: "text")
+    monkeypatch.setattr(audio_processing_service, "get_parallel_transcriber", lambda: parallel)
+    audio = np.zeros(60 * 16000, dtype=np.float32)
+
+    # every segment runs on MODEL_SIZE, busy or not. busy only changes the
+    # decode options
+    _, quiet = transcribe_audio(audio, "en")
+    _, busy = transcribe_audio(audio, "en", queued_jobs=10)
+    assert quiet["modelSize"] == busy["modelSize"] == audio_processing_service.MODEL_SIZE
+    assert quiet["modelTierReduced"] is False
+    assert busy["modelTierReduced"] is True
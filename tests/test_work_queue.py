@@ -0,0 +1,132 @@
+import threading
+from datetime import datetime, timedelta
+from app.services.work_queue import DEAD, DONE, QUEUED, RUNNING, InMemoryQueueStore, WorkQueue, process_job, run_worker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime(2025, 6, 1)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+def make_queue(clock, **kwargs):
+    dead = []
+    queue = WorkQueue(InMemoryQueueStore(), lease_seconds=60, max_attempts=3,
+                      retry_delay_seconds=10, clock=clock, on_dead=dead.append, **kwargs)
+    return queue, dead
+
+
+def test_claim_only_matching_kinds_oldest_first():
+    clock = FakeClock()
+    queue, _ = make_queue(clock)
+    first = queue.enqueue("audio", {"n": 1})
+    clock.advance(1)
+    queue.enqueue("audio", {"n": 2})
+    queue.enqueue("grammar", {"n": 3})
+
+    job = queue.claim(["audio"], "worker-a")
+    assert job["jobId"] == first
+    assert job["status"] == RUNNING
+    assert job["attempts"] == 1
+    assert queue.count_queued("audio") == 1
+    assert queue.claim(["audio"], "worker-b")["payload"] == {"n": 2}
+    assert queue.claim(["audio"], "worker-b") is None
+    assert queue.count_queued("audio") == 0
+    assert queue.count_queued("grammar") == 1
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_loses_it():
+    clock = FakeClock()
+    queue, _ = make_queue(clock)
+    queue.enqueue("audio", {})
+    job = queue.claim(["audio"], "worker-a")
+
+    clock.advance(30)
+    assert queue.heartbeat(job, "worker-a")
+    clock.advance(61)
+
+    reclaimed = queue.claim(["audio"], "worker-b")
+    assert reclaimed["jobId"] == job["jobId"]
+    assert reclaimed["attempts"] == 2
+    assert not queue.heartbeat(job, "worker-a")
+    assert not queue.complete(job, "worker-a")
+    assert queue.complete(reclaimed, "worker-b", {"ok": True})
+    assert queue.get(job["jobId"])["status"] == DONE
+
+
+def test_failures_back_off_then_dead_letter():
+    clock = FakeClock()
+    queue, dead = make_queue(clock)
+    job_id = queue.enqueue("audio", {})
+
+    job = queue.claim(["audio"], "worker")
+    assert queue.fail(job, "worker", "boom") == QUEUED
+    assert queue.claim(["audio"], "worker") is None
+    clock.advance(10)
+
+    job = queue.claim(["audio"], "worker")
+    assert queue.fail(job, "worker", "boom") == QUEUED
+    clock.advance(10)
+    assert queue.claim(["audio"], "worker") is None
+    clock.advance(10)
+
+    job = queue.claim(["audio"], "worker")
+    assert job["attempts"] == 3
+    assert queue.fail(job, "worker", "boom again") == DEAD
+    assert queue.get(job_id)["status"] == DEAD
+    assert queue.get(job_id)["lastError"] == "boom again"
+    assert [item["jobId"] for item in dead] == [job_id]
+
+
+def test_worker_that_keeps_dying_is_dead_lettered():
+    clock = FakeClock()
+    queue, dead = make_queue(clock)
+    job_id = queue.enqueue("audio", {})
+    for _ in range(3):
+        assert queue.claim(["audio"], "worker")
+        clock.advance(61)
+
+    assert queue.claim(["audio"], "worker") is None
+    assert queue.get(job_id)["status"] == DEAD
+    assert len(dead) == 1
+
+
+def test_process_job_records_result_or_failure():
+    clock = FakeClock()
+    queue, _ = make_queue(clock)
+    ok_id = queue.enqueue("ok", {"value": 2})
+    bad_id = queue.enqueue("bad", {})
+
+    def fail(payload):
+        raise RuntimeError("broken")
+
+    handlers = {"ok": lambda payload: payload["value"] * 2, "bad": fail}
+    process_job(queue, handlers, queue.claim(["ok"], "worker"), "worker")
+    process_job(queue, handlers, queue.claim(["bad"], "worker"), "worker")
+
+    assert queue.get(ok_id)["result"] == 4
+    assert queue.get(bad_id)["status"] == QUEUED
+    assert queue.get(bad_id)["lastError"] == "broken"
+
+
+def test_run_worker_drains_queue_until_stopped():
+    queue = WorkQueue(InMemoryQueueStore(), lease_seconds=60)
+    for n in range(5):
+        queue.enqueue("square", {"n": n})
+
+    stop_event = threading.Event()
+    results = []
+
+    def handler(payload):
+        results.append(payload["n"] ** 2)
+        if len(results) == 5:
+            stop_event.set()
+
+    run_worker(queue, {"square": handler}, "worker", stop_event, poll_interval=0.01)
+    assert sorted(results) == [0, 1, 4, 9, 16]
+    assert queue.stats() == {"square": {DONE: 5}}